@@ -22,6 +22,9 @@ zeros this can be done by applying a filter to the data and creating a standard,
 single-line line chart (possibly with extra lines for trends or smoothed data).
 """
 
+from collections import defaultdict
+from itertools import groupby
+import numbers
 from operator import itemgetter
 import pprint
 
@@ -55,6 +58,7 @@ SOFA_SERIES = 'internal_sofa_series'
 SOFA_CAT = 'internal_sofa_cat'
 SOFA_VAL2SHOW = 'internal_sofa_val2show'
 SOFA_VAL = 'internal_sofa_val'
+SOFA_N = 'internal_sofa_n'
 SOFA_X = 'internal_sofa_x'
 SOFA_Y = 'internal_sofa_y'
 
@@ -65,7 +69,8 @@ def charts_append_divider(html, titles, overall_title, indiv_title='',
 
 def get_gen_chart_output_dets(chart_type, dbe, cur, tbl, tbl_filt,
         var_role_dic, sort_opt, *, rotate=False, data_show=mg.SHOW_FREQ_KEY,
-        major_ticks=False, time_series=False):
+        major_ticks=False, time_series=False,
+        use_group_by=mg.GEN_CHART_USE_GROUP_BY):
     """
     Note - variables must match values relevant to mg.CHART_CONFIG e.g.
     VAR_ROLE_CATEGORY i.e. var_role_cat, for checking to work (see usage of
@@ -76,6 +81,10 @@ def get_gen_chart_output_dets(chart_type, dbe, cur, tbl, tbl_filt,
 
     Note - not all charts have x-axis labels and thus the option of rotating
     them.
+
+    :param bool use_group_by: if True, get the data from one GROUP BY query and
+     zero-fill in Python (see DataPrep.get_zero_filled_data) rather than
+     joining aggregated values onto a cartesian join of the distinct values.
     """
     debug = False
     is_agg = (var_role_dic['agg'] is not None)
@@ -97,31 +106,47 @@ def get_gen_chart_output_dets(chart_type, dbe, cur, tbl, tbl_filt,
     xlblsdic = var_role_dic['cat_lbls']
     ## Get data as per setup
     ## overall data ready for restructuring and presentation
-    SQL_raw_data, SQL_chart_ns = DataPrep.get_gen_chart_SQL(dbe, tbl_quoted,
-        where_tbl_filt, and_tbl_filt, var_role_dic['agg'], var_role_dic['cat'],
-        var_role_dic['series'], var_role_dic['charts'], data_show)
-    if debug: print(SQL_raw_data)
-    try:
-        cur.execute(SQL_raw_data)
-    except Exception as e:
-        raise Exception(
-            f"Unable to get raw data for chart. Orig error: {b.ue(e)}")
-    raw_data = cur.fetchall()
-    if debug: print(raw_data)
-    if not raw_data:
-        raise my_exceptions.TooFewValsForDisplay
-    ## chart ns data
-    if debug: print(SQL_chart_ns)
-    try:
-        cur.execute(SQL_chart_ns)
-    except Exception as e:
-        raise Exception(
-            f"Unable to get charts data for chart. Orig error: {b.ue(e)}")
-    chart_ns_data = cur.fetchall()
-    if debug: print(chart_ns_data)
-    if not chart_ns_data:
-        raise Exception('Unable to make chart if not chart values')
-    chart_ns = dict(chart_ns_data)
+    if use_group_by:
+        SQL_grouped_data = DataPrep.get_grouped_chart_SQL(dbe, tbl_quoted,
+            and_tbl_filt, var_role_dic['agg'], var_role_dic['cat'],
+            var_role_dic['series'], var_role_dic['charts'], data_show)
+        if debug: print(SQL_grouped_data)
+        try:
+            cur.execute(SQL_grouped_data)
+        except Exception as e:
+            raise Exception(
+                f"Unable to get raw data for chart. Orig error: {b.ue(e)}")
+        raw_data, chart_ns = DataPrep.get_zero_filled_data(cur.fetchall())
+        if debug: print(raw_data)
+        if not raw_data:
+            raise my_exceptions.TooFewValsForDisplay
+    else:
+        SQL_raw_data, SQL_chart_ns = DataPrep.get_gen_chart_SQL(dbe,
+            tbl_quoted, where_tbl_filt, and_tbl_filt, var_role_dic['agg'],
+            var_role_dic['cat'], var_role_dic['series'],
+            var_role_dic['charts'], data_show)
+        if debug: print(SQL_raw_data)
+        try:
+            cur.execute(SQL_raw_data)
+        except Exception as e:
+            raise Exception(
+                f"Unable to get raw data for chart. Orig error: {b.ue(e)}")
+        raw_data = cur.fetchall()
+        if debug: print(raw_data)
+        if not raw_data:
+            raise my_exceptions.TooFewValsForDisplay
+        ## chart ns data
+        if debug: print(SQL_chart_ns)
+        try:
+            cur.execute(SQL_chart_ns)
+        except Exception as e:
+            raise Exception(
+                f"Unable to get charts data for chart. Orig error: {b.ue(e)}")
+        chart_ns_data = cur.fetchall()
+        if debug: print(chart_ns_data)
+        if not chart_ns_data:
+            raise Exception('Unable to make chart if not chart values')
+        chart_ns = dict(chart_ns_data)
     ## restructure and return data
     chart_output_dets = DataPrep.structure_gen_data(chart_ns, chart_type,
         raw_data, xlblsdic, var_role_dic, sort_opt,
@@ -508,15 +533,7 @@ class DataPrep:
             ({SQL_cat}) AS qrycat"""
         if debug: print(f'SQL_group_by_vars:\n{SQL_group_by_vars}')
         ## 2) Now get measures field with all grouping vars ready to join to full list
-        if data_show not in mg.AGGREGATE_DATA_SHOW_OPT_KEYS:
-            sql_dic['val2show'] = ' COUNT(*) '
-        elif data_show == mg.SHOW_AVG_KEY:
-            sql_dic['val2show'] = ' AVG({var_role_agg}) '.format(**sql_dic)
-        elif data_show == mg.SHOW_SUM_KEY:
-            sql_dic['val2show'] = ' SUM({var_role_agg}) '.format(**sql_dic)
-        else:
-            raise Exception(
-                f'get_SQL_raw_data() not expecting a data_show of {data_show}')
+        sql_dic['val2show'] = DataPrep.get_val2show(data_show, var_role_agg)
         groupby_vars = []
         if has_charts: groupby_vars.append(var_role_charts)
         if has_series: groupby_vars.append(var_role_series)
@@ -556,6 +573,178 @@ class DataPrep:
         if debug: print(f'SQL_raw_data:\n{SQL_raw_data}')
         return SQL_raw_data, SQL_chart_ns
 
+    @staticmethod
+    def get_val2show(data_show, var_role_agg):
+        """
+        :param str var_role_agg: quoted ready to use
+        """
+        if data_show not in mg.AGGREGATE_DATA_SHOW_OPT_KEYS:
+            val2show = ' COUNT(*) '
+        elif data_show == mg.SHOW_AVG_KEY:
+            val2show = f' AVG({var_role_agg}) '
+        elif data_show == mg.SHOW_SUM_KEY:
+            val2show = f' SUM({var_role_agg}) '
+        else:
+            raise Exception(
+                f'get_SQL_raw_data() not expecting a data_show of {data_show}')
+        return val2show
+
+    @staticmethod
+    def get_grouped_chart_SQL(dbe, tbl_quoted, and_tbl_filt,
+            var_role_agg, var_role_cat, var_role_series, var_role_charts,
+            data_show):
+        """
+        One GROUP BY query for the value to show (and the number of records)
+        for every combination of charts, series, and cat found in the data.
+        Combinations not found are zero-filled afterwards (see
+        get_zero_filled_data) instead of in SQL (see get_gen_chart_SQL) - the
+        cartesian and left joins are slow on large tables.
+
+        As in get_gen_chart_SQL, rows with missing values in any of the grouping
+        variables (or in the variable being averaged or summed) are left out
+        because they can't be plotted.
+
+        Fields - charts, series, cat, vals, n. Dummy values are used for charts
+        and series if not used.
+        """
+        objqtr = getdata.get_obj_quoter_func(dbe)
+        has_charts = bool(var_role_charts)
+        has_series = bool(var_role_series)
+        if not var_role_cat:
+            raise Exception('All general charts require a category variable '
+                'to be identified')
+        var_role_charts = (objqtr(var_role_charts) if has_charts
+            else mg.GROUPING_PLACEHOLDER)
+        var_role_series = (objqtr(var_role_series) if has_series
+            else mg.GROUPING_PLACEHOLDER)
+        var_role_cat = objqtr(var_role_cat)
+        var_role_agg = objqtr(var_role_agg)
+        is_agg = (data_show in mg.AGGREGATE_DATA_SHOW_OPT_KEYS)
+        and_agg_filt = f" AND {var_role_agg} IS NOT NULL " if is_agg else ' '
+        val2show = DataPrep.get_val2show(data_show, var_role_agg)
+        groupby_vars = []
+        if has_charts: groupby_vars.append(var_role_charts)
+        if has_series: groupby_vars.append(var_role_series)
+        groupby_vars.append(var_role_cat)
+        SQL_grouped_data = f"""SELECT {var_role_charts}
+        AS {SOFA_CHARTS},
+            {var_role_series}
+        AS {SOFA_SERIES},
+            {var_role_cat}
+        AS {SOFA_CAT},
+            {val2show}
+        AS {SOFA_VAL2SHOW},
+            COUNT(*)
+        AS {SOFA_N}
+        FROM {tbl_quoted}
+        WHERE {var_role_charts} IS NOT NULL
+            AND {var_role_series} IS NOT NULL
+            AND {var_role_cat} IS NOT NULL
+            {and_tbl_filt}
+            {and_agg_filt}
+        GROUP BY {', '.join(groupby_vars)}
+        ORDER BY {', '.join(groupby_vars)}"""
+        return SQL_grouped_data
+
+    @staticmethod
+    def _get_sort_key(val):
+        "Numbers in order then everything else in order as text"
+        if isinstance(val, numbers.Number):
+            return (0, val)
+        return (1, str(val))
+
+    @staticmethod
+    def _add_run_in_order(ordered_vals, run_vals):
+        """
+        Merge a run of values in database order into a list of values already
+        in database order e.g. the categories found for one series into the
+        categories found so far. A new value goes after the known value before
+        it in the run and before the known value after it. Only if that leaves
+        a choice (values never seen together so the database gives no order) are
+        values compared here (numbers then text).
+
+        One pass over both lists - a daily time series can have thousands of
+        categories.
+        """
+        sort_key = DataPrep._get_sort_key
+        def merge_new_vals(known_vals, new_vals):
+            "Both lists keep their own order - new values go in by sort key"
+            merged = []
+            i = 0
+            for new_val in new_vals:
+                new_key = sort_key(new_val)
+                while i < len(known_vals) and sort_key(known_vals[i]) < new_key:
+                    merged.append(known_vals[i])
+                    i += 1
+                merged.append(new_val)
+            merged.extend(known_vals[i:])
+            return merged
+        val2idx = {val: idx for idx, val in enumerate(ordered_vals)}
+        merged_vals = []
+        idx_next = 0  ## first known value not yet in merged_vals
+        new_vals = []
+        for val in run_vals:
+            idx = val2idx.get(val)
+            if idx is None:
+                new_vals.append(val)
+                continue
+            if idx >= idx_next:
+                merged_vals.extend(
+                    merge_new_vals(ordered_vals[idx_next:idx], new_vals))
+                merged_vals.append(val)
+                idx_next = idx + 1
+            else:  ## already placed (run not in the same order) - keep going
+                merged_vals.extend(new_vals)
+            new_vals = []
+        merged_vals.extend(merge_new_vals(ordered_vals[idx_next:], new_vals))
+        ordered_vals[:] = merged_vals
+
+    @staticmethod
+    def get_zero_filled_data(grouped_data):
+        """
+        Get raw data (as from get_gen_chart_SQL) from grouped data (as from
+        get_grouped_chart_SQL).
+
+        There is a row for every combination of the charts, series, and cat
+        values found - with a value of zero where there was no data - ordered by
+        charts, series, then cat. The order of the values is the database's own
+        (grouped data must be ordered by charts, series, then cat) not a Python
+        sort.
+
+        E.g. [(1, 1, 1, 56, 56), (1, 2, 2, 4, 4)] (charts, series, cat, val, n)
+        becomes
+        [(1, 1, 1, 56), (1, 1, 2, 0), (1, 2, 1, 0), (1, 2, 2, 4)]
+
+        :return: raw_data, chart_ns (n records per chart value)
+        :rtype: tuple
+        """
+        chart_vals = []
+        series_vals = []
+        cat_vals = []
+        combo2val = {}
+        chart_ns = defaultdict(int)
+        for chart_val, chart_rows in groupby(grouped_data, key=itemgetter(0)):
+            chart_vals.append(chart_val)
+            chart_series_vals = []
+            for series_val, series_rows in groupby(chart_rows,
+                    key=itemgetter(1)):
+                chart_series_vals.append(series_val)
+                series_cat_vals = []
+                for unused, unused, cat_val, val, n in series_rows:
+                    series_cat_vals.append(cat_val)
+                    combo2val[(chart_val, series_val, cat_val)] = val
+                    chart_ns[chart_val] += n
+                DataPrep._add_run_in_order(cat_vals, series_cat_vals)
+            DataPrep._add_run_in_order(series_vals, chart_series_vals)
+        raw_data = []
+        for chart_val in chart_vals:
+            for series_val in series_vals:
+                for cat_val in cat_vals:
+                    val = combo2val.get((chart_val, series_val, cat_val))
+                    raw_data.append((chart_val, series_val, cat_val,
+                        0 if val is None else val))
+        return raw_data, dict(chart_ns)
+
     @staticmethod
     def get_sorted_y_dets(data_show, major_ticks, time_series, sort_opt,
             vals_etc_lst, dp, *, multiseries=False):
@@ -1523,10 +1712,49 @@ class BoxPlotDets:
             sorted_cat_vals = [(1, 1), ]  ## the first boxplot is always 1 on the x-axis
         return sorted_cat_vals
 
-    def _get_box_dets(self, i, *, raw_cat_val, display_cat_val, legend_lbl):
+    def _get_grouped_vals2desc(self):
+        """
+        Get the values to describe for every box from one query (ordered by
+        series, category, then value) rather than running a query per box.
+
+        :return: sorted values keyed by (series_val, cat_val) - series_val is
+         None if no series and cat_val is 1 if no category (as per
+         _get_series_vals and _get_sorted_cat_vals)
+        :rtype: dict
+        """
+        has_series = bool(self.var_role_dic['series'])
+        has_cat = bool(self.var_role_dic['cat'])
+        flds = []
+        if has_series:
+            flds.append(self.sql_dic['var_role_series'])
+        if has_cat:
+            flds.append(self.sql_dic['var_role_cat'])
+        flds.append(self.sql_dic['var_role_desc'])
+        not_null_filts = '\n            AND '.join(
+            f'{fld} IS NOT NULL' for fld in flds)
+        SQL_grouped_vals2desc = f"""SELECT {', '.join(flds)}
+            FROM {self.sql_dic['tbl']}
+            WHERE {not_null_filts}
+            {self.sql_dic['and_tbl_filt']}
+            ORDER BY {', '.join(flds)}"""
+        self.cur.execute(SQL_grouped_vals2desc)
+        grouped_vals2desc = {}
+        for row in self.cur.fetchall():
+            series_val = row[0] if has_series else None
+            cat_val = row[-2] if has_cat else 1
+            grouped_vals2desc.setdefault(
+                (series_val, cat_val), []).append(row[-1])
+        for vals2desc in grouped_vals2desc.values():
+            vals2desc.sort()  ## should be already so cheap
+        return grouped_vals2desc
+
+    def _get_box_dets(self, i, *, raw_cat_val, display_cat_val, legend_lbl,
+            vals2desc):
         """
         Get details for specific box for category e.g. Japan. Also get details
         for boxes as a whole e.g. max y display value.
+
+        :param list vals2desc: sorted values for the box
         """
         debug = False
         boxplot_width = 0.25
@@ -1543,26 +1771,13 @@ class BoxPlotDets:
                 if n_lines > self.max_lbl_lines:
                     self.max_lbl_lines = n_lines
                 self.xaxis_dets.append((i, x_val_lbl, x_val_split_lbl))
-            ## Now see if any desc values for particular series_val and cat_val
-            val_clause = getdata.make_fld_val_clause(
-                self.dbe, self.flds, fldname=self.var_role_dic['cat'], val=raw_cat_val)
-            and_cat_val_filt = f' AND {val_clause}'
         else:
             self.xaxis_dets.append((i, "''", "''"))
-            and_cat_val_filt = ''
-        self.sql_dic['and_cat_val_filt'] = and_cat_val_filt
-        SQL_vals2desc = """SELECT {var_role_desc}
-        FROM {tbl}
-        WHERE {var_role_desc} IS NOT NULL
-        {and_cat_val_filt}
-        {and_series_val_filt}
-        {and_tbl_filt}""".format(**self.sql_dic)
-        self.cur.execute(SQL_vals2desc)
-        vals2desc = [x[0] for x in self.cur.fetchall()]
         n_vals = len(vals2desc)
         has_vals = (n_vals > 0)
         if has_vals:
-            median = np.median(vals2desc)
+            measure_vals = np.array(vals2desc, dtype=float)
+            median = np.median(measure_vals)
             lq, uq = core_stats.get_quartiles(vals2desc)
             lbox = lq
             ubox = uq
@@ -1582,8 +1797,8 @@ class BoxPlotDets:
                 mg.CHART_BOXPLOT_INDIV_LBL: None}
         else:
             self.any_displayed_boxes = True
-            min_measure = min(vals2desc)
-            max_measure = max(vals2desc)
+            min_measure = vals2desc[0]
+            max_measure = vals2desc[-1]
             ## whiskers
             if self.boxplot_opt == mg.CHART_BOXPLOT_MIN_MAX_WHISKERS:
                 lwhisker = min_measure
@@ -1593,17 +1808,17 @@ class BoxPlotDets:
                 iqr = ubox - lbox
                 raw_lwhisker = lbox - (1.5*iqr)
                 lwhisker = BoxPlot._get_lwhisker(
-                    raw_lwhisker, lbox, vals2desc)
+                    raw_lwhisker, lbox, vals2desc, measure_vals)
                 raw_uwhisker = ubox + (1.5*iqr)
                 uwhisker = BoxPlot._get_uwhisker(
-                    raw_uwhisker, ubox, vals2desc)
+                    raw_uwhisker, ubox, vals2desc, measure_vals)
             ## outliers
             if self.boxplot_opt == mg.CHART_BOXPLOT_1_POINT_5_IQR_OR_INSIDE:
-                outliers = [x for x in vals2desc
-                    if x < lwhisker or x > uwhisker]
+                outlier_idxs = np.flatnonzero(
+                    (measure_vals < lwhisker) | (measure_vals > uwhisker))
+                outliers = [vals2desc[idx] for idx in outlier_idxs[::-1]]  ## highest first
                 outliers_rounded = [
-                    round(x, mg.DEFAULT_REPORT_DP) for x in vals2desc
-                    if x < lwhisker or x > uwhisker]
+                    round(x, mg.DEFAULT_REPORT_DP) for x in outliers]
             else:
                 outliers = []  ## hidden or inside whiskers
                 outliers_rounded = []
@@ -1649,13 +1864,15 @@ class BoxPlotDets:
                 mg.CHART_BOXPLOT_INDIV_LBL: ', '.join(lblbits)}
         return {mg.BOX_DIC: box_dic, mg.BOX_N_VALS: n_vals}
 
-    def _get_boxdet_series_dets(self, sorted_cat_vals, legend_lbl):
+    def _get_boxdet_series_dets(self, sorted_cat_vals, legend_lbl,
+            series_val, grouped_vals2desc):
         boxdet_series = []
         for i, (raw_cat_val, display_cat_val) in enumerate(sorted_cat_vals, 1):  ## e.g. "Mt Albert Grammar", 
                 ## "Epsom Girls Grammar", "Hebron Christian College", ...
             box_dets = self._get_box_dets(i,
                 raw_cat_val=raw_cat_val, display_cat_val=display_cat_val,
-                legend_lbl=legend_lbl)
+                legend_lbl=legend_lbl,
+                vals2desc=grouped_vals2desc.get((series_val, raw_cat_val), []))
             self.n_chart += box_dets[mg.BOX_N_VALS]
             boxdet_series.append(box_dets[mg.BOX_DIC])
         return boxdet_series
@@ -1703,21 +1920,17 @@ class BoxPlotDets:
         ## 2) Get all cat vals needed for x-axis i.e. all those appearing in any
         ## rows where all fields are non-missing.
         sorted_cat_vals = self._get_sorted_cat_vals()
+        ## 3) Get the values for every box in one go
+        grouped_vals2desc = self._get_grouped_vals2desc()
         for series_val in series_vals:  ## e.g. "Boys" and "Girls"
             if series_val is not None:
                 legend_lbl = self.var_role_dic['series_lbls'].get(series_val,
                     str(series_val))
-                series_val_filt = getdata.make_fld_val_clause(
-                    self.dbe, self.flds,
-                    fldname=self.var_role_dic['series'], val=series_val)
-                and_series_val_filt = f' AND {series_val_filt}'
             else:
                 legend_lbl = None
-                and_series_val_filt = ' '
-            self.sql_dic['and_series_val_filt'] = and_series_val_filt
             ## time to get the boxplot information for the series
             boxdet_series_dets = self._get_boxdet_series_dets(
-                sorted_cat_vals, legend_lbl)
+                sorted_cat_vals, legend_lbl, series_val, grouped_vals2desc)
             title_bits = []
             title_bits.append(self.var_role_dic['desc_name'])
             cat_name = self.var_role_dic['cat_name']
@@ -1839,37 +2052,31 @@ class BoxPlot:
         return boxplot_dets.get_boxplot_dets()
 
     @staticmethod
-    def _get_lwhisker(raw_lwhisker, lbox, measure_vals):
+    def _get_lwhisker(raw_lwhisker, lbox, sorted_vals, measure_vals):
         """
         Make no lower than the minimum value within (inclusive) 1.5*iqr below lq.
         Must never go above lbox.
+
+        :param list sorted_vals: the values (as from the database)
+        :param measure_vals: sorted_vals as a np float array
         """
-        lwhisker = raw_lwhisker  ## init
-        measure_vals.sort()  ## no side effects
-        for val in measure_vals:  ## going upwards
-            if val < raw_lwhisker:
-                pass  ## keep going up
-            elif val >= raw_lwhisker:
-                lwhisker = val
-                break
+        idx = np.searchsorted(measure_vals, raw_lwhisker, side='left')
+        lwhisker = sorted_vals[idx] if idx < len(sorted_vals) else raw_lwhisker
         if lwhisker > lbox:
             lwhisker = lbox
         return lwhisker
 
     @staticmethod
-    def _get_uwhisker(raw_uwhisker, ubox, measure_vals):
+    def _get_uwhisker(raw_uwhisker, ubox, sorted_vals, measure_vals):
         """
         Make sure no higher than the maximum value within (inclusive)
         1.5*iqr above uq. Must never fall below ubox.
+
+        :param list sorted_vals: the values (as from the database)
+        :param measure_vals: sorted_vals as a np float array
         """
-        uwhisker = raw_uwhisker  ## init
-        measure_vals.reverse()  ## no side effects
-        for val in measure_vals:  ## going downwards
-            if val > raw_uwhisker:
-                pass  ## keep going down
-            elif val <= raw_uwhisker:
-                uwhisker = val
-                break
+        idx = np.searchsorted(measure_vals, raw_uwhisker, side='right') - 1
+        uwhisker = sorted_vals[idx] if idx >= 0 else raw_uwhisker
         if uwhisker < ubox:
             uwhisker = ubox
         return uwhisker
@@ -2245,11 +2452,143 @@ class Histo:
         return width
 
     @staticmethod
-    def get_histo_dets(dbe, cur, tbl, tbl_filt, flds, var_role_dic, inc_normal):
+    def _get_combined_histo_dets(cur, sql_dic):
+        """
+        Bin all the values in Python.
+
+        :return: n_bins, lower_limit, upper_limit, combined_start, bin_width,
+         combined_vals, fixed_combined_y_vals
+        :rtype: tuple
+        """
+        debug = False
+        SQL_get_combined_vals = """SELECT %(var_role_bin)s 
+        FROM %(tbl)s
+        WHERE %(var_role_bin)s IS NOT NULL
+            %(and_tbl_filt)s
+        ORDER BY %(var_role_bin)s""" % sql_dic
+        if debug: print(SQL_get_combined_vals)
+        cur.execute(SQL_get_combined_vals)
+        ## np arrays so binning and the normal curve are vectorised
+        combined_vals = np.array([x[0] for x in cur.fetchall()], dtype=float)
+        if not len(combined_vals):
+            raise Exception("No data to make histogram with.")
+        # use nicest bins practical
+        ## start by getting bins as per default code
+        n_bins, lower_limit, upper_limit = lib.get_bins(
+            float(combined_vals.min()), float(combined_vals.max()),
+            n_distinct=len(np.unique(combined_vals)))
+        (combined_y_vals, combined_start, 
+         bin_width, unused) = core_stats.histogram(combined_vals, n_bins, 
+            defaultreallimits=[lower_limit, upper_limit])
+        ## make any saw-toothing corrections necessary
+        (fixed_combined_y_vals, combined_start, 
+         bin_width) = core_stats.fix_sawtoothing(combined_vals, n_bins, 
+             combined_y_vals, combined_start, bin_width)
+        return (n_bins, lower_limit, upper_limit, combined_start, bin_width,
+            combined_vals, fixed_combined_y_vals)
+
+    @staticmethod
+    def _get_sql_float(val):
+        """
+        Float written so every dbe treats it as a double (MySQL treats 1.5 as
+        an exact decimal but 1.5e0 as a double) - so binning arithmetic in the
+        database matches binning in Python.
+        """
+        sql_float = repr(float(val))
+        if 'e' not in sql_float:
+            sql_float += 'e0'
+        return sql_float
+
+    @staticmethod
+    def _get_db_bin_counts(dbe, cur, sql_dic, n_bins, lower_limit, upper_limit,
+            *, by_chart):
+        """
+        Have the database bin the values and only send back the count per bin
+        (per chart) rather than every value. Bins exactly as
+        core_stats.histogram() does given the limits i.e. values below the
+        lower limit are left out, the upper limit goes in the top bin, and any
+        bins past the top one are left out.
+
+        :return: dict mapping chart value (None if not by chart) to a tuple of
+         bin counts list and n of values (incl any not binned)
+        :rtype: dict
+        """
+        floor_sql_func = getdata.get_floor_sql_func(dbe)
+        bin_width = (upper_limit - lower_limit)/float(n_bins)
+        var_role_bin = sql_dic['var_role_bin']
+        lower = Histo._get_sql_float(lower_limit)
+        floor_clause = floor_sql_func(f'({var_role_bin} - {lower})'
+            f'/{Histo._get_sql_float(bin_width)}')
+        charts_clause = sql_dic['var_role_charts'] if by_chart else '1'
+        SQL_get_bin_counts = f"""SELECT sofa_charts, sofa_bin, COUNT(*)
+            FROM (
+                SELECT {charts_clause} AS sofa_charts,
+                    CASE
+                        WHEN {var_role_bin} = {Histo._get_sql_float(upper_limit)}
+                            THEN {n_bins - 1}
+                        ELSE {floor_clause}
+                    END AS sofa_bin
+                FROM {sql_dic['tbl']}
+                WHERE {var_role_bin} IS NOT NULL
+                    AND {var_role_bin} >= {lower} {sql_dic['and_tbl_filt']}
+            ) AS qrybins
+            GROUP BY sofa_charts, sofa_bin"""
+        cur.execute(SQL_get_bin_counts)
+        chart2bin_dets = {}
+        for chart_val, bin_idx, freq in cur.fetchall():
+            key = chart_val if by_chart else None
+            bin_counts, chart_n = chart2bin_dets.get(key, ([0]*n_bins, 0))
+            bin_idx = int(bin_idx)
+            if 0 <= bin_idx < n_bins:
+                bin_counts[bin_idx] += freq
+            chart2bin_dets[key] = (bin_counts, chart_n + freq)
+        return chart2bin_dets
+
+    @staticmethod
+    def _get_db_norm_stats(cur, sql_dic, shift, *, by_chart):
+        """
+        n, mean, and standard deviation (N-1) per chart for the normal curve -
+        calculated by the database. Values are shifted so the sum of squares
+        doesn't lose precision.
+
+        :return: dict mapping chart value (None if not by chart) to (n, mu,
+         sigma)
+        :rtype: dict
+        """
+        var_role_bin = sql_dic['var_role_bin']
+        shifted = f"({var_role_bin} - {Histo._get_sql_float(shift)})"
+        charts_clause = sql_dic['var_role_charts'] if by_chart else '1'
+        group_by = f"GROUP BY {sql_dic['var_role_charts']}" if by_chart else ''
+        SQL_get_norm_stats = f"""SELECT {charts_clause}, COUNT(*),
+                SUM({shifted}), SUM({shifted}*{shifted}),
+                MIN({var_role_bin}), MAX({var_role_bin})
+            FROM {sql_dic['tbl']}
+            WHERE {var_role_bin} IS NOT NULL {sql_dic['and_tbl_filt']}
+            {group_by}"""
+        cur.execute(SQL_get_norm_stats)
+        chart2norm_stats = {}
+        for chart_val, n, sum_x, sum_x2, min_val, max_val in cur.fetchall():
+            key = chart_val if by_chart else None
+            sum_x, sum_x2 = float(sum_x), float(sum_x2)
+            mu = shift + sum_x/n
+            if n < 2 or min_val == max_val:
+                sigma = 0
+            else:
+                sigma = max((sum_x2 - sum_x*sum_x/n)/(n - 1), 0)**0.5
+            chart2norm_stats[key] = (n, mu, sigma)
+        return chart2norm_stats
+
+    @staticmethod
+    def get_histo_dets(dbe, cur, tbl, tbl_filt, flds, var_role_dic, inc_normal,
+            *, bin_in_db=mg.HISTO_BIN_IN_DB):
         """
         Make separate db call each histogram. Getting all values anyway and
         don't want to store in memory.
 
+        If bin_in_db (and the dbe can round down in SQL) the database bins the
+        values and only the counts per bin (and the statistics needed for any
+        normal curve) come back - with identical bins to binning in Python.
+
         Return list of dicts - one for each histogram. Each contains:
             CHARTS_XAXIS_DETS, CHARTS_SERIES_Y_VALS, CHART_MINVAL, CHART_MAXVAL,
             CHART_BIN_LBLS.
@@ -2283,27 +2622,47 @@ class Histo:
         enable comparison. If multiple charts, we only handle saw-toothing for
         the overall data.
         """
-        SQL_get_combined_vals = """SELECT %(var_role_bin)s 
-        FROM %(tbl)s
-        WHERE %(var_role_bin)s IS NOT NULL
-            %(and_tbl_filt)s
-        ORDER BY %(var_role_bin)s""" % sql_dic
-        if debug: print(SQL_get_combined_vals)
-        cur.execute(SQL_get_combined_vals)
-        combined_vals = [x[0] for x in cur.fetchall()]
-        if not combined_vals:
-            raise Exception("No data to make histogram with.")
-        # use nicest bins practical
-        ## start by getting bins as per default code
-        n_bins, lower_limit, upper_limit = lib.get_bins(min(combined_vals), 
-            max(combined_vals), n_distinct=len(set(combined_vals)))
-        (combined_y_vals, combined_start, 
-         bin_width, unused) = core_stats.histogram(combined_vals, n_bins, 
-            defaultreallimits=[lower_limit, upper_limit])
-        ## make any saw-toothing corrections necessary
-        (fixed_combined_y_vals, combined_start, 
-         bin_width) = core_stats.fix_sawtoothing(combined_vals, n_bins, 
-             combined_y_vals, combined_start, bin_width)
+        bin_in_db = bin_in_db and bool(getdata.get_floor_sql_func(dbe))
+        if bin_in_db:
+            SQL_get_combined_dets = """SELECT COUNT(*),
+                MIN(%(var_role_bin)s), MAX(%(var_role_bin)s),
+                COUNT(DISTINCT %(var_role_bin)s)
+            FROM %(tbl)s
+            WHERE %(var_role_bin)s IS NOT NULL %(and_tbl_filt)s""" % sql_dic
+            cur.execute(SQL_get_combined_dets)
+            n_combined, min_val, max_val, n_distinct = cur.fetchone()
+            if not n_combined:
+                raise Exception("No data to make histogram with.")
+            min_val, max_val = float(min_val), float(max_val)
+            n_bins, lower_limit, upper_limit = lib.get_bins(min_val, max_val,
+                n_distinct=n_distinct)
+            by_chart = bool(var_role_dic['charts'])
+            chart2bin_dets = Histo._get_db_bin_counts(dbe, cur, sql_dic,
+                n_bins, lower_limit, upper_limit, by_chart=by_chart)
+            combined_y_vals = [sum(freqs) for freqs in zip(
+                *[bin_counts for bin_counts, unused
+                  in chart2bin_dets.values()])]
+            combined_start = lower_limit
+            bin_width = (upper_limit - lower_limit)/float(n_bins)
+            def get_histogram(n_bins):
+                "As core_stats.histogram() with no limits set"
+                lower, upper, width = core_stats.get_default_histo_limits(
+                    min_val, max_val, n_bins)
+                bin_counts, n = Histo._get_db_bin_counts(dbe, cur, sql_dic,
+                    n_bins, lower, upper, by_chart=False)[None]
+                return bin_counts, lower, width, n - sum(bin_counts)
+            (fixed_combined_y_vals, combined_start,
+             bin_width) = core_stats.fix_sawtoothing(None, n_bins,
+                combined_y_vals, combined_start, bin_width,
+                get_histogram=get_histogram)
+            if inc_normal:
+                chart2norm_stats = Histo._get_db_norm_stats(cur, sql_dic,
+                    shift=(min_val + max_val)/2, by_chart=by_chart)
+        else:
+            (n_bins, lower_limit, upper_limit, combined_start, bin_width,
+             combined_vals,
+             fixed_combined_y_vals) = Histo._get_combined_histo_dets(cur,
+                sql_dic)
         # put any temporary hack overrides for combined_start, bin_width below here**************
         #combined_start = 100 # or whatever the starting number for the bins should be
         #bin_width = 10 # or whatever the width of the bins should be
@@ -2316,28 +2675,35 @@ class Histo:
                 and_fld_chart_by_filt = " and %s" % filt
                 fld_chart_by_val_lbl = var_role_dic['charts_lbls'].get(
                     fld_chart_by_val, fld_chart_by_val)
-                # must get y-vals for each chart individually
-                sql_dic["and_fld_chart_by_filt"] = and_fld_chart_by_filt
-                SQL_get_vals = """SELECT %(var_role_bin)s 
-                    FROM %(tbl)s
-                    WHERE %(var_role_bin)s IS NOT NULL
-                        %(and_tbl_filt)s %(and_fld_chart_by_filt)s
-                    ORDER BY %(var_role_bin)s""" % sql_dic
-                if debug: print(SQL_get_vals)
-                cur.execute(SQL_get_vals)
-                vals = [x[0] for x in cur.fetchall()]
-                if len(vals) < mg.MIN_HISTO_VALS:
+                if bin_in_db:
+                    y_vals, chart_n = chart2bin_dets[fld_chart_by_val]
+                else:
+                    # must get y-vals for each chart individually
+                    sql_dic["and_fld_chart_by_filt"] = and_fld_chart_by_filt
+                    SQL_get_vals = """SELECT %(var_role_bin)s 
+                        FROM %(tbl)s
+                        WHERE %(var_role_bin)s IS NOT NULL
+                            %(and_tbl_filt)s %(and_fld_chart_by_filt)s
+                        ORDER BY %(var_role_bin)s""" % sql_dic
+                    if debug: print(SQL_get_vals)
+                    cur.execute(SQL_get_vals)
+                    vals = np.array([x[0] for x in cur.fetchall()], dtype=float)
+                    chart_n = len(vals)
+                if chart_n < mg.MIN_HISTO_VALS:
                     raise my_exceptions.TooFewValsForDisplay(
                         min_n=mg.MIN_HISTO_VALS)
-                defaultreallimits = [lower_limit, upper_limit]
-                (y_vals, unused, unused, 
-                 unused) = core_stats.histogram(vals, n_bins, defaultreallimits)
-                vals4norm = vals
+                if not bin_in_db:
+                    defaultreallimits = [lower_limit, upper_limit]
+                    (y_vals, unused, unused, 
+                     unused) = core_stats.histogram(vals, n_bins,
+                        defaultreallimits)
+                    vals4norm = vals
                 chart_by_lbl = "%s: %s" % (var_role_dic['charts_name'],
                     fld_chart_by_val_lbl)
             else: # only one chart - combined values are the values we need
                 y_vals = fixed_combined_y_vals
-                vals4norm = combined_vals
+                if not bin_in_db:
+                    vals4norm = combined_vals
                 chart_by_lbl = None
             # not fixing saw-toothing 
             minval = combined_start
@@ -2358,11 +2724,15 @@ class Histo:
             xaxis_dets = [(x+1, '') for x in range(n_bins)]
             sum_yval = sum(y_vals)
             if inc_normal: # some things are done in code above that aren't needed if not generating norm curve but easier to leave in
-                norm_ys = list(core_stats.get_normal_ys(vals4norm,
-                    np.array(bins)))
-                sum_norm_ys = sum(norm_ys)
-                norm_multiplier = sum_yval/(1.0*sum_norm_ys)
-                norm_ys = [x*norm_multiplier for x in norm_ys]
+                if bin_in_db:
+                    n, mu, sigma = chart2norm_stats[fld_chart_by_val]
+                    norm_ys = core_stats.get_normal_ys_from_stats(n, mu, sigma,
+                        np.array(bins))
+                else:
+                    norm_ys = core_stats.get_normal_ys(vals4norm,
+                        np.array(bins))
+                norm_multiplier = sum_yval/(1.0*norm_ys.sum())
+                norm_ys = (norm_ys*norm_multiplier).tolist()
             else:
                 norm_ys = []
             if debug: print(minval, maxval, xaxis_dets, y_vals, bin_lbls)
@@ -2589,6 +2959,83 @@ class ScatterPlot:
         js_pairs = "[" + ",\n".join(js_pairs_lst) + "]"
         return js_pairs
 
+    @staticmethod
+    def _get_thinned_data_tups(all_data_tups, max_points):
+        """
+        Thin the points so they can all be shown in an interactive chart while
+        keeping how crowded each part of the chart is. A grid is laid over the
+        plot area (separately for each series) and every occupied cell keeps
+        at least one point so outliers survive. The rest of the max_points
+        budget is shared between cells in proportion to how many points they
+        have, the points kept being spread evenly through each cell's points.
+        The grid is as fine as possible while using no more than an eighth of
+        the budget on the one point per cell.
+
+        Only thins the points displayed - the regression line etc are still
+        calculated from every value.
+
+        :param list all_data_tups: list of data_tups for each series (in every
+         chart)
+        :return: data_tups for each series - unchanged if few enough points or
+         if even a coarse grid leaves too many
+        :rtype: list
+        """
+        MAX_GRID_CELLS = 256  ## per axis - way finer than the markers
+        MIN_GRID_CELLS = 4
+        series_ns = [len(data_tups) for data_tups in all_data_tups]
+        n_points = sum(series_ns)
+        if n_points <= max_points:
+            return all_data_tups
+        ## SQLite sometimes returns strings even if REAL
+        xy = np.array([xy_tup for data_tups in all_data_tups
+            for xy_tup in data_tups], dtype=float)
+        series_idxs = np.repeat(np.arange(len(all_data_tups)), series_ns)
+        def get_cells(vals, n_cells):
+            val_min, val_range = vals.min(), vals.max() - vals.min()
+            if val_range == 0:
+                return np.zeros(len(vals), dtype=np.int64)
+            cells = ((vals - val_min)/val_range*n_cells).astype(np.int64)
+            return np.minimum(cells, n_cells - 1)  ## max val in last cell
+        n_cells = MAX_GRID_CELLS
+        while n_cells >= MIN_GRID_CELLS:
+            cell_keys = ((series_idxs*n_cells + get_cells(xy[:, 0], n_cells))
+                *n_cells + get_cells(xy[:, 1], n_cells))
+            ## stable so points keep their original order within a cell
+            sorted_idxs = np.argsort(cell_keys, kind='stable')
+            unused, cell_starts, cell_ns = np.unique(cell_keys[sorted_idxs],
+                return_index=True, return_counts=True)
+            if len(cell_ns) <= max_points//8:
+                break
+            n_cells = (n_cells*3)//4
+        else:
+            return all_data_tups
+        n_cells_used = len(cell_ns)
+        n_extra = max_points - n_cells_used
+        ## one each plus a proportional share of the rest (never more than n) -
+        ## any left over from rounding down go to the largest remainders
+        shares = n_extra*(cell_ns - 1)/(n_points - n_cells_used)
+        cell_ks = np.floor(shares).astype(np.int64)
+        n_left_over = n_extra - int(cell_ks.sum())
+        cell_ks[np.argsort(cell_ks - shares, kind='stable')[:n_left_over]] += 1
+        cell_ks += 1
+        ## keep points where floor(rank*k/n) steps up - exactly k per cell,
+        ## spread evenly through the cell's points
+        sorted_cell_idxs = np.repeat(np.arange(n_cells_used), cell_ns)
+        ranks = np.arange(n_points) - cell_starts[sorted_cell_idxs]
+        ks = cell_ks[sorted_cell_idxs]
+        ns = cell_ns[sorted_cell_idxs]
+        is_step = (ranks + 1)*ks//ns > ranks*ks//ns
+        is_kept = np.zeros(n_points, dtype=bool)
+        is_kept[sorted_idxs[is_step]] = True
+        thinned_data_tups = []
+        start = 0
+        for data_tups, series_n in zip(all_data_tups, series_ns):
+            series_is_kept = is_kept[start: start + series_n]
+            thinned_data_tups.append([xy_tup for xy_tup, is_kept_tup
+                in zip(data_tups, series_is_kept) if is_kept_tup])
+            start += series_n
+        return thinned_data_tups
+
     @staticmethod
     def _get_overall_title_scatterplot(var_role_dic):
         title_bits = []
@@ -2641,6 +3088,15 @@ class ScatterPlot:
         series_js_list = []
         series_names_list = []
         indiv_regression_msgs = []
+        n_points = sum(len(series_det[mg.LIST_X]) for series_det in series_dets)
+        n_points_shown = sum(len(series_det[mg.DATA_TUPS])
+            for series_det in series_dets)
+        if n_points_shown < n_points:
+            indiv_regression_msgs.append(_("Showing %(shown)s of %(all)s "
+                "points - sampled in proportion to how crowded each part of "
+                "the chart is") % {
+                "shown": lib.formatnum(n_points_shown),
+                "all": lib.formatnum(n_points)})
         for series_idx, series_det in enumerate(series_dets):
             series_lbl = series_det[mg.CHARTS_SERIES_LBL_IN_LEGEND]
             list_x = series_det[mg.LIST_X]
@@ -2826,10 +3282,15 @@ class ScatterPlot:
 
     @staticmethod
     def get_scatterplot_dets(dbe, cur, tbl, tbl_filt, var_role_dic, unique=True,
-            inc_regression=False):
+            inc_regression=False, *, thin=mg.THIN_DOJO_SCATTERPLOTS):
         """
         unique -- unique x-y pairs only (irrespective of how many records had
         same combination.
+
+        thin -- if more than mg.MAX_POINTS_DOJO_SCATTERPLOT points, thin the
+        points to be displayed (see _get_thinned_data_tups) so the chart can
+        still be interactive. Otherwise a static image is made with every
+        point.
         """
         debug = False
         objqtr = getdata.get_obj_quoter_func(dbe)
@@ -2956,6 +3417,14 @@ class ScatterPlot:
                 mg.CHARTS_CHART_LBL: chart_lbl,
                 mg.CHARTS_SERIES_DETS: series_dets}
             chart_dets.append(chart_det)
+        if thin:
+            all_series_dets = [series_det for chart_det in chart_dets
+                for series_det in chart_det[mg.CHARTS_SERIES_DETS]]
+            all_data_tups = ScatterPlot._get_thinned_data_tups(
+                [series_det[mg.DATA_TUPS] for series_det in all_series_dets],
+                max_points=mg.MAX_POINTS_DOJO_SCATTERPLOT)
+            for series_det, data_tups in zip(all_series_dets, all_data_tups):
+                series_det[mg.DATA_TUPS] = data_tups
         overall_title = ScatterPlot._get_overall_title_scatterplot(var_role_dic)
         scatterplot_dets = {
             mg.CHARTS_OVERALL_LEGEND_LBL: var_role_dic['series_name'],
@@ -3078,6 +3547,7 @@ class LineAreaChart:
             style="width: {width}px; height: {height}px; {pagebreak}">
             </div>
         {legend}
+        {reduced_msg}
         </div>""".format(**chart_settings_dic))
 
     @staticmethod
@@ -3116,20 +3586,96 @@ class LineAreaChart:
         if debug: print(width, xfontsize, minor_ticks, micro_ticks)
         return width, xfontsize, minor_ticks, micro_ticks
 
+    @staticmethod
+    def _get_time_series_xs(x_title, xaxis_dets):
+        "Milliseconds since epoch for each x-axis value"
+        ## https://phillipsb1.wordpress.com/2010/07/25/date-and-time-based-charts/
+        try:
+            xs = []
+            for val, unused, unused in xaxis_dets:
+                xs.append(lib.DateLib.get_epoch_secs_from_datetime_str(
+                    str(val))*1000)
+        except Exception:
+            raise my_exceptions.InvalidTimeSeriesInput(fldname=x_title)
+        return xs
+
+    @staticmethod
+    def _get_lttb_idxs(xs, ys, n_out):
+        """
+        Indexes of the points to keep if reducing a line to n_out points using
+        Largest-Triangle-Three-Buckets (Steinarsson 2013). The first and last
+        points are always kept. The points between are split into n_out - 2
+        buckets and the point kept from each bucket is the one making the
+        largest triangle with the point kept from the previous bucket and the
+        average of the next bucket - so peaks and troughs survive.
+        """
+        n = len(xs)
+        if n_out >= n or n_out < 3:
+            return np.arange(n)
+        xs = np.asarray(xs, dtype=float)
+        ys = np.asarray(ys, dtype=float)
+        ## at least one point per bucket because more points than buckets
+        edges = np.linspace(1, n - 1, n_out - 1).astype(int)
+        next_edges = np.append(edges[2:], n)  ## last bucket is followed by the last point
+        idxs = [0]
+        prev_idx = 0
+        for start, end, next_end in zip(edges[:-1], edges[1:], next_edges):
+            avg_x = xs[end:next_end].mean()
+            avg_y = ys[end:next_end].mean()
+            prev_x, prev_y = xs[prev_idx], ys[prev_idx]
+            areas = np.abs((prev_x - avg_x)*(ys[start:end] - prev_y)
+                - (prev_x - xs[start:end])*(avg_y - prev_y))
+            prev_idx = start + int(np.argmax(areas))
+            idxs.append(prev_idx)
+        idxs.append(n - 1)
+        return np.array(idxs)
+
+    @staticmethod
+    def _get_reduced_series_det(series_det, x_title, max_points):
+        """
+        Time series with more than max_points points are reduced to max_points
+        using LTTB (see _get_lttb_idxs) so the JavaScript stays small and the
+        chart quick to render but still has the same shape. Only time series
+        can be reduced - otherwise every category needs its point.
+
+        :return: series_det (a reduced copy if reduced) and n of original
+         points
+        :rtype: tuple
+        """
+        xaxis_dets = series_det[mg.CHARTS_XAXIS_DETS]
+        y_vals = series_det[mg.CHARTS_SERIES_Y_VALS]
+        n_points = len(y_vals)
+        if not max_points or n_points <= max_points:
+            return series_det, n_points
+        xs = LineAreaChart._get_time_series_xs(x_title, xaxis_dets)
+        idxs = LineAreaChart._get_lttb_idxs(xs, y_vals, max_points)
+        reduced_series_det = dict(series_det)
+        reduced_series_det[mg.CHARTS_XAXIS_DETS] = [
+            xaxis_dets[idx] for idx in idxs]
+        reduced_series_det[mg.CHARTS_SERIES_Y_VALS] = [
+            y_vals[idx] for idx in idxs]
+        tooltips = series_det[mg.CHARTS_SERIES_TOOLTIPS]
+        if len(tooltips) == n_points:  ## not dummy tooltips
+            reduced_series_det[mg.CHARTS_SERIES_TOOLTIPS] = [
+                tooltips[idx] for idx in idxs]
+        return reduced_series_det, n_points
+
+    @staticmethod
+    def _get_reduced_msg(n_points, n_points_shown):
+        if n_points_shown == n_points:
+            return ""
+        return ("<p>" + _("Showing %(shown)s of %(all)s points - reduced "
+            "keeping the shape of the line") % {
+            "shown": lib.formatnum(n_points_shown),
+            "all": lib.formatnum(n_points)} + "</p>")
+
     @staticmethod
     def _get_time_series_affected_dets(time_series, x_title, xaxis_dets,
             series_det, lbl_dets):
         if time_series:
             js_time_series = "true"
             xaxis_lbls = "[]"
-            ## https://phillipsb1.wordpress.com/2010/07/25/date-and-time-based-charts/
-            try:
-                xs = []
-                for val, unused, unused in xaxis_dets:
-                    xs.append(lib.DateLib.get_epoch_secs_from_datetime_str(
-                        str(val))*1000)
-            except Exception:
-                raise my_exceptions.InvalidTimeSeriesInput(fldname=x_title)
+            xs = LineAreaChart._get_time_series_xs(x_title, xaxis_dets)
             ys = series_det[mg.CHARTS_SERIES_Y_VALS]
             assert len(xs) == len(ys)
             xys = zip(xs, ys)
@@ -3188,12 +3734,15 @@ class LineAreaChart:
     def areachart_output(titles, subtitles, x_title, y_title, chart_output_dets,
             css_fpath, css_idx, *,
             time_series, rotate, show_n, major_ticks,
-            hide_markers, page_break_after):
+            hide_markers, page_break_after,
+            max_points=mg.MAX_POINTS_DOJO_TIME_SERIES):
         """
         titles -- list of title lines correct styles
         subtitles -- list of subtitle lines
         chart_output_dets -- see structure_gen_data()
         css_idx -- css index so can apply    
+        max_points -- time series with more points are reduced to this many
+        (see _get_reduced_series_det)
         """
         debug = False
         if time_series and not rotate:
@@ -3262,6 +3811,11 @@ class LineAreaChart:
             n_chart = ("N = " + lib.formatnum(chart_det[mg.CHARTS_CHART_N])
                 if show_n else "")
             series_det = chart_det[mg.CHARTS_SERIES_DETS][0]
+            n_points = n_points_shown = len(series_det[mg.CHARTS_SERIES_Y_VALS])
+            if time_series:
+                series_det, n_points = LineAreaChart._get_reduced_series_det(
+                    series_det, x_title, max_points)
+                n_points_shown = len(series_det[mg.CHARTS_SERIES_Y_VALS])
             xaxis_dets = series_det[mg.CHARTS_XAXIS_DETS]
             lbl_dets = get_lbl_dets(xaxis_dets)
             xaxis_lbls = "[" + ",\n            ".join(lbl_dets) + "]"
@@ -3299,6 +3853,8 @@ class LineAreaChart:
                 "gridline_width": lib.if_none(css_dojo_dic['gridline_width'], 3),
                 "indiv_title_html": indiv_title_html,
                 "legend": "",  ## not used in area charts - they can only show one series per chart
+                "reduced_msg": LineAreaChart._get_reduced_msg(n_points,
+                    n_points_shown),
                 "major_gridline_colour": css_dojo_dic['major_gridline_colour'],
                 "margin_offset_l": lib.if_none(margin_offset_l, 0),
                 "micro_ticks": micro_ticks,
@@ -3337,12 +3893,15 @@ class LineAreaChart:
     def linechart_output(titles, subtitles, x_title, y_title, chart_output_dets,
             css_fpath, css_idx, *,
             time_series, rotate, show_n, major_ticks, inc_trend, inc_smooth,
-            hide_markers, page_break_after):
+            hide_markers, page_break_after,
+            max_points=mg.MAX_POINTS_DOJO_TIME_SERIES):
         """
         titles -- list of title lines correct styles
         subtitles -- list of subtitle lines
         chart_output_dets -- see structure_gen_data()
         css_idx -- css index so can apply    
+        max_points -- time series with more points per line are reduced to this
+        many (see _get_reduced_series_det)
         """
         debug = False
         if time_series and not rotate:
@@ -3471,8 +4030,19 @@ class LineAreaChart:
                     legend = ""
             series_js_list = []
             series_names_list = []
+            n_points = n_points_shown = 0
             for series_idx, series_det in enumerate(series_dets):
                 series_lbl = series_det[mg.CHARTS_SERIES_LBL_IN_LEGEND]
+                if time_series:
+                    (series_det,
+                     n_series_points) = LineAreaChart._get_reduced_series_det(
+                        series_det, x_title, max_points)
+                    ## trend and smooth lines are not data points
+                    if multiseries or series_lbl not in (
+                            TRENDLINE_LBL, SMOOTHLINE_LBL):
+                        n_points += n_series_points
+                        n_points_shown += len(
+                            series_det[mg.CHARTS_SERIES_Y_VALS])
                 xaxis_dets = series_det[mg.CHARTS_XAXIS_DETS]
                 lbl_dets = get_lbl_dets(xaxis_dets)
                 ## times series
@@ -3549,6 +4119,8 @@ class LineAreaChart:
                 "gridline_width": lib.if_none(css_dojo_dic['gridline_width'], 3),
                 "indiv_title_html": indiv_title_html,
                 "legend": legend,
+                "reduced_msg": LineAreaChart._get_reduced_msg(n_points,
+                    n_points_shown),
                 "major_gridline_colour": css_dojo_dic['major_gridline_colour'],
                 "margin_offset_l": lib.if_none(margin_offset_l, 0),
                 "micro_ticks": lib.if_none(micro_ticks, "false"),
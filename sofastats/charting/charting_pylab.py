@@ -1,5 +1,6 @@
 import os
 
+import numpy as np
 import pylab
 import wx #@UnusedImport
 
@@ -122,8 +123,9 @@ def config_hist(fig, vals, var_label, histlbl=None,
     rect.set_facecolor(inner_bg)
     #n_vals = len(vals)
     # use nicest bins practical
-    n_bins, lower_limit, upper_limit = lib.get_bins(min(vals), max(vals),
-        n_distinct=len(set(vals)))
+    vals = np.asarray(vals, dtype=float)  ## vectorised binning
+    n_bins, lower_limit, upper_limit = lib.get_bins(
+        float(vals.min()), float(vals.max()), n_distinct=len(np.unique(vals)))
     (y_vals, start, 
      bin_width, unused) = core_stats.histogram(vals, n_bins, 
         defaultreallimits=[lower_limit, upper_limit])
@@ -249,3 +249,19 @@ def set_DEFAULT_DETAILS(ignore_prefs=False):
             mg.DEFAULT_DETAILS = stored_lev
         except Exception:
             mg.DEFAULT_DETAILS = False
+
+def set_USE_TBL_SNAPSHOTS():
+    """
+    Update mg.USE_TBL_SNAPSHOTS (if set in prefs). Off unless turned on.
+    """
+    try:
+        prefs_dic = get_settings_dic(subfolder=mg.INT_FOLDER,
+            fil_name=mg.INT_PREFS_FILE)
+        use_snapshots = (prefs_dic.get(mg.PREFS_KEY, {})
+            .get(mg.PREFS_USE_TBL_SNAPSHOTS_KEY, False))
+        if use_snapshots not in [True, False]:
+            raise Exception('Invalid stored snapshots setting: '
+                f'{b.ue(use_snapshots)}')
+        mg.USE_TBL_SNAPSHOTS = use_snapshots
+    except Exception:
+        mg.USE_TBL_SNAPSHOTS = False
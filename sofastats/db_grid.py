@@ -1045,6 +1045,7 @@ class TblEditor(wx.Dialog, config_ui.ConfigUI):
             self.dd.con.commit()
             self.dd.cur.execute(self.dbtbl.sql_cell_to_update)
             self.dd.con.commit()
+            getdata.clear_vals_cache(self.dd.dbe, self.dd.db, self.dd.tbl)
         except Exception as e:
             if self.debug or debug:
                 cell2update = self.dbtbl.sql_cell_to_update
@@ -1,3 +1,5 @@
+from textwrap import dedent
+
 # http://www.devguru.com/Technologies/ado/quickref/field_type.html
 # numeric
 ADO_TINYINT = 'Tiny Int - 1-byte signed integer' # adTinyInt
@@ -186,3 +188,36 @@ def get_min_max(fldtype, num_prec, dec_pts):
         min = None
         max = None
     return min, max
+
+def get_windowed_percentiles_sql(fld, tbl, filt_clause, percs):
+    """
+    Get SQL returning one row with the value at each percentile (0-1) in percs.
+    Same as percentile_cont (linear interpolation between the nearest values
+    at position 1 + perc*(n - 1)) but only needing window functions e.g. for
+    MySQL.
+
+    :param str fld: quoted field name
+    :param str tbl: quoted table name
+    :param str filt_clause: full WHERE clause or an empty string
+    """
+    and_or_where = 'AND' if filt_clause.strip() else 'WHERE'
+    perc_clauses = []
+    for perc in percs:
+        row_pos = f'(1 + {perc!r}*(n - 1))'
+        lower_val = f'MAX(CASE WHEN rn = FLOOR({row_pos}) THEN val END)'
+        upper_val = f'MAX(CASE WHEN rn = CEILING({row_pos}) THEN val END)'
+        pos = f'(1 + {perc!r}*(MAX(n) - 1))'
+        perc_clauses.append(f'{lower_val} + ({pos} - FLOOR({pos}))'
+            f'*({upper_val} - {lower_val})')
+    percs_clause = ',\n    '.join(perc_clauses)
+    SQL_get_percs = dedent(f"""\
+    SELECT {percs_clause}
+    FROM (
+        SELECT {fld} AS val,
+            ROW_NUMBER() OVER (ORDER BY {fld}) AS rn,
+            COUNT(*) OVER () AS n
+        FROM {tbl}
+        {filt_clause}
+        {and_or_where} {fld} IS NOT NULL
+    ) AS ranked""")
+    return SQL_get_percs
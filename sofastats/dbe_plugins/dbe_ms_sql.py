@@ -6,6 +6,7 @@
 ## (2.8) - and select OK. NB DAO must be done separately from ADO etc.
 
 import adodbapi #@UnresolvedImport
+import pythoncom #@UnresolvedImport
 import win32com.client #@UnresolvedImport
 
 import wx
@@ -158,6 +159,53 @@ def get_con_resources(con_dets, default_dbs, db=None):
         mg.DBE_CON: con, mg.DBE_CUR: cur, mg.DBE_DBS: dbs, mg.DBE_DB: db}
     return con_resources
 
+def get_percentiles_sql(fld, tbl, filt_clause, percs):
+    """
+    SQL returning one row with the value at each percentile (0-1) in percs.
+    Calculated by the database so only the answers come back. PERCENTILE_CONT
+    is only a window function in SQL Server (2012+) so every row has the
+    answers - only need the first.
+    """
+    and_or_where = 'AND' if filt_clause.strip() else 'WHERE'
+    percs_clause = ', '.join(
+        f'PERCENTILE_CONT({perc!r}) WITHIN GROUP (ORDER BY {fld}) OVER ()'
+        for perc in percs)
+    return (f'SELECT TOP 1 {percs_clause} FROM {tbl} {filt_clause} '
+        f'{and_or_where} {fld} IS NOT NULL')
+
+def get_floor_sql(clause):
+    """
+    Whole number part of a non-negative numeric clause.
+    """
+    return f'FLOOR({clause})'
+
+def get_pool_con(con_dets, db):
+    """
+    Connection for a getdata.ConPool. Only ever used for SELECTs.
+
+    Made in the worker thread which will use it so COM must be initialised
+    for that thread first. Closed in the same thread by close_pool_con.
+    """
+    pythoncom.CoInitialize()
+    try:
+        con_dets_mssql = con_dets[mg.DBE_MS_SQL]
+        con, unused = get_con_cur_for_db(con_dets_mssql['host'],
+            con_dets_mssql['user'], con_dets_mssql['passwd'], db)
+    except Exception:
+        pythoncom.CoUninitialize()
+        raise
+    return con
+
+def close_pool_con(con):
+    """
+    Close a get_pool_con connection. Called from the worker thread which made
+    it so COM can be uninitialised for that thread afterwards.
+    """
+    try:
+        con.close()
+    finally:
+        pythoncom.CoUninitialize()
+
 def get_tbls(cur, db):
     """
     Get table names given database and cursor. NB not system tables.
@@ -5,6 +5,7 @@ import wx
 
 from sofastats import basic_lib as b
 from sofastats import my_globals as mg
+from sofastats.dbe_plugins import dbe_globals
 from sofastats import my_exceptions
 from sofastats import lib
 
@@ -120,6 +121,44 @@ def get_con_resources(con_dets, default_dbs, db=None):
         mg.DBE_DBS: dbs, mg.DBE_DB: db}
     return con_resources
 
+def get_percentiles_sql(fld, tbl, filt_clause, percs):
+    """
+    No percentile_cont in MySQL so window functions (MySQL 8+) are used
+    instead. Calculated by the database so only the answers come back.
+    """
+    return dbe_globals.get_windowed_percentiles_sql(
+        fld, tbl, filt_clause, percs)
+
+def get_floor_sql(clause):
+    """
+    Whole number part of a non-negative numeric clause.
+    """
+    return f'FLOOR({clause})'
+
+def get_change_stamp(cur, tbl):
+    """
+    Something which changes whenever the table's data changes, even if through
+    another connection, so a snapshot of the data can be checked without
+    re-reading the data (see snapshots.py). CHECKSUM TABLE reads the table on
+    the server (unless it keeps a live checksum) but only the checksum comes
+    back. UPDATE_TIME in information_schema.tables would be quicker but is only
+    to the second, and not kept by every storage engine, so can't be trusted.
+    None if there is no checksum e.g. for a view.
+    """
+    try:
+        cur.execute(f'CHECKSUM TABLE {quote_obj(tbl)}')
+        row = cur.fetchone()
+    except Exception:
+        return None
+    return row[1] if row else None
+
+def get_pool_con(con_dets, db):
+    """
+    Connection for a getdata.ConPool. Only ever used for SELECTs.
+    """
+    con, unused = get_con_cur_for_db(dict(con_dets[mg.DBE_MYSQL]), db)
+    return con
+
 def get_tbls(cur, db):
     """
     Get table names given database and cursor.
@@ -164,6 +164,61 @@ def get_con_resources(con_dets, default_dbs, db=None):
         mg.DBE_DBS: dbs, mg.DBE_DB: db}
     return con_resources
 
+def get_percentiles_sql(fld, tbl, filt_clause, percs):
+    """
+    SQL returning one row with the value at each percentile (0-1) in percs.
+    Calculated by the database so only the answers come back.
+    """
+    and_or_where = 'AND' if filt_clause.strip() else 'WHERE'
+    percs_clause = ', '.join(
+        f'percentile_cont({perc!r}) WITHIN GROUP (ORDER BY {fld})'
+        for perc in percs)
+    return (f'SELECT {percs_clause} FROM {tbl} {filt_clause} '
+        f'{and_or_where} {fld} IS NOT NULL')
+
+def get_floor_sql(clause):
+    """
+    Whole number part of a non-negative numeric clause.
+    """
+    return f'FLOOR({clause})'
+
+def get_change_stamp(cur, tbl):
+    """
+    Something which changes whenever the data changes, even if through another
+    connection, so a snapshot of the data can be checked without re-reading the
+    data (see snapshots.py). Based on the current write-ahead log position,
+    which moves with every change to the database, so some snapshots will be
+    re-read when another table changed. The counts in pg_stat_user_tables
+    would be specific to the table but can lag behind the changes by seconds.
+    None if the table isn't WAL-logged e.g. an unlogged or temporary table.
+    """
+    schema, tblname = getdata.tblname2parts(mg.DBE_PGSQL, tbl)
+    cur.execute(f"""SELECT c.relpersistence,
+            CASE WHEN pg_is_in_recovery() THEN pg_last_wal_replay_lsn()
+                ELSE pg_current_wal_lsn() END
+        FROM pg_class AS c
+        INNER JOIN pg_namespace AS n
+        ON n.oid = c.relnamespace
+        WHERE n.nspname = {quote_val(schema)}
+        AND c.relname = {quote_val(tblname)}""")
+    row = cur.fetchone()
+    if row is None:
+        return None
+    relpersistence, wal_lsn = row
+    if relpersistence != 'p':  ## permanent
+        return None
+    return wal_lsn
+
+def get_pool_con(con_dets, db):
+    """
+    Read-only connection for a getdata.ConPool.
+    """
+    con_dets_pgsql = dict(con_dets[mg.DBE_PGSQL])
+    con_dets_pgsql['database'] = db
+    con = pg.connect(**con_dets_pgsql)
+    con.set_session(readonly=True, autocommit=True)
+    return con
+
 def get_tbls(cur, db):
     """
     Get table names given database and cursor.
@@ -1,3 +1,4 @@
+from pathlib import Path
 import sqlite3 as sqlite
 import pprint
 import re
@@ -107,6 +108,53 @@ def get_con(con_dets, db, *, add_checks=False):
         add_funcs_to_con(con)
     return con
 
+def get_floor_sql(clause):
+    """
+    Whole number part of a non-negative numeric clause. No FLOOR() in older
+    SQLite but CAST truncates towards zero which is the same thing when not
+    negative.
+    """
+    return f'CAST(({clause}) AS INTEGER)'
+
+def get_pool_con(con_dets, db):
+    """
+    Read-only connection for a getdata.ConPool. Made, used, and closed in the
+    one worker thread.
+    """
+    con_dets_sqlite_db = dict(con_dets[mg.DBE_SQLITE][db])
+    db_path = Path(con_dets_sqlite_db.pop(DATABASE_KEY)).resolve()
+    con = sqlite.connect(f'{db_path.as_uri()}?mode=ro', uri=True,
+        **con_dets_sqlite_db) #@UndefinedVariable
+    add_funcs_to_con(con)  ## schema may rely on the UDFs
+    return con
+
+def get_change_stamp(cur, tbl):
+    """
+    Something which changes whenever the database changes, even if through
+    another connection (or another process), so a snapshot of the data can be
+    checked without re-reading the data. Based on the database file (and any
+    write-ahead log) and the file change counter in the database header so the
+    same for every tbl. None if there is no file e.g. an in-memory database.
+    """
+    cur.execute('PRAGMA database_list')
+    db_fpaths = [fpath for unused, name, fpath in cur.fetchall()
+        if name == 'main' and fpath]
+    if not db_fpaths:
+        return None
+    db_path = Path(db_fpaths[0])
+    try:
+        with open(db_path, 'rb') as f:
+            change_stamp = [f.read(28)[24:]]  ## file change counter
+    except OSError:
+        return None
+    for fpath in (db_path, db_path.with_name(f'{db_path.name}-wal')):
+        try:
+            stat = fpath.stat()
+        except OSError:
+            continue
+        change_stamp.append((stat.st_mtime_ns, stat.st_size))
+    return tuple(change_stamp)
+
 def get_dbs_list(con_dets, default_dbs):
     """
     Get list of all databases for this dbe (as per con dets in proj file).
@@ -0,0 +1,91 @@
+"""
+Export report table results straight from a dimtables.PivotResult (see
+LiveTable.get_pivot_result()) rather than by scraping the table HTML. Nothing is
+lost to rounding or formatting. Can be scripted outside the GUI.
+"""
+import csv
+import json
+import math
+
+import openpyxl #@UnresolvedImport
+from openpyxl.styles import Font
+
+from .. import my_globals as mg
+
+COUNT_MEASURES = (mg.FREQ_KEY, mg.SUMM_N_KEY)
+
+def get_measure_vals(pivot_result, measure):
+    """
+    Get the values for a measure as lists (one per row) with None for any
+    unavailable values and counts as integers.
+    """
+    to_num = int if measure in COUNT_MEASURES else float
+    return [[None if math.isnan(val) else to_num(val) for val in row_vals]
+        for row_vals in pivot_result.measure2vals[measure].tolist()]
+
+def get_flat_rows(pivot_result):
+    """
+    Get the pivot result as a header row then one row per table row. Row label
+    paths are spread across the first columns (padded if some are shorter).
+    Then there is a column for each col label path and measure which has any
+    values e.g. 'Age Group > 20-29 > Row %'.
+
+    :return: hdr, rows (unavailable values are None)
+    :rtype: tuple
+    """
+    row_lbls_n = max((len(row_lbl) for row_lbl in pivot_result.row_lbls),
+        default=0)
+    hdr = [''] * row_lbls_n
+    measure2vals = {measure: get_measure_vals(pivot_result, measure)
+        for measure in pivot_result.measures}
+    data_cols = []
+    for col_idx, col_lbl in enumerate(pivot_result.col_lbls):
+        for measure in pivot_result.measures:
+            col_vals = [row_vals[col_idx]
+                for row_vals in measure2vals[measure]]
+            if all(val is None for val in col_vals):
+                continue  ## measure not under this col
+            hdr.append(' > '.join(col_lbl + (mg.MEASURE_KEY2LBL[measure], )))
+            data_cols.append(col_vals)
+    rows = []
+    for row_idx, row_lbl in enumerate(pivot_result.row_lbls):
+        row = list(row_lbl) + [''] * (row_lbls_n - len(row_lbl))
+        row.extend(col_vals[row_idx] for col_vals in data_cols)
+        rows.append(row)
+    return hdr, rows
+
+def pivot2csv(pivot_result, fpath):
+    hdr, rows = get_flat_rows(pivot_result)
+    with open(fpath, 'w', encoding='utf-8', newline='') as f:
+        csv_writer = csv.writer(
+            f, delimiter=',', quotechar='"', quoting=csv.QUOTE_MINIMAL)
+        csv_writer.writerow(hdr)
+        csv_writer.writerows(rows)
+
+def pivot2xlsx(pivot_result, fpath, *, sheetname='Table'):
+    hdr, rows = get_flat_rows(pivot_result)
+    wb = openpyxl.Workbook(write_only=False)
+    sheet = wb.active
+    sheet.title = sheetname
+    sheet.append(hdr)
+    style_bold_12pt = Font(name='Arial', size=12, bold=True)
+    for header_cell in sheet[1]:
+        header_cell.font = style_bold_12pt
+    for row in rows:
+        sheet.append(row)
+    wb.save(fpath)
+
+def pivot2json(pivot_result, fpath):
+    """
+    Keeps the structure of the pivot result - one matrix (rows x cols) per
+    measure, keyed by measure label. Unavailable values are null.
+    """
+    measure2vals = {mg.MEASURE_KEY2LBL[measure]: get_measure_vals(
+        pivot_result, measure) for measure in pivot_result.measures}
+    content = {
+        'row_lbls': [list(row_lbl) for row_lbl in pivot_result.row_lbls],
+        'col_lbls': [list(col_lbl) for col_lbl in pivot_result.col_lbls],
+        'measures': measure2vals,
+    }
+    with open(fpath, 'w', encoding='utf-8') as f:
+        json.dump(content, f, indent=2)
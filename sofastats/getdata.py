@@ -1,7 +1,11 @@
 ## should be imported before any modules which rely on mg.DATADETS_OBJ as dd object
-from collections import namedtuple
+from collections import OrderedDict, namedtuple
+from concurrent import futures
+from contextlib import contextmanager
 import pprint
+import queue
 import sys
+import threading
 import wx
 
 from sofastats import basic_lib as b
@@ -271,6 +275,199 @@ def force_sofa_tbls_refresh(sofa_default_db_cur):
     except Exception as e:
         raise Exception("force_sofa_tbls_refresh() can only be used for the "
             f"default db\nCaused by error: {b.ue(e)}")
+    clear_vals_cache()  ## tables may have been recoded, renamed etc
+
+## Distinct values and their frequencies e.g. for the label trees of report
+## tables. Key is (dbe, db, tbl, SQL) with the SQL including any filtering.
+## Least recently used first. Only reused while the data can't have changed (see
+## rerendering_tables()) - a real run always goes back to the database because
+## the data may have been changed outside SOFA.
+vals_cache = OrderedDict()
+
+def add_to_cache(cache, key, vals):
+    """
+    Keep vals under key, dropping the least recently used results to stay
+    within mg.VALS_CACHE_SIZE results and mg.VALS_CACHE_MAX_ROWS rows in total.
+    Results with more rows than that are not kept.
+    """
+    if len(vals) > mg.VALS_CACHE_MAX_ROWS:
+        return
+    cache[key] = vals
+    rows_n = sum(len(cached_vals) for cached_vals in cache.values())
+    while (len(cache) > mg.VALS_CACHE_SIZE
+            or rows_n > mg.VALS_CACHE_MAX_ROWS):
+        unused, dropped_vals = cache.popitem(last=False)
+        rows_n -= len(dropped_vals)
+
+def get_cached_vals(cur, SQL_get_vals, key):
+    """
+    Get all rows returned by SQL_get_vals - from an earlier run if re-rendering
+    (see rerendering_tables()). Kept either way for next time.
+
+    :param tuple key: must start with dbe, db, and tbl so clear_vals_cache()
+     can find it.
+    """
+    vals = None
+    if reuse_tbl_results:
+        vals = vals_cache.pop(key, None)
+    if vals is None:
+        cur.execute(SQL_get_vals)
+        vals = tuple(cur.fetchall())
+    add_to_cache(vals_cache, key, vals)
+    return list(vals)
+
+## The query results the cells of the tables last run were calculated from. Key
+## as for vals_cache. Only reused when re-rendering after a change which can't
+## affect the results e.g. to decimal places or style (see
+## rerendering_tables()).
+tbl_results_cache = OrderedDict()
+reuse_tbl_results = False
+
+@contextmanager
+def rerendering_tables():
+    """
+    Tables run inside this are calculated from the label values and results of
+    earlier runs (where available) rather than from the database. Only for when
+    the data can't have changed since e.g. re-rendering after a change to
+    decimal places, or a batch of tables run together.
+    """
+    global reuse_tbl_results
+    reuse_tbl_results = True
+    try:
+        yield
+    finally:
+        reuse_tbl_results = False
+
+def get_tbl_results(cur, SQL_get_results, key):
+    """
+    Get all rows returned by SQL_get_results - from the last run if
+    re-rendering (see rerendering_tables()). Kept either way for next time.
+
+    :param tuple key: must start with dbe, db, and tbl so clear_vals_cache()
+     can find it.
+    """
+    results = None
+    if reuse_tbl_results:
+        results = tbl_results_cache.pop(key, None)
+    if results is None:
+        cur.execute(SQL_get_results)
+        results = tuple(cur.fetchall())
+    add_to_cache(tbl_results_cache, key, results)
+    return list(results)
+
+## In-memory snapshots of tables (see snapshots.py). Key is (dbe, db, tbl,
+## tbl_filt). Least recently used first.
+tbl_snapshots = OrderedDict()
+## Keys of tables which can't have a snapshot (too many rows or no change stamp)
+## so they aren't checked again every time (see snapshots.get_snapshot).
+tbl_snapshots_unavailable = OrderedDict()
+
+def clear_vals_cache(dbe=None, db=None, tbl=None):
+    """
+    Forget cached values (and table results and snapshots) e.g. because the
+    data has changed. Only for the table if dbe, db, and tbl supplied,
+    otherwise everything matching what was.
+    """
+    for cache in (vals_cache, tbl_results_cache, tbl_snapshots,
+            tbl_snapshots_unavailable):
+        for key in list(cache):
+            key_dbe, key_db, key_tbl = key[:3]
+            if ((dbe is None or key_dbe == dbe)
+                    and (db is None or key_db == db)
+                    and (tbl is None or key_tbl == tbl)):
+                del cache[key]
+
+def con_pool_available(dbe):
+    """
+    Can the dbe plugin make extra connections for a ConPool?
+    """
+    return hasattr(mg.DBE_MODULES[dbe], 'get_pool_con')
+
+
+class ConPool:
+    """
+    A small pool of read-only connections (one per worker thread) so
+    independent queries e.g. the SUM(CASE ...) batches of a report table can run
+    side by side rather than one after another. Worth it for server databases
+    where the time goes on query latency rather than CPU.
+
+    Each worker thread makes, uses, and closes its own connection (see the
+    get_pool_con and optional close_pool_con hooks in the dbe plugins) so
+    connections never cross threads e.g. COM for MS SQL.
+
+    Use as a context manager so the threads finish and the connections close.
+    """
+
+    def __init__(self, dbe, con_dets, db, *, size=mg.CON_POOL_SIZE):
+        dbe_module = mg.DBE_MODULES[dbe]
+        self.get_pool_con = dbe_module.get_pool_con
+        self.close_pool_con = getattr(dbe_module, 'close_pool_con',
+            lambda con: con.close())
+        self.con_dets = con_dets
+        self.db = db
+        self.size = size
+        self.jobs = queue.Queue()
+        self.pending = []
+        self.threads = []
+
+    def __enter__(self):
+        self.threads = [threading.Thread(target=self._work, daemon=True)
+            for unused in range(self.size)]
+        for thread in self.threads:
+            thread.start()
+        return self
+
+    def __exit__(self, *unused):
+        for future in self.pending:
+            future.cancel()  ## only stops jobs not yet started
+        for unused in self.threads:
+            self.jobs.put(None)
+        for thread in self.threads:
+            thread.join()
+        self.pending = []
+        self.threads = []
+        return False
+
+    def _work(self):
+        """
+        Run jobs until told to stop. The connection is only made if there is a
+        job to run.
+        """
+        con = cur = None
+        try:
+            while True:
+                job = self.jobs.get()
+                if job is None:
+                    break
+                future, SQL = job
+                if not future.set_running_or_notify_cancel():
+                    continue
+                try:
+                    if con is None:
+                        con = self.get_pool_con(self.con_dets, self.db)
+                        cur = con.cursor()  ## must return tuples not dics
+                    cur.execute(SQL)
+                    future.set_result(cur.fetchone())
+                except Exception as e:
+                    future.set_exception(e)
+        finally:
+            if con is not None:
+                self.close_pool_con(con)
+
+    def iter_fetchone(self, SQLs):
+        """
+        Yield the first row from each SQL statement - in the same order as the
+        statements no matter which finishes first.
+        """
+        batch_futures = []
+        for SQL in SQLs:
+            future = futures.Future()
+            batch_futures.append(future)
+            self.pending.append(future)
+            self.jobs.put((future, SQL))
+        for future in batch_futures:
+            yield future.result()
+
 
 def reset_main_con_if_sofa_default(tblname=None, add_checks=False):
     """
@@ -325,6 +522,22 @@ def get_val2float_func(dbe):
             return val
     return val2float 
 
+def get_percentiles_sql_func(dbe):
+    """
+    Get function making SQL for percentiles calculated by the database itself
+    so only the answers have to come back rather than every value. None if the
+    dbe can't.
+    """
+    return getattr(mg.DBE_MODULES[dbe], 'get_percentiles_sql', None)
+
+def get_floor_sql_func(dbe):
+    """
+    Get function wrapping a (non-negative) numeric clause so the database
+    rounds it down to a whole number e.g. for binning values in the database.
+    None if the dbe can't.
+    """
+    return getattr(mg.DBE_MODULES[dbe], 'get_floor_sql', None)
+
 def get_cartesian_joiner(dbe):
     """
     Get appropriate syntax to cartesian join entities.
@@ -590,6 +803,7 @@ def insert_row(tbl_dd, data):
     try:
         tbl_dd.cur.execute(SQL_insert, data_tup)
         tbl_dd.con.commit()
+        clear_vals_cache(tbl_dd.dbe, tbl_dd.db, tbl_dd.tbl)
         return True, None
     except Exception as e:
         if debug:
@@ -616,6 +830,7 @@ def delete_row(id_fld, row_id):
     try:
         dd.cur.execute(SQL_delete, data_tup)
         dd.con.commit()
+        clear_vals_cache(dd.dbe, dd.db, dd.tbl)
         return True, None
     except Exception as e:
         if debug:
@@ -199,6 +199,23 @@ TAB_TYPE2LBL = {FREQS: FREQS_LBL, CROSSTAB: CROSSTAB_LBL,
 SELECT_ALL_LBL = '  ' + _('Select All') + '  '  ## so wide enough when changed to deselect no matter what the translation
 DESELECT_ALL_LBL = _('Deselect All')
 MAX_MODES = 10
+STREAMING_FETCH_N = 10_000  ## rows per fetchmany() when streaming values
+QUANTILE_SKETCH_K = 2_000  ## bigger is more accurate but uses more memory
+SPECIAL_FUNCS_CACHE_SIZE = 4_096  ## per function e.g. betai, chisqprob
+RESAMPLING_ITERS = 10_000  ## default cap on permutations and on bootstraps
+RESAMPLING_BATCH_N = 1_000  ## resamples per vectorised batch (one job each)
+RESAMPLING_MAX_BATCH_ELEMENTS = 2_000_000  ## so big samples get smaller batches
+RESAMPLING_MAX_SECS = 30  ## time cap so a run can't tie things up for long
+GEN_TABLE_USE_GROUP_BY = True  ## False for the old SUM(CASE ...) batches
+SUMM_TABLE_SINGLE_SCAN = True  ## False to query the database for each cell
+GEN_CHART_USE_GROUP_BY = True  ## False for the old cartesian join of distinct values
+VALS_CACHE_SIZE = 1_024  ## query results kept for re-rendering tables
+VALS_CACHE_MAX_ROWS = 200_000  ## total rows kept across those results
+CON_POOL_SIZE = 4  ## connections for SUM(CASE ...) table batches (1 for none)
+USE_TBL_SNAPSHOTS = False  ## gets reset by prefs being read during config_globals.set_USE_TBL_SNAPSHOTS() (see snapshots.py)
+TBL_SNAPSHOTS_N = 4  ## snapshots kept e.g. same table with different filters
+TBL_SNAPSHOT_MAX_ROWS = 1_000_000  ## bigger tables are always read from the database
+HISTO_BIN_IN_DB = True  ## False to bring every value back to bin histograms
 EMPTY_ROW_LBL = ''
 COL_MEASURES_KEY = 'Col measures key'
 ROWPCT_AN_OPTION_KEY = 'Rowpct an option? key'
@@ -240,7 +257,7 @@ RPT_CONFIG = {
         DEFAULT_MEASURE_KEY: None,
         QUICK_IF_BELOW_KEY: 750},
   }
-MAX_CELLS_IN_REPORT_TABLE = 100_000 if debug else 5_000
+MAX_CELLS_IN_REPORT_TABLE = 100_000 if debug else 5_000  ## a time budget - tables are streamed to the report so None (no limit) is fine for headless runs
 MAX_VAL_LEN_IN_SQL_CLAUSE = 90
 COL_CONFIG_ITEM_LBL = _('Column configuration')
 ## dimension trees
@@ -705,6 +722,7 @@ OK_DATE_FORMAT_EXAMPLES = None
 ## preferences
 PREFS_KEY = 'Prefs'
 PREFS_DEFAULT_DETAILS_KEY = 'OUTPUT_DETAILS'
+PREFS_USE_TBL_SNAPSHOTS_KEY = 'USE_TBL_SNAPSHOTS'
 DEFAULT_DETAILS = False  ## gets reset by prefs being read during config_globals.set_DEFAULT_DETAILS()
 ## Charts
 CHART_VALUES_LBL = _('Values')
@@ -1058,16 +1076,17 @@ GROUP_B_DEFAULT = None
 VAL_A_DEFAULT = None
 VAL_B_DEFAULT = None
 MIN_CHI_DIMS = 2
-MAX_CHI_DIMS = 30  ## was 6
-MAX_CHI_CELLS = 200  ## was 25
+MAX_CHI_DIMS = 50  ## was 30 (and 6 before that)
+MAX_CHI_CELLS = 1_000  ## was 200 (and 25 before that)
 MAX_PIE_SLICES = 30
 MAX_CLUSTERS = 150  ## was 50
 MAX_CATS_GEN = 100
 MAX_GROUPS4DROPDOWN = 20
 MAX_CHART_SERIES = 30
 MIN_HISTO_VALS = 5
-MAX_RANKDATA_VALS = 100_000  ## can override in gui mode
 MAX_POINTS_DOJO_SCATTERPLOT = 800  ## 800 (use 5000 to demo dojo using demo_tbl)
+THIN_DOJO_SCATTERPLOTS = True  ## False for a static image if more points than that
+MAX_POINTS_DOJO_TIME_SERIES = 1_000  ## per line/area - more are reduced keeping the shape (None for no limit)
 MAX_SCATTERPLOT_SERIES = 5
 MAX_CHARTS_IN_SET = 16
 MAX_SERIES_IN_BOXPLOT = 8
@@ -1,3 +1,4 @@
+import math
 import pylab
 from textwrap import dedent
 import wx  #@UnusedImport
@@ -15,6 +16,8 @@ from sofastats import projects
 from sofastats.charting import charting_pylab
 from sofastats.stats import core_stats
 
+MIN_NORMALITY_N = 20
+
 def get_inputs(paired, var_a, var_label_a, var_b, var_label_b):
     """
     Get variable label and a list of the non-null values (with any additional
@@ -59,14 +62,18 @@ def get_normal_output(vals, data_label,
     ## normality test (includes both kurtosis and skew)
     n_vals = len(vals)
     USUAL_FAIL_N = 100
-    if n_vals < 20:
-        msg = _('Need at least 20 values to test normality. Rely entirely '
-            'on visual inspection of graph above.')
+    if n_vals < MIN_NORMALITY_N:
+        msg = (_('Need at least %s values to test normality. Rely entirely '
+            'on visual inspection of graph above.') % MIN_NORMALITY_N)
     else:
         try:
-            (unused, p_arr, cskew,
-             unused, ckurtosis, unused) = core_stats.normaltest(vals)
-            p = p_arr[0]
+            normality_dets = core_stats.get_normality_dets(
+                [vals], inc_histo=False)[0]
+            p = normality_dets.p
+            if math.isnan(p):
+                raise Exception('Unable to get p-value')
+            cskew = normality_dets.skew
+            ckurtosis = normality_dets.kurtosis
             if abs(cskew) <= 1:
                 sindic = 'a great sign'
             elif abs(cskew) <= 2:
@@ -134,6 +141,46 @@ def get_normal_output(vals, data_label,
     return normal_output
 
 
+def get_all_normal_output(fld_names, fld_labels, css_idx=0):
+    """
+    Normality test results for several numeric variables in one table. The
+    values for all of them come from one query and the tests are run on all the
+    samples together (see core_stats.get_normality_dets).
+    """
+    dd = mg.DATADETS_OBJ
+    unused, tbl_filt = lib.FiltLib.get_tbl_filt(dd.dbe, dd.db, dd.tbl)
+    samples = core_stats.get_col_samples(dd.dbe, dd.cur, dd.tbl, tbl_filt,
+        fld_names, flds=dd.flds, db=dd.db)
+    all_normality_dets = core_stats.get_normality_dets(samples, inc_histo=False)
+    CSS_FIRST_COL_VAR = mg.CSS_SUFFIX_TEMPLATE % (mg.CSS_FIRST_COL_VAR, css_idx)
+    CSS_LBL = mg.CSS_SUFFIX_TEMPLATE % (mg.CSS_LBL, css_idx)
+    CSS_ALIGN_RIGHT = mg.CSS_SUFFIX_TEMPLATE % (mg.CSS_ALIGN_RIGHT, css_idx)
+    title = _('Normality of numeric variables')
+    html = [mg.TBL_TITLE_START + f'<h2>{title}</h2>' + mg.TBL_TITLE_END]
+    html.append(f"\n{mg.REPORT_TABLE_START}<table cellspacing='0'>\n<thead>")
+    html.append('\n<tr>' + ''.join(f"<th class='{CSS_FIRST_COL_VAR}'>{hdr}</th>"
+        for hdr in (_('Variable'), _('N'), _('Skew'), _('Kurtosis'), 'p'))
+        + '</tr>')
+    html.append('\n</thead>\n<tbody>')
+    for fld_label, normality_dets in zip(fld_labels, all_normality_dets):
+        if normality_dets.n < MIN_NORMALITY_N or math.isnan(normality_dets.p):
+            skew = kurtosis = p = '-'
+        else:
+            skew = round(normality_dets.skew, 3)
+            kurtosis = round(normality_dets.kurtosis, 3)
+            p = lib.OutputLib.get_p(normality_dets.p)
+        html.append(f"\n<tr><td class='{CSS_LBL}'>{fld_label}</td>"
+            + ''.join(f"<td class='{CSS_ALIGN_RIGHT}'>{val}</td>"
+                for val in (normality_dets.n, skew, kurtosis, p))
+            + '</tr>')
+    html.append(f'\n</tbody>\n</table>{mg.REPORT_TABLE_END}\n')
+    html.append('<p>' + _('Need at least %s values to test normality. Check '
+        'the histogram for any variable of interest - most real-world data-sets'
+        ' with many values fail the test for even slight differences from the '
+        'perfect normal curve.') % MIN_NORMALITY_N + '</p>')
+    output.append_divider(html, title, indiv_title='Normality check table')
+    return '\n'.join(html)
+
 class DlgNormality(wx.Dialog, config_ui.ConfigUI):
 
     def __init__(self, parent, var_labels, var_notes, var_types, val_dics):
@@ -157,6 +204,7 @@ class DlgNormality(wx.Dialog, config_ui.ConfigUI):
         self.var_types = var_types
         self.val_dics = val_dics
         self.paired = False
+        self.all_numeric = False
         self.varbox_label_unpaired = _('Variable to Check')
         self.varbox_label_paired = _('Paired Variables to Check')
         self.desc_label_unpaired = _('Select the variable you are interested '
@@ -169,7 +217,11 @@ class DlgNormality(wx.Dialog, config_ui.ConfigUI):
             'that?\n\nNote: if comparing samples, each sample must be normal '
             'enough. Filter for each sample by right clicking on the table '
             'selector.')
-        paired_choices = [_('Single'), _('Paired')]
+        self.varbox_label_all = _('All Numeric Variables')
+        self.desc_label_all = _('Check every numeric variable in the table at '
+            'once. Variables that fail the normality test can then be checked '
+            'individually.')
+        paired_choices = [_('Single'), _('Paired'), _('All numeric')]
         self.panel = wx.Panel(self)
         ## szrs
         szr_main = wx.BoxSizer(wx.VERTICAL)
@@ -250,7 +302,11 @@ class DlgNormality(wx.Dialog, config_ui.ConfigUI):
         ## get settings
         cc = output.get_cc()
         run_ok = self.test_config_ok()
-        if run_ok:
+        if run_ok and self.all_numeric:
+            if not self.sorted_var_names:
+                wx.MessageBox(_('No numeric variables to check'))
+                return
+        elif run_ok:
             ## set vals and data_label
             try:
                 self.var_a, unused = self.get_var_a()
@@ -267,6 +323,7 @@ class DlgNormality(wx.Dialog, config_ui.ConfigUI):
             else:
                 self.var_b = None
                 self.var_label_b = ''
+        if run_ok:
             ## css_idx is supplied at the time
             get_script_args={
                 'css_fpath': cc[mg.CURRENT_CSS_PATH],
@@ -288,6 +345,16 @@ class DlgNormality(wx.Dialog, config_ui.ConfigUI):
         script_lst.append(f'add_to_report = {add2report}')
         escaped_report_fpath = lib.escape_pre_write(report_fpath)
         script_lst.append(f'report_fpath_str = "{escaped_report_fpath}"')
+        if self.all_numeric:
+            fld_labels = [lib.GuiLib.get_item_label(
+                item_labels=self.var_labels, item_val=var_name)
+                for var_name in self.sorted_var_names]
+            script_lst.append(f"""\
+normal_output = normal.get_all_normal_output(
+    fld_names={self.sorted_var_names!r},
+    fld_labels={fld_labels!r}, css_idx={css_idx})""")
+            script_lst.append('fil.write(normal_output)')
+            return '\n'.join(script_lst)
         paired = 'True' if self.paired else 'False'
         var_b = '"%s"' % self.var_b if self.var_b else "None"
         script_lst.append(f"""\
@@ -311,12 +378,17 @@ normal_output = normal.get_normal_output(
     def on_rad_paired(self, _event):
         "Respond to selection of single/paired"
         self.paired = (self.rad_paired.GetSelection() == 1)
+        self.all_numeric = (self.rad_paired.GetSelection() == 2)
         if self.paired:
             self.bx_vars.SetLabel(self.varbox_label_paired)
             self.lbl_desc.SetLabel(self.desc_label_paired)
+        elif self.all_numeric:
+            self.bx_vars.SetLabel(self.varbox_label_all)
+            self.lbl_desc.SetLabel(self.desc_label_all)
         else:
             self.bx_vars.SetLabel(self.varbox_label_unpaired)
             self.lbl_desc.SetLabel(self.desc_label_unpaired)
+        self.drop_var_a.Enable(not self.all_numeric)
         self.drop_var_b.Enable(self.paired)
         self.setup_vars(var_a=True, var_b=self.paired)
         self.set_output_to_blank()
@@ -326,6 +398,9 @@ normal_output = normal.get_normal_output(
         if self.paired:
             msg = _('Select two variables and click Check button to see results'
                 ' of normality test')
+        elif self.all_numeric:
+            msg = _('Click Check button to see results of normality tests for '
+                'all numeric variables')
         else:
             msg = _('Select a variable and click Check button to see results of'
                 ' normality test')
@@ -523,13 +523,7 @@ def get_css_dets():
         content = b.get_bom_free_contents(fpath=cc[mg.CURRENT_REPORT_PATH])
         if content:
             try:
-                idx_start = content.index(mg.CSS_FILS_START_TAG) + len('<!--')
-                idx_end = content.index('-->')
-                css_fils_str = content[idx_start: idx_end]
-                css_fils_str = b.get_exec_ready_text(text=css_fils_str)
-                css_dets_dic = {}
-                exec(css_fils_str, css_dets_dic)
-                css_fpaths = css_dets_dic['css_fpaths']
+                css_fpaths = get_css_fpaths_from_report(content)
             except Exception:
                 pass  ## Don't let css failure stop report production.
     if not css_fpaths:
@@ -541,6 +535,30 @@ def get_css_dets():
     css_idx = css_fpaths.index(cc[mg.CURRENT_CSS_PATH])
     return css_fpaths, css_idx
 
+def get_css_fils_comment(css_fpaths):
+    """
+    The comment at the top of a report listing the css files it uses. Read back
+    by get_css_fpaths_from_report().
+    """
+    css_fils_str = (
+        '['
+        + ',\n'.join([f'"{css_fpath}"' for css_fpath in css_fpaths])
+        + ']')
+    return f'{mg.CSS_FILS_START_TAG} = {css_fils_str}-->\n\n'
+
+def get_css_fpaths_from_report(content):
+    """
+    The css files (as paths) listed at the top of a report (see
+    get_css_fils_comment()).
+    """
+    idx_start = content.index(mg.CSS_FILS_START_TAG) + len('<!--')
+    idx_end = content.index('-->')
+    css_fils_str = content[idx_start: idx_end]
+    css_fils_str = b.get_exec_ready_text(text=css_fils_str)
+    css_dets_dic = {}
+    exec(css_fils_str, css_dets_dic)
+    return [Path(css_fpath) for css_fpath in css_dets_dic['css_fils']]
+
 def _get_report_table_title_dets_html(titles, subtitles, css_idx):
     (CSS_TBL_TITLE,
      CSS_TBL_SUBTITLE, CSS_TBL_TITLE_CELL) = get_title_css(css_idx)
@@ -936,11 +954,7 @@ def save_to_report(css_fpaths, source, tbl_filt_label, tbl_filt, new_html, *,
                 'and correct the path to the report.')
     except Exception as e:
         raise Exception(f'Unable to save to report. Orig error: {b.ue(e)}')
-    css_fils_str = (
-        '["'
-        + '",\n"'.join([str(css_fpath) for css_fpath in css_fpaths])
-        + '"]')
-    f.write(f'{mg.CSS_FILS_START_TAG} = {css_fils_str}-->\n\n')
+    f.write(get_css_fils_comment(css_fpaths))
     f.write(hdr)
     if existing_no_ends:
         f.write(existing_no_ends)
@@ -26,6 +26,13 @@ class DlgPrefs(wx.Dialog):
         self.szr_details = config_ui.get_szr_details(self, self.panel)
         self.chk_details.SetValue(mg.DEFAULT_DETAILS)
         self.szr_main.Add(self.szr_details, 0, wx.ALL, 10)
+        self.chk_snapshots = wx.CheckBox(self.panel, -1,
+            _('Keep copies of tables in memory for faster repeat analyses'))
+        self.chk_snapshots.SetToolTip(_('Only for databases where SOFA can '
+            'tell if the data has changed since e.g. SQLite, MySQL, and '
+            'PostgreSQL'))
+        self.chk_snapshots.SetValue(mg.USE_TBL_SNAPSHOTS)
+        self.szr_main.Add(self.chk_snapshots, 0, wx.LEFT|wx.RIGHT|wx.BOTTOM, 10)
         self.setup_btns()
         self.szr_main.Add(self.szr_std_btns, 0, wx.GROW|wx.ALL, 10)
         self.panel.SetSizer(self.szr_main)
@@ -56,6 +63,9 @@ class DlgPrefs(wx.Dialog):
         prefs_dic_out = {mg.PREFS_KEY: {}}
         bol_details = self.chk_details.GetValue()
         prefs_dic_out[mg.PREFS_KEY][mg.PREFS_DEFAULT_DETAILS_KEY] = bol_details
+        bol_snapshots = self.chk_snapshots.GetValue()
+        prefs_dic_out[mg.PREFS_KEY][mg.PREFS_USE_TBL_SNAPSHOTS_KEY] = (
+            bol_snapshots)
         ## create updated prefs file
         prefs_path = mg.INT_PATH / mg.INT_PREFS_FILE
         with open(prefs_path, 'w', encoding='utf-8') as f:
@@ -63,6 +73,7 @@ class DlgPrefs(wx.Dialog):
             f.write(f'{mg.PREFS_KEY} = {prefs_str}')
         ## misc
         config_globals.set_DEFAULT_DETAILS()  ## run after prefs file updated.
+        config_globals.set_USE_TBL_SNAPSHOTS()
         self.Destroy()
         self.SetReturnCode(wx.ID_OK)  ## or nothing happens!  
         ## Prebuilt dialogs must do this internally.
@@ -96,6 +96,7 @@ try:
     config_globals.set_SCRIPT_PATH()
     config_globals.set_ok_date_formats()
     config_globals.set_DEFAULT_DETAILS()
+    config_globals.set_USE_TBL_SNAPSHOTS()
     config_globals.import_dbe_plugins() ## as late as possible because uses
         ## local modules e.g. my_exceptions, lib
 except Exception as e:
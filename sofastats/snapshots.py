@@ -0,0 +1,193 @@
+"""
+Optional in-memory snapshots of the active table (after any filtering) so
+repeated analyses in an exploratory session don't have to go back to the
+database each time - a big help if the database is remote and slow. Turned on
+with mg.USE_TBL_SNAPSHOTS (see Preferences).
+
+Snapshots are held as columns. Numeric fields are NumPy float arrays (NaN for
+missing values). Everything else is dictionary-encoded i.e. an int code for
+each row (-1 for missing) into the distinct values for the field.
+
+Snapshots are dropped along with the values cache (see
+getdata.clear_vals_cache) e.g. when a cell is edited in the data grid. The
+change stamp from the dbe plugin's get_change_stamp() is checked before a
+snapshot is used so changes made elsewhere are picked up. No snapshots are made
+if there is no change stamp for the table e.g. MS SQL Server, MS Access, or an
+in-memory SQLite database, or if there are more than mg.TBL_SNAPSHOT_MAX_ROWS
+rows. Either way that is remembered (until the values cache is cleared) so the
+table isn't counted or stamped again on every analysis - getting a stamp can
+mean a full scan e.g. CHECKSUM TABLE in MySQL.
+
+Values are matched exactly (see TblSnapshot.get_val_mask) whereas the database
+compares using the collation of the field. So if the collation ignores case or
+trailing spaces (e.g. the MySQL defaults) 'Male' and 'male ' are different
+groups in a snapshot but the same group if read from the database. Values taken
+from the data itself (as they are for the groups in analyses) match exactly in
+both.
+"""
+import numpy as np
+
+from . import my_globals as mg
+from . import getdata
+from . import lib
+
+
+class TblSnapshot:
+    """
+    Columns of values for every field in the table (after filtering).
+    """
+
+    def __init__(self, fldnames, rows, flds, *, change_stamp):
+        self.fldnames = set(fldnames)
+        self.rows_n = len(rows)
+        self.change_stamp = change_stamp
+        self.num_cols = {}
+        self.cat_cols = {}
+        cols = list(zip(*rows)) if rows else [()] * len(fldnames)
+        for fldname, col_vals in zip(fldnames, cols):
+            if flds[fldname][mg.FLD_BOLNUMERIC]:
+                try:  ## SQLite sometimes returns strings even if REAL
+                    self.num_cols[fldname] = np.array(col_vals, dtype=float)
+                    continue
+                except (TypeError, ValueError):
+                    pass  ## non-numeric values in numeric field (SQLite)
+            val2code = {}
+            codes = np.fromiter(
+                (-1 if val is None else val2code.setdefault(val, len(val2code))
+                 for val in col_vals),
+                dtype=np.int32, count=self.rows_n)
+            self.cat_cols[fldname] = (codes, list(val2code))
+
+    def is_current(self, flds, change_stamp):
+        if not set(flds) <= self.fldnames:
+            return False  ## field added since
+        return change_stamp == self.change_stamp
+
+    def get_not_null(self, fldname):
+        "Mask for rows with a value for the field"
+        if fldname in self.num_cols:
+            return ~np.isnan(self.num_cols[fldname])
+        codes, unused = self.cat_cols[fldname]
+        return codes != -1
+
+    def get_val_mask(self, fldname, val):
+        """
+        Mask for rows where the field has the value (None for missing) i.e.
+        the rows getdata.make_fld_val_clause() would filter to. Matches are
+        exact - not according to the collation of the field (see module
+        docstring).
+        """
+        if val is None:
+            return ~self.get_not_null(fldname)
+        if fldname in self.num_cols:
+            try:
+                num = float(val)
+            except (TypeError, ValueError):
+                return np.zeros(self.rows_n, dtype=bool)
+            return self.num_cols[fldname] == num
+        codes, cats = self.cat_cols[fldname]
+        try:
+            code = cats.index(val)
+        except ValueError:
+            return np.zeros(self.rows_n, dtype=bool)
+        return codes == code
+
+    def get_floats(self, fldname, mask):
+        """
+        Values for the masked rows as floats. The mask must exclude missing
+        values.
+        """
+        if fldname in self.num_cols:
+            return self.num_cols[fldname][mask]
+        codes, cats = self.cat_cols[fldname]
+        return np.array([float(cats[code]) for code in codes[mask]],
+            dtype=float)
+
+    def get_vals(self, fldname, mask):
+        """
+        Values for the masked rows as a list - floats if a numeric field. The
+        mask must exclude missing values.
+        """
+        if fldname in self.num_cols:
+            return self.num_cols[fldname][mask].tolist()
+        codes, cats = self.cat_cols[fldname]
+        return [cats[code] for code in codes[mask]]
+
+
+def get_change_stamp(dbe, cur, tbl):
+    """
+    None if the dbe plugin can't supply one - or can't for this table.
+    """
+    dbe_module = mg.DBE_MODULES[dbe]
+    if not hasattr(dbe_module, 'get_change_stamp'):
+        return None
+    return dbe_module.get_change_stamp(cur, tbl)
+
+def get_rows_n(dbe, cur, tbl, tbl_filt):
+    "Rows in the table after filtering"
+    qtbl = getdata.tblname_qtr(dbe, tbl)
+    where_tbl_filt, unused = lib.FiltLib.get_tbl_filts(tbl_filt)
+    cur.execute(f"""SELECT COUNT(*)
+        FROM {qtbl}
+        {where_tbl_filt}""")
+    return cur.fetchone()[0]
+
+def make_snapshot(dbe, cur, tbl, tbl_filt, flds, *, change_stamp):
+    """
+    :param change_stamp: must be got before the data is read so any change
+     made while it is being read makes the snapshot stale
+    :rtype: TblSnapshot
+    """
+    objqtr = getdata.get_obj_quoter_func(dbe)
+    qtbl = getdata.tblname_qtr(dbe, tbl)
+    where_tbl_filt, unused = lib.FiltLib.get_tbl_filts(tbl_filt)
+    fldnames = list(flds)
+    qflds = ', '.join(objqtr(fldname) for fldname in fldnames)
+    cur.execute(f"""SELECT {qflds}
+        FROM {qtbl}
+        {where_tbl_filt}""")
+    return TblSnapshot(fldnames, cur.fetchall(), flds,
+        change_stamp=change_stamp)
+
+def get_snapshot(dbe, cur, db, tbl, tbl_filt, flds):
+    """
+    Get a snapshot of the table (after filtering), only going to the database
+    if there isn't a current one already.
+
+    Rows are only counted when there is no current snapshot, and before the
+    change stamp is got, so a table which is too big is never stamped.
+
+    :param str db: needed to tell tables in different databases apart
+    :return: None if snapshots are turned off, db or flds aren't supplied,
+     there is no change stamp to check the snapshot against, or there are too
+     many rows
+    :rtype: TblSnapshot
+    """
+    if not mg.USE_TBL_SNAPSHOTS or db is None or flds is None:
+        return None
+    if not hasattr(mg.DBE_MODULES[dbe], 'get_change_stamp'):
+        return None
+    key = (dbe, db, tbl, tbl_filt)
+    if key in getdata.tbl_snapshots_unavailable:
+        return None
+    snapshot = getdata.tbl_snapshots.pop(key, None)
+    change_stamp = None
+    if snapshot is not None:
+        change_stamp = get_change_stamp(dbe, cur, tbl)
+        if not snapshot.is_current(flds, change_stamp):
+            snapshot = None
+    if snapshot is None:
+        if get_rows_n(dbe, cur, tbl, tbl_filt) > mg.TBL_SNAPSHOT_MAX_ROWS:
+            getdata.tbl_snapshots_unavailable[key] = None
+            return None
+        if change_stamp is None:
+            change_stamp = get_change_stamp(dbe, cur, tbl)
+        if change_stamp is None:  ## no way of knowing if a snapshot is stale
+            getdata.tbl_snapshots_unavailable[key] = None
+            return None
+        snapshot = make_snapshot(dbe, cur, tbl, tbl_filt, flds,
+            change_stamp=change_stamp)
+    getdata.tbl_snapshots[key] = snapshot
+    while len(getdata.tbl_snapshots) > mg.TBL_SNAPSHOTS_N:
+        getdata.tbl_snapshots.popitem(last=False)
+    return snapshot
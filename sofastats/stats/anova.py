@@ -4,12 +4,14 @@ from sofastats import basic_lib as b
 from sofastats import my_globals as mg
 from sofastats import lib
 from sofastats.stats import indep2var
+from sofastats.stats import resampling
 
 
 class DlgConfig(indep2var.DlgIndep2VarConfig):
 
     averaged = mg.CHART_AVERAGED_LBL
     range_gps = True   
+    resampling_test = resampling.ANOVA
     min_data_type = mg.VAR_TYPE_QUANT_KEY
 
     def get_examples(self):
@@ -67,7 +69,7 @@ class DlgConfig(indep2var.DlgIndep2VarConfig):
         script_lst = [f'dp = {mg.DEFAULT_STATS_DP}']
         script_lst.append(
             lib.FiltLib.get_tbl_filt_clause(dd.dbe, dd.db, dd.tbl))
-        lst_samples = []
+        lst_vals_quoted = []
         lst_labels = []
         ## need sample for each of the values in range
         idx_val_a, idx_val_b = indep2var.get_range_idxs(
@@ -76,24 +78,21 @@ class DlgConfig(indep2var.DlgIndep2VarConfig):
         dbe = mg.DBE_KEY2KEY_AS_STR[dd.dbe]
         var_avg_str = lib.esc_str_input(var_avg)
         var_gp_str = lib.esc_str_input(var_gp)
-        str_get_sample = (f"""
-%s = core_stats.get_list(dbe=mg.{dbe}, cur=cur, tbl="{dd.tbl}",
-    tbl_filt=tbl_filt, flds=flds, fld_measure="{var_avg_str}",
-    fld_filter="{var_gp_str}", filter_val=%s)""")
-        for i, val in enumerate(vals_in_range):
-            sample_name = f'sample_{i}'
+        for val in vals_in_range:
             val_str_quoted = val if var_gp_numeric else f'"""{val}"""'
-            script_lst.append(str_get_sample % (sample_name, val_str_quoted))
-            lst_samples.append(sample_name)
+            lst_vals_quoted.append(str(val_str_quoted))
             try:
                 val_label = self.val_dics[var_gp][val]
             except KeyError:
                 val_label = str(val).title()
             lst_labels.append(val_label)
-        lst_samples_str = ', '.join(lst_samples)
-        samples = f'[{lst_samples_str}]'
+        vals_quoted = ', '.join(lst_vals_quoted)
+        ## one query for all groups rather than one per group
+        script_lst.append(f"""
+raw_samples = core_stats.get_grouped_samples(dbe=mg.{dbe}, cur=cur,
+    tbl="{dd.tbl}", tbl_filt=tbl_filt, flds=flds, fld_measure="{var_avg_str}",
+    fld_filter="{var_gp_str}", filter_vals=[{vals_quoted}], db=db)""")
         script_lst.append(f'raw_labels = {lst_labels}')
-        script_lst.append(f'raw_samples = {samples}')
         script_lst.append('raw_sample_dets = zip(raw_labels, raw_samples)')
         script_lst.append('sample_dets = [x for x in raw_sample_dets '
             'if len(x[1]) > 0]')
@@ -110,7 +109,8 @@ if len(samples) < 2:
         script_lst.append(f'add_to_report = {add2report}')
         script_lst.append(f'css_fpath = Path("{lib.escape_pre_write(css_fpath)}")')
         script_lst.append(f'report_fpath = Path("{lib.escape_pre_write(report_fpath)}")')
-        high = self.rad_precision.GetValue()
+        ## None - only take the slow Decimal route if floats aren't precise enough
+        high = None if self.rad_precision.GetValue() else False
         script_lst.append(f"""
 (p, F, dics, sswn, dfwn, mean_squ_wn, 
  ssbn, dfbn, mean_squ_bn) = core_stats.anova(samples, labels, high={high})""")
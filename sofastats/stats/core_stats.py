@@ -9,12 +9,18 @@ from .. import my_globals as mg
 from .. import lib
 from .. import my_exceptions
 from .. import getdata
+from .. import snapshots
+from .special_funcs import (
+    azprob, betacf, betai, chisqprob, chisqprobs, fprob, gammln, zprob)
 
 D = decimal.Decimal
 decimal.getcontext().prec = 200
 
 SpearmansInitTbl = namedtuple(
     'SpearmansInitTbl', 'x, y, rank_x, rank_y, diff, diff_squared')
+RankTieDets = namedtuple('RankTieDets',
+    'ranks, sorted_idxs, distinct_vals, distinct_ranks, val_counts, '
+    'tie_correction')
 
 """
 Don't use dd - this and any other modules we wish to run as a standalone script
@@ -30,6 +36,14 @@ http://en.wikipedia.org/wiki/Kurtosis
 """
 FISHER_KURTOSIS_ADJUSTMENT = 3.0
 
+"""
+Largest acceptable relative error bound on a float64 sum of squared deviations
+before is_float_precise_enough() sends the work to the Decimal path instead.
+Reported statistics rarely show more than a handful of significant figures so
+this leaves plenty of headroom.
+"""
+FLOAT_STATS_REL_TOL = 1e-10
+
 def saw_toothing(y_vals, period, start_idx=0):
     """
     Sawtoothing is where every nth bin has values, but the others have none.
@@ -40,11 +54,19 @@ def saw_toothing(y_vals, period, start_idx=0):
     sum_non_period = sum_all - sum_period
     return sum_non_period == 0
 
-def fix_sawtoothing(raw_data, n_bins, y_vals, start, bin_width):
+def fix_sawtoothing(raw_data, n_bins, y_vals, start, bin_width, *,
+        get_histogram=None):
     """
     Look for sawtoothing on commonly found periods (5 and 2). If found, reduce
     bins until problem gone or too few bins to keep shrinking.
+
+    :param get_histogram: function taking the number of bins and returning what
+     histogram() would for the values given no limits. Needed if the values
+     aren't at hand e.g. if binned by the database (raw_data can be None).
     """
+    if get_histogram is None:
+        def get_histogram(n_bins):
+            return histogram(raw_data, n_bins)
     debug = False
     while n_bins > 5:
         if saw_toothing(y_vals, period=5):
@@ -57,26 +79,35 @@ def fix_sawtoothing(raw_data, n_bins, y_vals, start, bin_width):
             break
         n_bins = int(math.ceil(n_bins/shrink_factor))
         (y_vals, start, 
-            bin_width, unused) = histogram(raw_data, n_bins)
+            bin_width, unused) = get_histogram(n_bins)
         if debug: print(y_vals)
     return y_vals, start, bin_width
 
 def get_normal_ys(vals, bins):
     """
     Get np array of y values for normal distribution curve with given values
-    and bins.
+    and bins. The normal pdf is evaluated for all bins at once (pylab.normpdf
+    no longer exists).
+    """
+    n = len(vals)
+    if n < 2:
+        raise Exception(_('Need multiple values to calculate normal curve.'))
+    return get_normal_ys_from_stats(n, mean(vals), stdev(vals), bins)
+
+def get_normal_ys_from_stats(n, mu, sigma, bins):
+    """
+    As for get_normal_ys but from the number of values, their mean, and their
+    standard deviation (N-1) e.g. when calculated by the database.
     """
-    if len(vals) < 2:
+    if n < 2:
         raise Exception(_('Need multiple values to calculate normal curve.'))
     debug = False
-    import pylab
-    mu = mean(vals)
-    sigma = stdev(vals)
     if debug: print(bins, mu, sigma)
     if sigma == 0:
         raise Exception(
             'Unable to get y-axis values for normal curve with a sigma of 0.')
-    norm_ys = pylab.normpdf(bins, mu, sigma)
+    zs = (np.asarray(bins, dtype=float) - mu) / sigma
+    norm_ys = np.exp(-0.5*np.square(zs)) / (sigma*math.sqrt(2*math.pi))
     return norm_ys
 
 def get_regression_dets(list_x, list_y):
@@ -167,17 +198,28 @@ def get_freqs(sample):
     return xs, ys
 
 def get_list(dbe, cur, tbl, tbl_filt, flds, fld_measure,
-        fld_filter, filter_val):
+        fld_filter, filter_val, *, db=None):
     """
     Get list of non-missing values in field. Must return list of floats. SQLite
     sometimes returns strings even though REAL data type. Not known why. Used,
     for example, in the independent samples t-test.
 
     :param str fld_filter: the grouping variable
+    :param str db: if supplied, a snapshot of the table can be used (see
+     snapshots.get_snapshot)
     """
     debug = False
     fld_val_clause = getdata.make_fld_val_clause(
         dbe, flds, fld_filter, filter_val)
+    snapshot = snapshots.get_snapshot(dbe, cur, db, tbl, tbl_filt, flds)
+    if snapshot:
+        mask = (snapshot.get_not_null(fld_measure)
+            & snapshot.get_val_mask(fld_filter, filter_val))
+        lst = snapshot.get_floats(fld_measure, mask).tolist()
+        if len(lst) < 2:
+            raise my_exceptions.TooFewValsInSamplesForAnalysis(fld_filter,
+                filter_val)
+        return lst
     objqtr = getdata.get_obj_quoter_func(dbe)
     unused, and_tbl_filt = lib.FiltLib.get_tbl_filts(tbl_filt)
     SQL_get_list = f"""SELECT {objqtr(fld_measure)}
@@ -193,7 +235,117 @@ def get_list(dbe, cur, tbl, tbl_filt, flds, fld_measure,
             filter_val)
     return lst
 
-def get_paired_data(dbe, cur, tbl, tbl_filt, fld_a, fld_b, unique=False):
+def get_grouped_samples(dbe, cur, tbl, tbl_filt, flds, fld_measure,
+        fld_filter, filter_vals, *, db=None):
+    """
+    Get a sample of non-missing values in the measure field for each of the
+    filter values. Does in one query what would take one get_list call (and one
+    table scan) per group. Used, for example, in ANOVA and Kruskal-Wallis.
+
+    Each row is tagged with the index of the group it matched (using exactly
+    the same clause as get_list) and the values are gathered per group in a
+    single pass. Rows for a group needn't be contiguous.
+
+    :param str fld_filter: the grouping variable
+    :param list filter_vals: values of the grouping variable - one sample is
+     returned for each, in the same order
+    :param str db: if supplied, a snapshot of the table can be used (see
+     snapshots.get_snapshot)
+    :return: samples (np arrays of floats - SQLite sometimes returns strings
+     even if REAL)
+    :rtype: list
+    """
+    fld_val_clauses = [
+        getdata.make_fld_val_clause(dbe, flds, fld_filter, filter_val)
+        for filter_val in filter_vals]
+    snapshot = snapshots.get_snapshot(dbe, cur, db, tbl, tbl_filt, flds)
+    if snapshot:
+        not_null = snapshot.get_not_null(fld_measure)
+        gp_samples = dict(enumerate(
+            snapshot.get_floats(fld_measure,
+                not_null & snapshot.get_val_mask(fld_filter, filter_val))
+            for filter_val in filter_vals))
+    else:
+        gp_samples = get_grouped_samples_from_db(dbe, cur, tbl, tbl_filt,
+            fld_measure, fld_filter, fld_val_clauses)
+    samples = []
+    for idx, filter_val in enumerate(filter_vals):
+        sample = gp_samples.get(idx, np.zeros(0))
+        if len(sample) < 2:
+            raise my_exceptions.TooFewValsInSamplesForAnalysis(fld_filter,
+                filter_val)
+        samples.append(sample)
+    return samples
+
+def get_grouped_samples_from_db(dbe, cur, tbl, tbl_filt,
+        fld_measure, fld_filter, fld_val_clauses):
+    """
+    :return: np float arrays of values keyed by the index of the group (no key
+     if no values for the group)
+    :rtype: dict
+    """
+    debug = False
+    objqtr = getdata.get_obj_quoter_func(dbe)
+    unused, and_tbl_filt = lib.FiltLib.get_tbl_filts(tbl_filt)
+    gp_idx_cases = '\n            '.join(f'WHEN {fld_val_clause} THEN {idx}'
+        for idx, fld_val_clause in enumerate(fld_val_clauses))
+    any_gp_clause = ' OR '.join(
+        f'({fld_val_clause})' for fld_val_clause in fld_val_clauses)
+    SQL_get_grouped_lists = f"""SELECT CASE
+            {gp_idx_cases}
+        END, {objqtr(fld_measure)}
+        FROM {getdata.tblname_qtr(dbe, tbl)}
+        WHERE {objqtr(fld_measure)} IS NOT NULL
+        AND ({any_gp_clause}) {and_tbl_filt}"""
+    if debug: print(SQL_get_grouped_lists)
+    cur.execute(SQL_get_grouped_lists)
+    gp_vals = defaultdict(list)
+    for gp_idx, val in cur.fetchall():
+        gp_vals[int(gp_idx)].append(val)
+    gp_samples = {gp_idx: np.array(vals, dtype=float)
+        for gp_idx, vals in gp_vals.items()}
+    return gp_samples
+
+def get_col_samples(dbe, cur, tbl, tbl_filt, fld_names, *, flds=None,
+        db=None):
+    """
+    Get the non-null values for each of several numeric fields from a single
+    query (rather than one query per field) e.g. so every numeric variable in a
+    wide table can be checked for normality in one go. Non-numeric values
+    (SQLite lets them into numeric fields) are skipped like missing values.
+
+    :param str db: if supplied (and flds), a snapshot of the table can be used
+     (see snapshots.get_snapshot)
+    :return: np float arrays - one per field in same order as fld_names
+    :rtype: list
+    """
+    snapshot = snapshots.get_snapshot(dbe, cur, db, tbl, tbl_filt, flds)
+    if snapshot:
+        cols = [(snapshot.get_floats(fld_name, snapshot.get_not_null(fld_name))
+                if fld_name in snapshot.num_cols
+                else _get_histo_array(snapshot.get_vals(fld_name,
+                    snapshot.get_not_null(fld_name))))
+            for fld_name in fld_names]
+        return [col[~np.isnan(col)] for col in cols]
+    objqtr = getdata.get_obj_quoter_func(dbe)
+    qtbl = getdata.tblname_qtr(dbe, tbl)
+    where_tbl_filt, unused = lib.FiltLib.get_tbl_filts(tbl_filt)
+    qflds = ', '.join(objqtr(fld_name) for fld_name in fld_names)
+    SQL_get_vals = f"""SELECT {qflds}
+        FROM {qtbl}
+        {where_tbl_filt}"""
+    cur.execute(SQL_get_vals)
+    ## None -> NaN (SQLite sometimes returns strings even if REAL)
+    rows = cur.fetchall()
+    try:
+        cols = np.array(rows, dtype=float).reshape(-1, len(fld_names)).T
+    except (TypeError, ValueError):  ## a non-numeric value in a column
+        cols = [_get_histo_array(col) for col in (
+            zip(*rows) if rows else [()]*len(fld_names))]
+    return [col[~np.isnan(col)] for col in cols]
+
+def get_paired_data(dbe, cur, tbl, tbl_filt, fld_a, fld_b, unique=False, *,
+        flds=None, db=None):
     """
     For each field, returns a list of all non-missing values where there is also
     a non-missing value in the other field. Used in, for example, the paired
@@ -201,7 +353,19 @@ def get_paired_data(dbe, cur, tbl, tbl_filt, fld_a, fld_b, unique=False):
 
     :param bool unique: if True only look at unique pairs. Useful for scatter
      plotting.
-    """
+    :param str db: if supplied (and flds), a snapshot of the table can be used
+     (see snapshots.get_snapshot)
+    """
+    snapshot = snapshots.get_snapshot(dbe, cur, db, tbl, tbl_filt, flds)
+    if snapshot:
+        mask = snapshot.get_not_null(fld_a) & snapshot.get_not_null(fld_b)
+        data_tups = list(zip(snapshot.get_vals(fld_a, mask),
+            snapshot.get_vals(fld_b, mask)))
+        if unique:
+            data_tups = list(dict.fromkeys(data_tups))
+        lst_a = [float(x[0]) for x in data_tups]
+        lst_b = [float(x[1]) for x in data_tups]
+        return lst_a, lst_b, data_tups
     objqtr = getdata.get_obj_quoter_func(dbe)
     unused, and_tbl_filt = lib.FiltLib.get_tbl_filts(tbl_filt)
     fld_a_str = objqtr(fld_a)
@@ -227,25 +391,6 @@ def get_paired_data(dbe, cur, tbl, tbl_filt, fld_a, fld_b, unique=False):
     lst_b = [float(x[1]) for x in data_tups]
     return lst_a, lst_b, data_tups
 
-def get_val_quoter(dbe, flds, fld, val):
-    """
-    Get function for quoting values according to field type and value.
-
-    NB "5" is a string and must be quoted otherwise we will be matching 5s
-    instead.
-    """
-    num = True
-    if not flds[fld][mg.FLD_BOLNUMERIC]:
-        num = False
-    elif dbe == mg.DBE_SQLITE:
-        if not lib.TypeLib.is_basic_num(val):
-            num = False
-    if num:
-        val_quoter = lambda s: s
-    else:
-        val_quoter = getdata.get_val_quoter_func(dbe)
-    return val_quoter
-
 def get_unique_dim_vals(vals_used, dbe, flds, fld):
     """
     Get unique values for dimension (row or column) in form ready to use. And
@@ -266,44 +411,35 @@ def get_unique_dim_vals(vals_used, dbe, flds, fld):
         vals.append(row_val)    
     return vals
 
-def get_obs_exp(dbe, cur, tbl, tbl_filt,
-        where_tbl_filt, and_tbl_filt, flds,
-        fld_a, fld_b):
+def get_contingency_tbl(dbe, cur, tbl, and_tbl_filt, flds, fld_a, fld_b):
     """
-    Get list of observed and expected values ready for inclusion in Pearson's
-    Chi Square test.
+    Get observed frequencies for every combination of values in fld_a (rows)
+    and fld_b (columns) from a single GROUP BY query. Combinations not found in
+    the data are filled in as zeros in memory. Only includes records where
+    neither value is missing.
 
-    NB must return 0 if nothing. All cells must be filled.
+    Row and column values are both in the order the database sorts them. Row
+    values come from the counts query. Column values come from their own
+    (small) GROUP BY query because they are spread across the rows.
 
-    Returns lst_obs, lst_exp, min_count, perc_cells_lt_5, df.
-
-    NB some dbes return integers and some return Decimals.
-
-    The lists are b within a e.g. a1b1, a1b2, a1b3, a2b1, a2b2 ...
+    :return: vals_a, vals_b (ready to use as per get_unique_dim_vals), and obs
+     (np array of ints with one row per val_a and one column per val_b)
+    :rtype: tuple
     """
     debug = False
     objqtr = getdata.get_obj_quoter_func(dbe)
     qtbl = getdata.tblname_qtr(dbe, tbl)
     qfld_a = objqtr(fld_a)
     qfld_b = objqtr(fld_b)
-    ## A) get ROW vals used ***********************
-    SQL_row_vals_used = f"""\
-    SELECT {qfld_a}
+    SQL_get_obs = f"""\
+    SELECT {qfld_a}, {qfld_b}, COUNT(*)
     FROM {qtbl}
-    WHERE {qfld_b} IS NOT NULL AND {qfld_a} IS NOT NULL
+    WHERE {qfld_a} IS NOT NULL AND {qfld_b} IS NOT NULL
     {and_tbl_filt}
-    GROUP BY {qfld_a}
-    ORDER BY {qfld_a}
+    GROUP BY {qfld_a}, {qfld_b}
+    ORDER BY {qfld_a}, {qfld_b}
     """
-    cur.execute(SQL_row_vals_used)
-    row_vals_used = cur.fetchall()
-    vals_a = get_unique_dim_vals(row_vals_used, dbe, flds, fld_a)
-    if len(vals_a) > mg.MAX_CHI_DIMS:
-        raise my_exceptions.TooManyRowsInChiSquare
-    if len(vals_a) < mg.MIN_CHI_DIMS:
-        raise my_exceptions.TooFewRowsInChiSquare
-    ## B) get COL vals used (almost a repeat) ***********************
-    SQL_col_vals_used = f"""\
+    SQL_get_vals_b = f"""\
     SELECT {qfld_b}
     FROM {qtbl}
     WHERE {qfld_a} IS NOT NULL AND {qfld_b} IS NOT NULL
@@ -311,83 +447,67 @@ def get_obs_exp(dbe, cur, tbl, tbl_filt,
     GROUP BY {qfld_b}
     ORDER BY {qfld_b}
     """
-    cur.execute(SQL_col_vals_used)
-    col_vals_used = cur.fetchall()
-    vals_b = get_unique_dim_vals(col_vals_used, dbe, flds, fld_b)
+    if debug: print(SQL_get_obs)
+    cur.execute(SQL_get_obs)
+    obs_tups = cur.fetchall()
+    raw_vals_a = []
+    for raw_val_a, unused, unused in obs_tups:
+        if not raw_vals_a or raw_vals_a[-1] != raw_val_a:
+            raw_vals_a.append(raw_val_a)
+    cur.execute(SQL_get_vals_b)
+    raw_vals_b = [row[0] for row in cur.fetchall()]
+    vals_a = get_unique_dim_vals([(x, ) for x in raw_vals_a], dbe, flds, fld_a)
+    if len(vals_a) > mg.MAX_CHI_DIMS:
+        raise my_exceptions.TooManyRowsInChiSquare
+    if len(vals_a) < mg.MIN_CHI_DIMS:
+        raise my_exceptions.TooFewRowsInChiSquare
+    vals_b = get_unique_dim_vals([(x, ) for x in raw_vals_b], dbe, flds, fld_b)
     if len(vals_b) > mg.MAX_CHI_DIMS:
         raise my_exceptions.TooManyColsInChiSquare
     if len(vals_b) < mg.MIN_CHI_DIMS:
         raise my_exceptions.TooFewColsInChiSquare
     if len(vals_a)*len(vals_b) > mg.MAX_CHI_CELLS:
         raise my_exceptions.TooManyCellsInChiSquare
-    ## C) combine results of A) and B) ***********************
-    ## build SQL to get all observed values (for each a, through b's)
-    SQL_get_obs = 'SELECT '
-    sql_lst = []
-    ## need to filter by vals within SQL so may need quoting observed values etc
-    for val_a in vals_a:
-        val_quoter_a = get_val_quoter(dbe, flds, fld_a, val_a)
-        for val_b in vals_b:
-            val_quoter_b = get_val_quoter(dbe, flds, fld_b, val_b)
-            clause = (f'\nSUM(CASE WHEN {qfld_a} = {val_quoter_a(val_a)} '
-                f'AND {qfld_b} = {val_quoter_b(val_b)} THEN 1 ELSE 0 END)')
-            sql_lst.append(clause)
-    SQL_get_obs += ', '.join(sql_lst)
-    SQL_get_obs += f'\nFROM {qtbl} '
-    SQL_get_obs += f'\n{where_tbl_filt} '
-    if debug: print(SQL_get_obs)
-    cur.execute(SQL_get_obs)
-    tup_obs = cur.fetchall()[0]
-    if not tup_obs:
-        raise Exception('No observed values')
-    else:
-        if debug: print(tup_obs)
-    lst_obs = list(tup_obs)
+    idxs_a = {raw_val_a: idx for idx, raw_val_a in enumerate(raw_vals_a)}
+    idxs_b = {raw_val_b: idx for idx, raw_val_b in enumerate(raw_vals_b)}
+    obs = np.zeros((len(vals_a), len(vals_b)), dtype=int)
+    for raw_val_a, raw_val_b, freq in obs_tups:
+        obs[idxs_a[raw_val_a], idxs_b[raw_val_b]] = freq
+    return vals_a, vals_b, obs
+
+def get_obs_exp(dbe, cur, tbl, tbl_filt,
+        where_tbl_filt, and_tbl_filt, flds,
+        fld_a, fld_b):
+    """
+    Get list of observed and expected values ready for inclusion in Pearson's
+    Chi Square test.
+
+    NB must return 0 if nothing. All cells must be filled.
+
+    Returns lst_obs, lst_exp, min_count, perc_cells_lt_5, df.
+
+    Observed values and the marginals used for the expected values all come
+    from the one contingency table query (see get_contingency_tbl).
+
+    The lists are b within a e.g. a1b1, a1b2, a1b3, a2b1, a2b2 ...
+    """
+    debug = False
+    vals_a, vals_b, obs = get_contingency_tbl(
+        dbe, cur, tbl, and_tbl_filt, flds, fld_a, fld_b)
+    lst_obs = obs.flatten().tolist()
     if debug: print(f'lst_obs: {lst_obs}')
     obs_total = float(sum(lst_obs))
-    ## expected values
-    lst_fracs_a = get_fracs(cur, tbl_filt, qtbl, qfld_a, qfld_b)
-    lst_fracs_b = get_fracs(cur, tbl_filt, qtbl, qfld_b, qfld_a)
+    ## expected values - what fraction of the cross tab values are for each value in field?
+    lst_fracs_a = obs.sum(axis=1) / obs_total
+    lst_fracs_b = obs.sum(axis=0) / obs_total
     df = (len(lst_fracs_a)-1)*(len(lst_fracs_b)-1)
-    lst_exp = []
-    for frac_a in lst_fracs_a:
-        for frac_b in lst_fracs_b:
-            lst_exp.append(frac_a*frac_b*obs_total)
+    lst_exp = (np.outer(lst_fracs_a, lst_fracs_b)*obs_total).flatten().tolist()
     if debug: print(f'lst_exp: {lst_exp}')
-    if len(lst_obs) != len(lst_exp):
-        raise Exception('Different number of observed and expected values. '
-            f'{len(lst_obs)} vs {len(lst_exp)}')
     min_count = min(lst_exp)
     lst_lt_5 = [x for x in lst_exp if x < 5]
     perc_cells_lt_5 = (100 * len(lst_lt_5)) / float(len(lst_exp))
     return vals_a, vals_b, lst_obs, lst_exp, min_count, perc_cells_lt_5, df
 
-def get_fracs(cur, tbl_filt, qtbl, qfld, oth_qfld):
-    """
-    What fraction of the cross tab values are for each value in field? Leaves
-    out values where either bit of the data pair is missing. Returns lst_fracs.
-    """
-    debug = False
-    unused, and_tbl_filt = lib.FiltLib.get_tbl_filts(tbl_filt)
-    SQL_get_fracs = f"""\
-    SELECT {qfld}, COUNT(*)
-    FROM {qtbl} 
-    WHERE {qfld} IS NOT NULL
-    AND {oth_qfld} IS NOT NULL
-    {and_tbl_filt}
-    GROUP BY {qfld}
-    ORDER BY {qfld} """
-    if debug: print(SQL_get_fracs)
-    cur.execute(SQL_get_fracs)
-    lst_counts = []
-    total = 0
-    for data_tup in cur.fetchall():
-        val = data_tup[1]
-        lst_counts.append(val)
-        total += val
-    lst_fracs = [x/float(total) for x in lst_counts]
-    return lst_fracs
-
 def pearsons_chisquare(dbe, cur, tbl, flds, fld_a, fld_b,
         tbl_filt, where_tbl_filt, and_tbl_filt):
     """
@@ -521,41 +641,82 @@ def histogram (inlist, numbins=10, defaultreallimits=None, printextras=0, *,
     Usage:   histogram (inlist, numbins=10, defaultreallimits=None,
         suppressoutput=0)
     Returns: list of bin values, lowerreallimit, binsize, extrapoints
+    -------------------------------------
+    Values are binned all at once with NumPy (bin indexes then bincount) rather
+    than one at a time. Bin indexes are calculated exactly as before so counts
+    are unchanged. Values which can't be binned (including non-numeric values)
+    count as extrapoints. Best to pass an np array if calling repeatedly on the
+    same values e.g. when fixing sawtoothing.
     """
     debug = False
+    arr = _get_histo_array(inlist)
+    finite_arr = arr[np.isfinite(arr)]
     if (defaultreallimits != None):
         if (not isinstance(defaultreallimits, (list, tuple))) or \
                 len(defaultreallimits) == 1:  ## only one limit given, assumed to be lower one & upper is calc'd
             lowerreallimit = defaultreallimits
-            upperreallimit = 1.000001 * max(inlist)
+            upperreallimit = 1.000001 * finite_arr.max()
         else:  ## assume both limits given
             lowerreallimit = defaultreallimits[0]
             upperreallimit = defaultreallimits[1]
         binsize = (upperreallimit-lowerreallimit)/float(numbins)
     else:  ## no limits given for histogram, both must be calc'd
-        estbinwidth=(max(inlist)-min(inlist))/float(numbins) +1e-6  ##1=>cover all
-        binsize = ((max(inlist)-min(inlist)+estbinwidth))/float(numbins)
-        lowerreallimit = min(inlist) - binsize/2  ## lower real limit,1st bin
-        upperreallimit = 1.000001 * max(inlist)  ## added by me so able to include top val in final bin. Use same code as orig to calc upp from lower
-    bins = [0]*(numbins)
-    extrapoints = 0
-    for num in inlist:
-        try:
-            if (num-lowerreallimit) < 0 and inc_uppermost_val_in_top_bin:
-                extrapoints = extrapoints + 1
-            else:
-                if num == upperreallimit:  ## includes uppermost value in top bin
-                    bins[numbins-1] += 1
-                else:  ## the original always did this if not (num-lowerreallimit) < 0
-                    bintoincrement = int((num-lowerreallimit)/float(binsize))
-                    bins[bintoincrement] = bins[bintoincrement] + 1
-        except:
-            extrapoints = extrapoints + 1
+        (lowerreallimit, upperreallimit,
+         binsize) = get_default_histo_limits(
+            float(finite_arr.min()), float(finite_arr.max()), numbins)
+    with np.errstate(invalid='ignore'):
+        is_below = (arr - lowerreallimit) < 0
+    if inc_uppermost_val_in_top_bin:
+        is_binnable = ~is_below & np.isfinite(arr)
+    else:
+        is_binnable = np.isfinite(arr)
+    binnable = arr[is_binnable]
+    ## int() truncates towards zero. Negative idxs count from the end as per
+    ## the original list indexing.
+    with np.errstate(divide='ignore', invalid='ignore'):  ## e.g. zero binsize
+        bin_idxs = np.trunc((binnable - lowerreallimit)/float(binsize))
+    bin_idxs[binnable == upperreallimit] = numbins - 1  ## includes uppermost value in top bin
+    is_in_range = (bin_idxs >= -numbins) & (bin_idxs < numbins)
+    bin_idxs = bin_idxs[is_in_range].astype(int) % numbins
+    bins = np.bincount(bin_idxs, minlength=numbins).tolist()
+    extrapoints = len(arr) - len(bin_idxs)
     if (extrapoints > 0 and printextras == 1):
         print('\nPoints outside given histogram range =', extrapoints)
     if debug: print(bins, lowerreallimit, binsize, extrapoints)
     return (bins, lowerreallimit, binsize, extrapoints)
 
+def get_default_histo_limits(min_val, max_val, numbins):
+    """
+    The limits and bin width histogram() uses if no limits are given. Only
+    needs the min and max e.g. from the database.
+
+    :return: lowerreallimit, upperreallimit, binsize
+    :rtype: tuple
+    """
+    estbinwidth=(max_val-min_val)/float(numbins) +1e-6  ##1=>cover all
+    binsize = ((max_val-min_val+estbinwidth))/float(numbins)
+    lowerreallimit = min_val - binsize/2  ## lower real limit,1st bin
+    upperreallimit = 1.000001 * max_val  ## added by me so able to include top val in final bin. Use same code as orig to calc upp from lower
+    return lowerreallimit, upperreallimit, binsize
+
+def _get_histo_array(vals):
+    """
+    Float array of values to bin. Anything non-numeric becomes NaN so it ends up
+    in extrapoints.
+    """
+    if isinstance(vals, np.ndarray) and vals.dtype.kind == 'f':
+        return vals
+    try:
+        return np.asarray(vals, dtype=float)
+    except (TypeError, ValueError):
+        arr = np.full(len(vals), np.nan)
+        for i, val in enumerate(vals):
+            try:
+                arr[i] = float(val)
+            except (TypeError, ValueError):
+                pass
+        return arr
+
 def chisquare(f_obs,f_exp=None, df=None):
     """
     From stats.py.  Modified to receive df e.g. when in a crosstab.
@@ -692,8 +853,14 @@ def anova(samples, labels, *, high=True):
     :param bool high: high precision but much, much slower. Multiplies each by
      10 (and divides by 10 and 100 as appropriate) plus uses decimal rather than
      floating point. Needed to handle difficult datasets e.g. ANOVA test 9 from
-     NIST site.
-    """
+     NIST site. If None, only uses high precision if floats would not be
+     precise enough for any of the samples or for all values pooled (see
+     is_float_precise_enough()).
+    """
+    if high is None:
+        pooled = np.concatenate([_get_float_array(x) for x in samples])
+        high = not all(
+            is_float_precise_enough(x) for x in list(samples) + [pooled])
     n_samples = len(samples)
     sample_ns = list(map(len, samples))
     dics = []
@@ -732,17 +899,16 @@ def anova(samples, labels, *, high=True):
     return p, F, dics, sswn, dfwn, mean_squ_wn, ssbn, dfbn, mean_squ_bn
 
 def get_sswn(samples, sample_means, *, high=False):
-    "Get sum of squares within treatment"
+    """
+    Get sum of squares within treatment.
+
+    NB high must be True or False (not None) because the high precision version
+    expects samples and sample means to have already been inflated.
+    """
     if not high:
-        sswn = 0  ## sum of squares within treatment
-        for i, sample in enumerate(samples):
-            diffs = []
-            sample_mean = sample_means[i]
-            for val in sample:
-                diffs.append(val - sample_mean)
-            squ_diffs = [(x**2) for x in diffs]
-            sum_squ_diffs = sum(squ_diffs)
-            sswn += sum_squ_diffs
+        sswn = math.fsum(
+            float(np.square(_get_float_array(sample) - sample_mean).sum())
+            for sample, sample_mean in zip(samples, sample_means))
     else:    
         sswn = D('0')  ## sum of squares within treatment
         for i, sample in enumerate(samples):
@@ -764,16 +930,12 @@ def get_ssbn(samples, sample_means, n_samples, sample_ns, *, high=False):
     inflated uniformly in the high precision versions.
     """
     if not high:
-        sum_all_vals = sum(sum(x) for x in samples)
+        sum_all_vals = math.fsum(
+            float(_get_float_array(x).sum()) for x in samples)
         n_tot = sum(sample_ns)
         grand_mean = sum_all_vals/float(n_tot)  ## correction factor
-        squ_diffs = []
-        for i in range(n_samples):
-            squ_diffs.append((sample_means[i] - grand_mean)**2)
-        sum_n_x_squ_diffs = 0
-        for i in range(n_samples):
-            sum_n_x_squ_diffs += sample_ns[i]*squ_diffs[i]
-        ssbn = sum_n_x_squ_diffs
+        squ_diffs = np.square(np.asarray(sample_means, dtype=float) - grand_mean)
+        ssbn = float(np.dot(sample_ns, squ_diffs))
     else:
         sum_all_vals = lib.n2d(sum(lib.n2d(sum(x)) for x in samples))
         n_tot = lib.n2d(sum(sample_ns))
@@ -814,6 +976,8 @@ def kruskalwallish(samples, labels):
     """
     From stats.py.  No changes except also return a dic for each sample with
     median etc and args -> samples, plus df.  Also raise a different error.
+    Ranks come from the vectorised get_rank_tie_dets and samples are no longer replaced
+    with their ranks in place.
     -------------------------------------
     The Kruskal-Wallis H-test is a non-parametric ANOVA for 3 or more
     groups, requiring at least 5 subjects in each group.  This function
@@ -824,19 +988,14 @@ def kruskalwallish(samples, labels):
     Returns: H-statistic (corrected for ties), associated p-value
     """
     dics = get_summary_dics(samples, labels)
-    #n = [0]*len(samples)
-    all_data = []
     n = list(map(len, samples))
-    for i in range(len(samples)):
-        all_data = all_data + samples[i]
-    ranked = rankdata(all_data)
-    T = tiecorrect(ranked)
-    for i in range(len(samples)):
-        samples[i] = ranked[0:n[i]]
-        del ranked[0:n[i]]
+    all_data = np.concatenate([np.asarray(x, dtype=float) for x in samples])
+    rank_tie_dets = get_rank_tie_dets(all_data)
+    T = rank_tie_dets.tie_correction
+    sample_ranks = np.split(rank_tie_dets.ranks, np.cumsum(n)[:-1])
     rsums = []
     for i in range(len(samples)):
-        rsums.append(sum(samples[i])**2)
+        rsums.append(float(np.sum(sample_ranks[i]))**2)
         rsums[i] = rsums[i] / float(n[i])
     ssbn = sum(rsums)
     totaln = sum(n)
@@ -959,12 +1118,13 @@ def ttest_rel (sample_a, sample_b, label_a='Sample1', label_b='Sample2'):
     return t, p, dic_a, dic_b, df, diffs
 
 def mannwhitneyu(sample_a, sample_b, label_a='Sample1', label_b='Sample2', *,
-        headless=False):
+        headless=False, rank_tie_dets=None):
     """
     From stats.py - there are changes to variable labels and comments; and the
     output is extracted early to give greater control over presentation. Also
     added calculation of mean ranks, plus min and max values. And changed error
-    type. And added headless option.
+    type. And added headless option. Ranks and tie correction come from
+    get_rank_tie_dets.
     -------------------------------------
     Calculates a Mann-Whitney U statistic on the provided scores and returns the
     result. Use only when the n in each condition is < 20 and you have
@@ -973,21 +1133,26 @@ def mannwhitneyu(sample_a, sample_b, label_a='Sample1', label_b='Sample2', *,
     tables. Equivalent to Kruskal-Wallis H with just 2 groups.
 
     Usage:   mannwhitneyu(data)
+    :param RankTieDets rank_tie_dets: from get_rank_tie_dets(sample_a +
+     sample_b). Supply if already calculated e.g. to share with
+     mannwhitneyu_details.
     :return: u-statistic, one-tailed p-value (i.e., p(z(U))), dic_a, dic_b)
     :rtype: tuple
     """
     n_a = len(sample_a)
     n_b = len(sample_b)
-    ranked = rankdata(sample_a + sample_b, headless=headless)
+    if rank_tie_dets is None:
+        rank_tie_dets = get_rank_tie_dets(list(sample_a) + list(sample_b))
+    ranked = rank_tie_dets.ranks
     rank_a = ranked[0:n_a]  ## get the sample_a ranks
     rank_b = ranked[n_a:]  ## the rest are sample_b ranks
-    avg_rank_a = mean(rank_a)
-    avg_rank_b = mean(rank_b)
-    u_a = n_a*n_b + (n_a*(n_a + 1))/2.0 - sum(rank_a)  ## calc U for sample_a
+    avg_rank_a = float(np.mean(rank_a))
+    avg_rank_b = float(np.mean(rank_b))
+    u_a = n_a*n_b + (n_a*(n_a + 1))/2.0 - float(np.sum(rank_a))  ## calc U for sample_a
     u_b = n_a*n_b - u_a  ## remainder is U for sample_b
     bigu = max(u_a, u_b)
     smallu = min(u_a, u_b)
-    T = math.sqrt(tiecorrect(ranked))  ## correction factor for tied scores
+    T = math.sqrt(rank_tie_dets.tie_correction)  ## correction factor for tied scores
     if T == 0:
         raise my_exceptions.InadequateVariability
     sd = math.sqrt(T*n_a*n_b*(n_a + n_b + 1)/12.0)
@@ -1012,7 +1177,7 @@ def mannwhitneyu_details(
         sample_a, sample_b,
         label_a='Sample1',
         label_b='Sample2', *,
-        headless=False):
+        headless=False, rank_tie_dets=None):
     """
     The example in "Simple Statistics - A course book for the social sciences"
     Frances Clegg pp.164-166 refers to A as the shorted list (if uneven lengths)
@@ -1023,36 +1188,39 @@ def mannwhitneyu_details(
     Note - the rank all the data approach vs the make every individual
     comparison approach yield exactly the same results. The comparison approach
     is more intuitive in meaning - the ranked approach is much faster.
+
+    :param RankTieDets rank_tie_dets: from get_rank_tie_dets(sample_a +
+     sample_b) - the same one used by mannwhitneyu so values are only sorted
+     once.
     """
     len_a = len(sample_a)
     len_b = len(sample_b)
-    if len_b < len_a:  ## make a first unless b shorter
-        sample_1 = sample_b
-        sample_2 = sample_a
-        label_1 = label_b
-        label_2 = label_a
-    else:
-        sample_1 = sample_a
-        sample_2 = sample_b
+    a_is_1 = not (len_b < len_a)  ## make a first unless b shorter
+    if a_is_1:
         label_1 = label_a
         label_2 = label_b
-    len_1 = len(sample_1)
-    len_2 = len(sample_2)
-    ## vals, counter, ranking
-    val_dets_1 = [{'sample': 1, 'val': val} for val in sample_1]
-    val_dets_2 = [{'sample': 2, 'val': val} for val in sample_2]
-    val_dets = val_dets_1 + val_dets_2
-    val_dets.sort(key=lambda s: s['val'])
-    vals = sample_1 + sample_2
-    vals_ranked = rankdata(vals, headless=headless)
-    val_ranks = dict(zip(vals, vals_ranked))  ## works because all abs diffs which are the same share a single rank
-    for counter, val_det in enumerate(val_dets, 1):
-        val_det['rank'] = val_ranks[val_det['val']]
-        val_det['counter'] = counter
+        len_1 = len_a
+        len_2 = len_b
+    else:
+        label_1 = label_b
+        label_2 = label_a
+        len_1 = len_b
+        len_2 = len_a
+    if rank_tie_dets is None:
+        rank_tie_dets = get_rank_tie_dets(list(sample_a) + list(sample_b))
+    ## vals, counter, ranking - already in value order courtesy of the ranking
+    vals = list(sample_a) + list(sample_b)
+    val_dets = []
+    for counter, idx in enumerate(rank_tie_dets.sorted_idxs, 1):
+        is_a = idx < len_a
+        val_dets.append({
+            'sample': 1 if is_a == a_is_1 else 2,
+            'val': vals[idx],
+            'rank': float(rank_tie_dets.ranks[idx]),
+            'counter': counter, })
     ranks_1 = [val_det['rank'] for val_det in val_dets
         if val_det['sample'] == 1]
-    sum_rank_1 = sum(val_det['rank'] for val_det in val_dets
-        if val_det['sample'] == 1)
+    sum_rank_1 = sum(ranks_1)
     u_1 = len_1*len_2 + (len_1*(len_1 + 1))/2.0 - sum_rank_1
     u_2 = len_1*len_2 - u_1
     u = min(u_1, u_2)
@@ -1070,44 +1238,56 @@ def mannwhitneyu_details(
     }
     return details
 
+def get_nonzero_diffs(sample_a, sample_b):
+    """
+    Differences between paired values (a - b) leaving out pairs with no
+    difference. As used in the Wilcoxon Signed Ranks test.
+
+    :return: diffs in original pair order
+    :rtype: np.array
+    """
+    if len(sample_a) != len(sample_b):
+        raise ValueError('Unequal N in wilcoxont. Aborting.')
+    try:
+        diffs = (np.asarray(sample_a, dtype=float)
+            - np.asarray(sample_b, dtype=float))
+    except (TypeError, ValueError) as e:
+        raise Exception(
+            f'Both values in each pair must be numeric. Orig error: {b.ue(e)}')
+    return diffs[diffs != 0]
+
+def get_signed_rank_tie_dets(sample_a, sample_b):
+    """
+    Ranks (and ties) of the absolute non-zero differences between pairs. Share
+    between wilcoxont and wilcoxont_details so only sorted once.
+    """
+    return get_rank_tie_dets(np.abs(get_nonzero_diffs(sample_a, sample_b)))
+
 def wilcoxont(
         sample_a, sample_b,
         label_a='Sample1', label_b='Sample2', *,
-        headless=False):
+        headless=False, rank_tie_dets=None):
     """
     From stats.py.  Added error trapping. Changes to variable labels.
     Added calculation of n, medians, plus min and max values. And added headless
-    option.
+    option. Signed rank sums are vectorised.
     -------------------------------------
     Calculates the Wilcoxon T-test for related samples and returns the
     result.  A non-parametric T-test.
 
     Usage:   wilcoxont(sample_a,sample_b)
+    :param RankTieDets rank_tie_dets: from get_signed_rank_tie_dets. Supply if
+     already calculated e.g. to share with wilcoxont_details.
     Returns: a t-statistic, two-tail probability estimate, z
     """
-    if len(sample_a) != len(sample_b):
-        raise ValueError('Unequal N in wilcoxont. Aborting.')
     n = len(sample_a)
-    d=[]
-    for i in range(len(sample_a)):
-        try:
-            diff = sample_a[i] - sample_b[i]
-        except TypeError:            
-            raise Exception(
-                'Both values in pair must be numeric:'
-                f' {sample_a[i]} and {sample_b[i]}')
-        if diff != 0:
-            d.append(diff)
+    d = get_nonzero_diffs(sample_a, sample_b)
     count = len(d)
-    absd = list(map(abs, d))
-    absranked = rankdata(absd, headless=headless)
-    r_plus = 0.0
-    r_minus = 0.0
-    for i in range(len(list(absd))):
-        if d[i] < 0:
-            r_minus = r_minus + absranked[i]
-        else:
-            r_plus = r_plus + absranked[i]
+    if rank_tie_dets is None:
+        rank_tie_dets = get_rank_tie_dets(np.abs(d))
+    absranked = rank_tie_dets.ranks
+    r_minus = float(np.sum(absranked[d < 0]))
+    r_plus = float(np.sum(absranked[d > 0]))
     wt = min(r_plus, r_minus)
     mn = count * (count+1) * 0.25
     se =  math.sqrt(count*(count+1)*(2.0*count+1.0)/24.0)
@@ -1126,7 +1306,7 @@ def wilcoxont(
              mg.STATS_DIC_MAX: max_b}
     return wt, prob, dic_a, dic_b
 
-def wilcoxont_details(sample_a, sample_b):
+def wilcoxont_details(sample_a, sample_b, *, rank_tie_dets=None):
     """
     Only return worked example if a small amount of data. Otherwise return an
     empty dict.
@@ -1134,25 +1314,27 @@ def wilcoxont_details(sample_a, sample_b):
     See "Simple Statistics - A course book for the social sciences"
     Frances Clegg pp.158-160
 
-    Not focused on performance - just clarity
+    Not focused on performance - just clarity. But ranks come from the same
+    RankTieDets as wilcoxont so zero-difference pairs are left out of the
+    ranking exactly as they are in the test itself.
+
+    :param RankTieDets rank_tie_dets: from get_signed_rank_tie_dets
     """
     pairs = zip(sample_a, sample_b)
     ## diffs between pairs (always in same order but which order doesn't matter
     diff_dets = [{'a': a, 'b': b, 'diff': a-b} for a, b in pairs]
-    ## get ranks on absolutes and then attach back
-    abs_diffs = [abs(x['diff']) for x in diff_dets]
-    abs_diffs.sort()
-    ranks = rankdata(abs_diffs)
-    ## link ranks to diffs and abs diffs
-    abs_diff_ranks = dict(zip(abs_diffs, ranks))  ## works because all abs diffs which are the same share a single rank
+    nonzero_diffs = [x['diff'] for x in diff_dets if x['diff'] != 0]
+    if rank_tie_dets is None:
+        rank_tie_dets = get_signed_rank_tie_dets(sample_a, sample_b)
+    ## link ranks to diffs and abs diffs - remember, the ranks relate to the absolute value not the original value
     ranking_dets = []
-    for diff in diff_dets:
-        if diff['diff'] != 0:
-            ranking_dets.append(
-                {'diff': diff['diff'],
-                 'abs_diff': abs(diff['diff']),
-                 'rank': abs_diff_ranks[abs(diff['diff'])], })  ## remember - the ranks relates to the absolute value not the original value
-    ranking_dets.sort(key=lambda s: (abs(s['diff']), s['diff']))
+    for idx in rank_tie_dets.sorted_idxs:
+        diff = nonzero_diffs[idx]
+        ranking_dets.append(
+            {'diff': diff,
+             'abs_diff': abs(diff),
+             'rank': float(rank_tie_dets.ranks[idx]), })
+    ranking_dets.sort(key=lambda s: (abs(s['diff']), s['diff']))  ## already in abs order so only reorders signs within ties
     ## add counter
     for counter, ranking_det in enumerate(ranking_dets, 1):
         ranking_det['counter'] = counter
@@ -1254,8 +1436,8 @@ def pearsonr(x,y):
 
 def spearmanr(x, y, *, headless=False):
     """
-    From stats.py. No changes apart from addition of headless option and
-    trapping zero division error.
+    From stats.py. No changes apart from addition of headless option,
+    trapping zero division error, and vectorised ranking.
     -------------------------------------
     Calculates a Spearman rank-order correlation coefficient. Taken
     from Heiman's Basic Statistics for the Behav. Sci (1st), p.192.
@@ -1266,9 +1448,9 @@ def spearmanr(x, y, *, headless=False):
     if len(x) != len(y):
         raise ValueError('Input values not paired in spearmanr. Aborting.')
     n = len(x)
-    rankx = rankdata(x, headless=headless)
-    ranky = rankdata(y, headless=True)  ## don't ask twice
-    dsq = sumdiffsquared(rankx,ranky)
+    rankx = get_rank_tie_dets(x).ranks
+    ranky = get_rank_tie_dets(y).ranks
+    dsq = float(np.sum((rankx - ranky)**2))
     rs = 1 - 6*dsq / float(n*(n**2-1))
     try:
         t = rs * math.sqrt((n-2) / ((rs+1.0)*(1.0-rs)))
@@ -1288,13 +1470,14 @@ def spearmanr_details(sample_x, sample_y, *, headless=False):
     n_x = len(sample_x)
     if n_x != len(sample_y):
         raise Exception(f'Different sample sizes ({n_x} vs {len(sample_y)})')
-    rankx = rankdata(sample_x, headless=headless)
-    x_and_rank = list(zip(sample_x, rankx))
-    x_and_rank.sort()
+    ## ranking already sorts so no need to sort (val, rank) pairs again
+    rank_tie_dets_x = get_rank_tie_dets(sample_x)
+    x_and_rank = [(sample_x[idx], float(rank_tie_dets_x.ranks[idx]))
+        for idx in rank_tie_dets_x.sorted_idxs]
     x2rank = dict(x_and_rank)
-    ranky = rankdata(sample_y, headless=True)
-    y_and_rank = list(zip(sample_y, ranky))
-    y_and_rank.sort()
+    rank_tie_dets_y = get_rank_tie_dets(sample_y)
+    y_and_rank = [(sample_y[idx], float(rank_tie_dets_y.ranks[idx]))
+        for idx in rank_tie_dets_y.sorted_idxs]
     y2rank = dict(y_and_rank)
     n_cubed_minus_n = (n_x**3) - n_x
     diff_squareds = []
@@ -1325,9 +1508,57 @@ def spearmanr_details(sample_x, sample_y, *, headless=False):
     }
     return details
 
+def get_rank_tie_dets(vals):
+    """
+    Rank values (1-based) giving tied values the average of the ranks they
+    span, and collect everything the nonparametric tests and their worked
+    examples need about ties from the same sort. A stable argsort followed by
+    one vectorised pass over the tie groups so O(n log n) rather than the pure
+    Python shellsort used in stats.py.
+
+    Compute once per sample set and pass the result around (e.g. to both
+    mannwhitneyu and mannwhitneyu_details) rather than re-ranking.
+
+    :return: ranks (in original order of vals), sorted_idxs (idxs of vals in
+     sorted order), distinct_vals (sorted), distinct_ranks (rank shared by each
+     distinct val), val_counts (n for each distinct val i.e. the size of each
+     tie group), and tie_correction (as per tiecorrect)
+    :rtype: RankTieDets
+    """
+    arr = np.asarray(vals, dtype=float)
+    n = len(arr)
+    if n == 0:
+        return RankTieDets(np.zeros(0), np.zeros(0, dtype=int), np.zeros(0),
+            np.zeros(0), np.zeros(0, dtype=int), 1.0)
+    sorted_idxs = np.argsort(arr, kind='mergesort')
+    sorted_vals = arr[sorted_idxs]
+    is_new_val = np.concatenate(([True], sorted_vals[1:] != sorted_vals[:-1]))
+    grp_starts = np.flatnonzero(is_new_val)
+    grp_ends = np.append(grp_starts[1:], n)
+    val_counts = grp_ends - grp_starts
+    ## zero-based positions start to end-1 -> 1-based ranks start+1 to end
+    distinct_ranks = (grp_starts + grp_ends + 1) / 2.0
+    grp_idxs = np.cumsum(is_new_val) - 1
+    ranks = np.empty(n)
+    ranks[sorted_idxs] = distinct_ranks[grp_idxs]
+    tie_correction = get_tie_correction(val_counts, n) if n > 1 else 1.0  ## can't have ties with only one value
+    return RankTieDets(ranks, sorted_idxs, sorted_vals[grp_starts],
+        distinct_ranks, val_counts, tie_correction)
+
+def get_tie_correction(tie_sizes, n):
+    """
+    Tie correction factor for U or H given the sizes of each group of tied
+    values (groups of 1 make no difference). See tiecorrect.
+    """
+    tie_sizes = np.asarray(tie_sizes, dtype=float)  ## cubes overflow int64 on big samples
+    T = np.sum(tie_sizes**3 - tie_sizes) / float(n**3 - n)
+    return 1.0 - float(T)
+
 def rankdata(inlist, *, headless=False):
     """
-    From stats.py. No changes apart from headless addition and Py3 changes.
+    From stats.py. Uses get_rank_tie_dets rather than shellsort so fast enough
+    on very large samples that there is no longer any need to warn the user. headless
+    is retained so existing scripts still run. And Py3 changes.
     -------------------------------------
     Ranks the data in inlist, dealing with ties appropriately. Assumes
     a 1D inlist.  Adapted from Gary Perlman's |Stat ranksort.
@@ -1335,62 +1566,12 @@ def rankdata(inlist, *, headless=False):
     Usage:   rankdata(inlist)
     Returns: a list of length equal to inlist, containing rank scores
     """
-    mylist = list(inlist)
-    n = len(mylist)
-    # -----------------------
-    if not headless and n > mg.MAX_RANKDATA_VALS:
-        import wx
-        if wx.MessageBox(_('The rankdata function will run very slowly with '
-                "this many records (%s). Do you wish to continue?") % n,
-                caption=_('HIGH NUMBER OF RECORDS'),
-                style=wx.YES_NO) == wx.NO:
-            raise Exception('Too many records to continue with analysis')
-    # -----------------------
-    svec, ivec = shellsort(mylist)
-    sumranks = 0
-    dupcount = 0
-    newlist = [0]*n
-    for i in range(n):
-        sumranks = sumranks + i
-        dupcount = dupcount + 1
-        if i==n-1 or svec[i] != svec[i+1]:
-            averank = sumranks / float(dupcount) + 1
-            for j in range(i-dupcount+1,i+1):
-                newlist[ivec[j]] = averank
-            sumranks = 0
-            dupcount = 0
-    return newlist
-
-def shellsort(inlist):
-    """
-    From stats.py. No changes except Py3 changes.
-    -------------------------------------
-    Shellsort algorithm.  Sorts a 1D-list.
-
-    Usage:   shellsort(inlist)
-    Returns: sorted-inlist, sorting-index-vector (for original list)
-    """
-    n = len(inlist)
-    svec = copy.deepcopy(inlist)
-    ivec = list(range(n))
-    gap = int(n // 2)  ## integer division needed
-    while gap > 0:
-        for i in range(gap, n):
-            for j in range(i-gap,-1,-gap):
-                while j>=0 and svec[j]>svec[j+gap]:
-                    temp        = svec[j]
-                    svec[j]     = svec[j+gap]
-                    svec[j+gap] = temp
-                    itemp       = ivec[j]
-                    ivec[j]     = ivec[j+gap]
-                    ivec[j+gap] = itemp
-        gap = int(gap // 2)  ## integer division needed
-    ## svec is now sorted inlist, and ivec has the order svec[i] = vec[ivec[i]]
-    return svec, ivec
+    return get_rank_tie_dets(list(inlist)).ranks.tolist()
 
 def tiecorrect(rankvals):
     """
-    From stats.py. No changes.
+    From stats.py. Tie groups come from a vectorised sort (get_rank_tie_dets)
+    rather than shellsort.
     -------------------------------------
     Corrects for ties in Mann Whitney U and Kruskal Wallis H tests. See
     Siegel, S. (1956) Nonparametric Statistics for the Behavioral Sciences.
@@ -1399,103 +1580,7 @@ def tiecorrect(rankvals):
     Usage:   tiecorrect(rankvals)
     Returns: T correction factor for U or H
     """
-    sorted_data, _posn = shellsort(rankvals)
-    n = len(sorted_data)
-    T = 0.0
-    i = 0
-    while (i<n-1):
-        if sorted_data[i] == sorted_data[i+1]:
-            nties = 1
-            while (i<n-1) and (sorted_data[i] == sorted_data[i+1]):
-                nties = nties +1
-                i = i +1
-            T = T + nties**3 - nties
-        i = i+1
-    T = T / float(n**3-n)
-    return 1.0 - T
-
-def zprob(z):
-    """
-    From stats.py. No changes.
-    -------------------------------------
-    Returns the area under the normal curve 'to the left of' the given z value.
-    Thus,
-        - for z<0, zprob(z) = 1-tail probability
-        - for z>0, 1.0-zprob(z) = 1-tail probability
-        - for any z, 2.0*(1.0-zprob(abs(z))) = 2-tail probability
-    Adapted from z.c in Gary Perlman's |Stat.
-
-    Usage:   zprob(z)
-    """
-    Z_MAX = 6.0  ## maximum meaningful z-value
-    if z == 0.0:
-        x = 0.0
-    else:
-        y = 0.5 * math.fabs(z)
-        if y >= (Z_MAX*0.5):
-            x = 1.0
-        elif (y < 1.0):
-            w = y*y
-            x = ((((((((0.000124818987 * w
-                        -0.001075204047) * w +0.005198775019) * w
-                      -0.019198292004) * w +0.059054035642) * w
-                    -0.151968751364) * w +0.319152932694) * w
-                  -0.531923007300) * w +0.797884560593) * y * 2.0
-        else:
-            y = y - 2.0
-            x = (((((((((((((-0.000045255659 * y
-                             +0.000152529290) * y -0.000019538132) * y
-                           -0.000676904986) * y +0.001390604284) * y
-                         -0.000794620820) * y -0.002034254874) * y
-                       +0.006549791214) * y -0.010557625006) * y
-                     +0.011630447319) * y -0.009279453341) * y
-                   +0.005353579108) * y -0.002141268741) * y
-                 +0.000535310849) * y +0.999936657524
-    if z > 0.0:
-        prob = ((x+1.0)*0.5)
-    else:
-        prob = ((1.0-x)*0.5)
-    return prob
-
-def azprob(z):
-    """
-    From stats.py. No changes except N->np.
-    -------------------------------------
-    Returns the area under the normal curve 'to the left of' the given z value.
-    Thus,
-        - for z < 0, zprob(z) = 1-tail probability
-        - for z > 0, 1.0-zprob(z) = 1-tail probability
-        - for any z, 2.0*(1.0-zprob(abs(z))) = 2 - tail probability
-    Adapted from z.c in Gary Perlman's |Stat.  Can handle multiple dimensions.
-
-    Usage:   azprob(z)    where z is a z-value
-    """
-    def yfunc(y):
-        x = (((((((((((((-0.000045255659 * y
-                         +0.000152529290) * y -0.000019538132) * y
-                       -0.000676904986) * y +0.001390604284) * y
-                     -0.000794620820) * y -0.002034254874) * y
-                   +0.006549791214) * y -0.010557625006) * y
-                 +0.011630447319) * y -0.009279453341) * y
-               +0.005353579108) * y -0.002141268741) * y
-             +0.000535310849) * y +0.999936657524
-        return x
-
-    def wfunc(w):
-        x = ((((((((0.000124818987 * w
-                    -0.001075204047) * w +0.005198775019) * w
-                  -0.019198292004) * w +0.059054035642) * w
-                -0.151968751364) * w +0.319152932694) * w
-              -0.531923007300) * w +0.797884560593) * np.sqrt(w) * 2.0
-        return x
-
-    Z_MAX = 6.0  ## maximum meaningful z-value
-    #x = np.zeros(z.shape, np.float_) # initialize
-    y = 0.5 * np.fabs(z)
-    x = np.where(np.less(y,1.0),wfunc(y*y),yfunc(y-2.0))  ## get x's
-    x = np.where(np.greater(y, Z_MAX*0.5), 1.0, x)  ## kill those with big Z
-    prob = np.where(np.greater(z,0), (x+1)*0.5, (1-x)*0.5)
-    return prob
+    return get_rank_tie_dets(list(rankvals)).tie_correction
 
 def scoreatpercentile (vals, percent):
     """
@@ -1554,6 +1639,21 @@ def get_quartiles(vals):
         uq = (newvals[-ldepth] + newvals[-udepth]) / 2.0
     return lq, uq
 
+def get_quartile_percs(n):
+    """
+    Get the percentiles (as fractions) which give the same quartiles as
+    get_quartiles() when interpolated linearly between the nearest values (as
+    percentile_cont does in SQL) i.e. at positions 1 + perc*(n - 1). The
+    quartile depths are always whole or half so interpolation gives the same
+    averages.
+    """
+    if not n:
+        raise Exception('No values supplied to get_quartile_percs.')
+    if n == 1:
+        return 0.0, 0.0
+    depth = (int(n/2.0)+1.0) / 2.0
+    return (depth - 1) / (n - 1), (n - depth) / (n - 1)
+
 def mean(vals, *, high=False):
     """
     From stats.py. No changes except option of using Decimals instead of floats
@@ -1564,16 +1664,14 @@ def mean(vals, *, high=False):
     Assumes a '1D' list, but will function on the 1st dim of an array(!).
 
     Usage:   mean(vals)
+    -------------------------------------
+    If not high, uses a vectorised float64 calculation (see _get_fast_mean).
+    If high is None, only uses Decimals if floats are not precise enough.
     """
-    vals = list(vals)
+    vals = list(vals) if not hasattr(vals, '__len__') else vals
+    high = _get_high(vals, high)
     if not high:
-        mysum = 0
-        for val in vals:
-            try:
-                mysum += val
-            except Exception:
-                raise Exception(f'Unable to add "{val}" to running total.')
-        mean = mysum / float(len(vals))
+        mean = _get_fast_mean(_get_float_array(vals))
     else:
         tot = D('0')
         for val in vals:
@@ -1637,21 +1735,20 @@ def variance(vals, *, high=False):
     for the denominator (i.e., for estimating population variance).
 
     Usage:   variance(vals)
+    -------------------------------------
+    If not high, uses a vectorised float64 calculation (see _get_fast_ss_devs).
+    If high is None, only uses Decimals if floats are not precise enough.
     """
     n = len(vals)
     if n < 2:
         raise Exception('Need more than 1 value to calculate variance. '
             f'Values supplied: {vals}')
-    mn = mean(vals, high=high)
-    deviations = [0]*len(vals)
-    for i in range(len(vals)):
-        val = vals[i]
-        if high:
-            val = lib.n2d(val)
-        deviations[i] = val - mn
+    high = _get_high(vals, high)
     if not high:
-        var = sum_squares(deviations) / float(n-1)
+        var = _get_fast_ss_devs(_get_float_array(vals)) / float(n-1)
     else:
+        mn = mean(vals, high=high)
+        deviations = [lib.n2d(val) - mn for val in vals]
         var = sum_squares(deviations, high=high) / lib.n2d(n-1)
     return var
 
@@ -1664,18 +1761,20 @@ def samplevar (vals, *, high=False):
     N for the denominator (i.e., DESCRIBES the sample variance only).
 
     Usage:   samplevar(vals)
+    -------------------------------------
+    If not high, uses a vectorised float64 calculation (see _get_fast_ss_devs).
+    If high is None, only uses Decimals if floats are not precise enough.
     """
     n = len(vals)
     if n < 2:
         raise Exception('Need more than 1 value to calculate variance. '
             f'Values supplied: {vals}')
-    mn = mean(vals)
-    deviations = []
-    for item in vals:
-        deviations.append(item-mn)
+    high = _get_high(vals, high)
     if not high:
-        var = sum_squares(deviations) / float(n)
+        var = _get_fast_ss_devs(_get_float_array(vals)) / float(n)
     else:
+        mn = mean(vals, high=high)
+        deviations = [lib.n2d(val) - mn for val in vals]
         var = sum_squares(deviations, high=high) / lib.n2d(n)
     return var
 
@@ -1689,6 +1788,7 @@ def stdev(vals, *, high=False):
 
     Usage:   stdev(vals)
     """
+    high = _get_high(vals, high)
     try:
         if high:
             stdev = lib.n2d(math.sqrt(variance(vals, high=high)))
@@ -1708,6 +1808,7 @@ def samplestdev(vals, *, high=False):
 
     Usage:   samplestdev(vals)
     """
+    high = _get_high(vals, high)
     try:
         if high:
             stdev = lib.n2d(math.sqrt(samplevar(vals, high=high)))
@@ -1718,62 +1819,6 @@ def samplestdev(vals, *, high=False):
             'samplestdev - error getting square root. Negative variance value?')
     return stdev
 
-def betai(a, b, x, *, high=False):
-    """
-    From stats.py.  No changes apart from adding detail to error message.
-    -------------------------------------
-    Returns the incomplete beta function:
-
-        I-sub-x(a,b) = 1/B(a,b)*(Integral(0,x) of t^(a-1)(1-t)^(b-1) dt)
-
-    where a,b>0 and B(a,b) = G(a)*G(b)/(G(a+b)) where G(a) is the gamma
-    function of a.  The continued fraction formulation is implemented here,
-    using the betacf function.  (Adapted from: Numerical Recipies in C.)
-
-    Usage:   betai(a,b,x)
-    """
-    if high:        
-        a = lib.n2d(a)
-        b = lib.n2d(b)
-        x = lib.n2d(x)
-        zero = D('0')
-        one = D('1')
-        two = D('2')
-    else:
-        zero = 0.0
-        one = 1.0
-        two = 2.0
-    if (x < zero or x > one):
-        raise ValueError(f'Bad x {x} in betai')
-    if (x==zero or x==one):
-        bt = zero
-    else:
-        if high:
-            bt_raw = math.exp(
-                gammln(a+b, high=high)
-                - gammln(a, high=high)
-                - gammln(b, high=high)
-                + a*lib.n2d(math.log(x))
-                + b*lib.n2d(math.log(one - x)))
-            bt = lib.n2d(bt_raw)
-        else:
-            bt = math.exp(
-                gammln(a+b, high=high)
-                - gammln(a, high=high)
-                - gammln(b, high=high)
-                + a*math.log(x)
-                + b*math.log(1.0 - x))
-    if (x < (a + one)/(a + b + two)):
-        if high:
-            return bt*betacf(a,b,x, high=high)/a
-        else:
-            return bt*betacf(a,b,x)/float(a)
-    else:
-        if high:
-            return one-bt*betacf(b, a, one-x, high=high)/b
-        else:
-            return 1.0-bt*betacf(b,a,1.0-x)/float(b)
-
 def sum_squares(vals, *, high=False):
     """
     From stats.py. No changes except option of using Decimal instead of float,
@@ -1783,6 +1828,10 @@ def sum_squares(vals, *, high=False):
     result.
 
     Usage:   sum_squares(vals)
+    -------------------------------------
+    If not high, uses a vectorised float64 calculation. Squares are never
+    negative so there is no cancellation to worry about and high=None always
+    takes the float path.
     """
     if high:
         sum_squares = D('0')
@@ -1790,111 +1839,243 @@ def sum_squares(vals, *, high=False):
             decval = lib.n2d(val)
             sum_squares += (decval * decval)
     else:
-        sum_squares = 0
-        for val in vals:
-            sum_squares += (val * val)
+        sum_squares = float(np.square(_get_float_array(vals)).sum())
     return sum_squares
 
-def gammln(xx, *, high=False):
+def _get_float_array(vals):
     """
-    From stats.py.  No changes except using option of using Decimals not floats.
-    -------------------------------------
-    Returns the gamma function of xx.
-        Gamma(z) = Integral(0,infinity) of t^(z-1)exp(-t) dt.
-    (Adapted from: Numerical Recipies in C.)
+    Get values as a float64 np array ready for the vectorised calculations.
+    """
+    try:
+        return np.asarray(vals, dtype=float)
+    except (TypeError, ValueError) as e:
+        raise Exception(f'Unable to treat values as numbers. Orig error: {e}')
 
-    Usage:   gammln(xx)
+def _get_fast_mean(arr):
     """
-    if high:
-        intone = D('1')
-        one = D('1.0')
-        fiveptfive = D('5.5')
-        xx = lib.n2d(xx)
-        coeff = [
-            D('76.18009173'),
-            D('-86.50532033'),
-            D('24.01409822'), 
-            D('-1.231739516'),
-            D('0.120858003e-2'),
-            D('-0.536382e-5'),
-        ]
-    else:
-        intone = 1
-        one = 1.0
-        fiveptfive = 5.5
-        coeff = [
-            76.18009173,
-            -86.50532033,
-            24.01409822,
-            -1.231739516,
-            0.120858003e-2,
-            -0.536382e-5,
-        ]
-    x = xx - one
-    tmp = x + fiveptfive
-    if high:
-        tmp = tmp - (x + D('0.5')) * lib.n2d(math.log(tmp))
-    else:
-        tmp = tmp - (x + 0.5) * math.log(tmp)
-    ser = one
-    for j in range(len(coeff)):
-        x = x + intone
-        ser = ser + coeff[j] / x
-    if high:
-        gammln = -tmp + lib.n2d(math.log(D('2.50662827465')*ser))
-    else:
-        gammln = -tmp + math.log(2.50662827465*ser)
-    return gammln
+    Mean using NumPy's pairwise summation followed by a correction pass (adding
+    the mean of the residuals) which mops up most of the remaining rounding
+    error.
+    """
+    n = len(arr)
+    if not n:
+        raise ZeroDivisionError('Unable to get the mean of no values')
+    mn = arr.sum() / n
+    mn += (arr - mn).sum() / n
+    return float(mn)
 
-def betacf(a, b, x, *, high=False):
+def _get_fast_ss_devs(arr, mn=None):
     """
-    From stats.py. No changes.
-    -------------------------------------
-    This function evaluates the continued fraction form of the incomplete
-    Beta function, betai.  (Adapted from: Numerical Recipies in C.)
+    Sum of squared deviations from the mean using the corrected two-pass
+    algorithm (Chan, Golub & LeVeque 1983). The second term is zero in exact
+    arithmetic - in floating point it compensates for error in the mean.
+    """
+    mn = _get_fast_mean(arr) if mn is None else mn
+    devs = arr - mn
+    ss_devs = float(np.square(devs).sum() - devs.sum()**2 / len(arr))
+    return max(ss_devs, 0.0)
 
-    Usage:   betacf(a,b,x)
+def is_float_precise_enough(vals, *, rel_tol=FLOAT_STATS_REL_TOL):
     """
-    if high:
-        one = D('1')
-        ITMAX = D('200')
-        EPS = D('3.0e-7')
-        a = lib.n2d(a)
-        b = lib.n2d(b)
-        x = lib.n2d(x)
-        bm = az = am = one
-        qab = a+b
-        qap = a+one
-        qam = a-one
-        bz = one-qab*x/qap
+    Is float64 arithmetic precise enough for the variance (and so the standard
+    deviation, sums of squares etc) of these values?
+
+    The relative error of the corrected two-pass sum of squared deviations is
+    bounded by n*u + (n*u*k)**2 (Chan, Golub & LeVeque 1983) where u is the
+    unit roundoff and k the condition number sqrt(1 + n*mean**2/S). NumPy sums
+    in blocks of 128 and then pairwise so n is replaced by 128 + log2(n).
+    Values that are large relative to their spread e.g. the NIST test data with
+    values like 1000000000000.4 have huge condition numbers and fail the check.
+    """
+    arr = _get_float_array(vals)
+    n = len(arr)
+    if n < 2:
+        return True
+    mn = _get_fast_mean(arr)
+    ss_devs = _get_fast_ss_devs(arr, mn)
+    if ss_devs == 0:  ## every deviation exactly 0 so nothing to lose
+        return True
+    cond_num = math.sqrt(1 + n*mn*mn/ss_devs)
+    n_u = (min(n, 128) + math.log2(n)) * np.finfo(float).eps / 2
+    err_bound = n_u + (n_u*cond_num)**2
+    return err_bound <= rel_tol
+
+def _get_high(vals, high):
+    """
+    Resolve high=None (automatic) into True or False. Anything else is returned
+    unchanged.
+    """
+    if high is None:
+        return not is_float_precise_enough(vals)
+    return high
+
+class MomentsAccumulator:
+    """
+    One-pass count, mean, variance, skew, kurtosis, min and max. Batches are
+    summarised with vectorised NumPy and merged into the running totals using
+    the pairwise update formulae of Pébay (2008) - a generalisation of
+    Welford's method to higher moments. Memory use is independent of the number
+    of values.
+
+    Skew and kurtosis are defined as in skew() and kurtosis().
+    """
+
+    def __init__(self):
+        self.n = 0
+        self.mean = 0.0
+        self.m2 = 0.0  ## sums of powers of deviations from the mean
+        self.m3 = 0.0
+        self.m4 = 0.0
+        self.min = None
+        self.max = None
+
+    def add_batch(self, vals):
+        arr = _get_float_array(vals)
+        n_b = len(arr)
+        if not n_b:
+            return
+        mean_b = _get_fast_mean(arr)
+        devs = arr - mean_b
+        devs_squ = np.square(devs)
+        m2_b = float(devs_squ.sum())
+        m3_b = float(np.dot(devs_squ, devs))
+        m4_b = float(np.dot(devs_squ, devs_squ))
+        min_b, max_b = float(arr.min()), float(arr.max())
+        n_a = self.n
+        if not n_a:
+            self.n, self.mean = n_b, mean_b
+            self.m2, self.m3, self.m4 = m2_b, m3_b, m4_b
+            self.min, self.max = min_b, max_b
+            return
+        n = n_a + n_b
+        delta = mean_b - self.mean
+        delta_n = delta / n
+        m2_a, m3_a = self.m2, self.m3
+        self.m4 += (m4_b
+            + delta*delta_n**3*n_a*n_b*(n_a*n_a - n_a*n_b + n_b*n_b)
+            + 6*delta_n**2*(n_a*n_a*m2_b + n_b*n_b*m2_a)
+            + 4*delta_n*(n_a*m3_b - n_b*m3_a))
+        self.m3 += (m3_b
+            + delta*delta_n**2*n_a*n_b*(n_a - n_b)
+            + 3*delta_n*(n_a*m2_b - n_b*m2_a))
+        self.m2 += m2_b + delta*delta_n*n_a*n_b
+        self.mean += delta_n*n_b
+        self.n = n
+        self.min = min(self.min, min_b)
+        self.max = max(self.max, max_b)
+
+    @property
+    def variance(self):
+        "Uses N-1 for the denominator as per variance()"
+        if self.n < 2:
+            raise Exception('Need more than 1 value to calculate variance.')
+        return self.m2 / (self.n - 1)
+
+    @property
+    def sd(self):
+        return math.sqrt(self.variance)
+
+    @property
+    def skew(self):
+        if not self.m2:
+            return 0.0
+        return (self.m3/self.n) / (self.m2/self.n)**1.5
+
+    @property
+    def kurtosis(self):
+        if not self.m2:
+            return 0.0 - FISHER_KURTOSIS_ADJUSTMENT
+        return ((self.m4/self.n) / (self.m2/self.n)**2
+            - FISHER_KURTOSIS_ADJUSTMENT)
+
+
+class QuantileSketch:
+    """
+    Bounded-memory approximate quantiles using a simplified KLL sketch (Karnin,
+    Lang & Liberty 2016). Values arrive at level 0. Whenever a level holds more
+    than k values it is sorted and every second value (random offset) is
+    promoted to the level above where each value stands for twice as many
+    originals. Holds at most around k*log2(n/k) values and rank error is
+    typically well under 1% with the default k.
+    """
+
+    def __init__(self, k=mg.QUANTILE_SKETCH_K, *, seed=None):
+        self.k = k
+        self.n = 0
+        self.levels = [np.empty(0)]
+        self.rng = np.random.default_rng(seed)
+
+    def add_batch(self, vals):
+        arr = _get_float_array(vals)
+        self.n += len(arr)
+        self.levels[0] = np.concatenate([self.levels[0], arr])
+        level_idx = 0
+        while len(self.levels[level_idx]) > self.k:
+            level = np.sort(self.levels[level_idx])
+            if len(level) % 2:  ## keep odd one out at this level
+                self.levels[level_idx] = level[-1:]
+                level = level[:-1]
+            else:
+                self.levels[level_idx] = np.empty(0)
+            promoted = level[self.rng.integers(2)::2]
+            if level_idx + 1 == len(self.levels):
+                self.levels.append(np.empty(0))
+            self.levels[level_idx + 1] = np.concatenate(
+                [self.levels[level_idx + 1], promoted])
+            level_idx += 1
+
+    def get_quantile(self, q):
+        """
+        :param float q: between 0 and 1 e.g. 0.5 for the median
+        """
+        if not self.n:
+            raise Exception('No values supplied to get quantile.')
+        vals = np.concatenate(self.levels)
+        weights = np.concatenate([np.full(len(level), 2**level_idx)
+            for level_idx, level in enumerate(self.levels)])
+        sorted_idxs = np.argsort(vals, kind='mergesort')
+        cum_weights = np.cumsum(weights[sorted_idxs])
+        ## centre of each value's block of ranks (0 to 1) then interpolate
+        rank_fracs = (cum_weights - weights[sorted_idxs]/2) / cum_weights[-1]
+        return float(np.interp(q, rank_fracs, vals[sorted_idxs]))
+
+
+StreamingDets = namedtuple('StreamingDets',
+    'n, mean, sd, skew, kurtosis, min, max, lq, median, uq')
+
+def get_streaming_dets(cur, SQL_get_vals, *, quantiles=False,
+        batch_size=mg.STREAMING_FETCH_N):
+    """
+    Get summary details for the values returned by SQL_get_vals (first field
+    only and must exclude NULLs) without ever holding all the values in memory.
+    Rows are read fetchmany() batch by batch into a MomentsAccumulator and, if
+    quantiles, a QuantileSketch (approximate lq, median, and uq).
+
+    SD is None if fewer than 2 values. Quartiles are None unless requested.
+
+    :rtype: StreamingDets
+    """
+    moments = MomentsAccumulator()
+    sketch = QuantileSketch() if quantiles else None
+    cur.execute(SQL_get_vals)
+    while True:
+        rows = cur.fetchmany(batch_size)
+        if not rows:
+            break
+        ## SQLite sometimes returns strings even if REAL
+        batch = [float(row[0]) for row in rows]
+        moments.add_batch(batch)
+        if sketch:
+            sketch.add_batch(batch)
+    if not moments.n:
+        raise Exception('No values supplied to get streaming details.')
+    sd = moments.sd if moments.n > 1 else None
+    if sketch:
+        lq, median, uq = [sketch.get_quantile(q) for q in (0.25, 0.5, 0.75)]
     else:
-        one = 1.0
-        ITMAX = 200
-        EPS = 3.0e-7
-        bm = az = am = one
-        qab = a+b
-        qap = a+one
-        qam = a-one
-        bz = one-qab*x/qap
-    for i in range(int(ITMAX)+1):
-        if high:
-            i = lib.n2d(i)
-        em = i + one
-        tem = em + em
-        d = em*(b-em)*x/((qam+tem)*(a+tem))
-        ap = az + d*am
-        bp = bz+d*bm
-        d = -(a+em)*(qab+em)*x/((qap+tem)*(a+tem))
-        app = ap+d*az
-        bpp = bp+d*bz
-        aold = az
-        am = ap/bpp
-        bm = bp/bpp
-        az = app/bpp
-        bz = one
-        if (abs(az-aold)<(EPS*abs(az))):
-            return az
-    print('a or b too big, or ITMAX too small in Betacf.')
+        lq = median = uq = None
+    return StreamingDets(moments.n, moments.mean, sd, moments.skew,
+        moments.kurtosis, moments.min, moments.max, lq, median, uq)
 
 def summult (list1, list2):
     """
@@ -2026,94 +2207,6 @@ def sumdiffsquared(x,y):
         sds = sds + (x[i]-y[i])**2
     return sds
 
-def chisqprob(chisq, df):
-    """
-    From stats.py.  No changes.
-    -------------------------------------
-    Returns the (1-tailed) probability value associated with the provided
-    chi-square value and df.  Adapted from chisq.c in Gary Perlman's |Stat.
-
-    Usage:   chisqprob(chisq,df)
-    """
-    BIG = 20.0
-    def ex(x):
-        BIG = 20.0
-        if x < -BIG:
-            return 0.0
-        else:
-            return math.exp(x)
-
-    if chisq <=0 or df < 1:
-        return 1.0
-    a = 0.5 * chisq
-    if df%2 == 0:
-        even = 1
-    else:
-        even = 0
-    if df > 1:
-        y = ex(-a)
-    if even:
-        s = y
-    else:
-        s = 2.0 * zprob(-math.sqrt(chisq))
-    if (df > 2):
-        chisq = 0.5 * (df - 1.0)
-        if even:
-            z = 1.0
-        else:
-            z = 0.5
-        if a > BIG:
-            if even:
-                e = 0.0
-            else:
-                e = math.log(math.sqrt(math.pi))
-            c = math.log(a)
-            while (z <= chisq):
-                e = math.log(z) + e
-                s = s + ex(c*z-a-e)
-                z = z + 1.0
-            return s
-        else:
-            if even:
-                e = 1.0
-            else:
-                e = 1.0 / math.sqrt(math.pi) / math.sqrt(a)
-            c = 0.0
-            while (z <= chisq):
-                e = e * (a/float(z))
-                c = c + e
-                z = z + 1.0
-            return (c*y+s)
-    else:
-        return s
-
-def fprob (dfnum, dfden, F, *, high=False):
-    """
-    From stats.py. No changes except uses Decimals instead of floats.  
-    -------------------------------------
-    Returns the (1-tailed) significance level (p-value) of an F
-    statistic given the degrees of freedom for the numerator (dfR-dfF) and
-    the degrees of freedom for the denominator (dfF).
-
-    Usage:   fprob(dfnum, dfden, F) where usually dfnum=dfbn, dfden=dfwn
-    """
-    debug = False
-    if high:
-        dfnum = lib.n2d(dfnum)
-        dfden = lib.n2d(dfden)
-        F = lib.n2d(F)
-        a = D('0.5')*dfden
-        b = D('0.5')*dfnum
-        x = dfden/(dfden + dfnum*F)
-        if debug:
-            print('a: %s' % a)
-            print('b: %s' % b)
-            print('x: %s' % x)
-        p = betai(a, b, x, high=high)
-    else:
-        p = betai(0.5*dfden, 0.5*dfnum, dfden/float(dfden+dfnum*F), high=high)
-    return p
-
 def moment(a, moment=1, dimension=None):
     """
     From stats.py.  No changes except renamed function, N->np.
@@ -2341,25 +2434,31 @@ def skewtest(a, dimension=None):
         dimension = 0
     b2 = skew(a, dimension)
     n = float(a.shape[dimension])
-    rooted_var0 = ((n+1)*(n+3)) / (6.0*(n-2))
-    y = b2 * np.sqrt(rooted_var0)
-    beta2 = ( 3.0*(n*n+27*n-70)*(n+1)*(n+3) ) / ( (n-2.0)*(n+5)*(n+7)*(n+9) )
-    rooted_var1 = 2*(beta2-1)
-    W2 = -1 + np.sqrt(rooted_var1)
-    rooted_var2 = np.log(np.sqrt(W2))
-    delta = 1/np.sqrt(rooted_var2)
-    rooted_var3 = 2/(W2-1)
-    alpha = np.sqrt(rooted_var3)
-    y = np.where(y==0,1,y)
-    rooted_var4 = (y/alpha)**2+1
-    if rooted_var4 >= 0:
-        Z = delta*np.log(y/alpha + np.sqrt(rooted_var4))
-        c = (1.0-azprob(Z))*2
-    else:
-        Z = None
-        c = None
+    Z = _get_skewtest_zs(b2, n)
+    c = (1.0-azprob(Z))*2
     return Z, c, b2
 
+def _get_skewtest_zs(b2, n):
+    """
+    Z-scores for skewtest. Element-wise so works for many samples at once (b2
+    and n can be arrays). NaN where not calculable.
+    """
+    with np.errstate(all='ignore'):
+        rooted_var0 = ((n+1)*(n+3)) / (6.0*(n-2))
+        y = b2 * np.sqrt(rooted_var0)
+        beta2 = (( 3.0*(n*n+27*n-70)*(n+1)*(n+3) )
+            / ( (n-2.0)*(n+5)*(n+7)*(n+9) ))
+        rooted_var1 = 2*(beta2-1)
+        W2 = -1 + np.sqrt(rooted_var1)
+        rooted_var2 = np.log(np.sqrt(W2))
+        delta = 1/np.sqrt(rooted_var2)
+        rooted_var3 = 2/(W2-1)
+        alpha = np.sqrt(rooted_var3)
+        y = np.where(y==0,1,y)
+        rooted_var4 = (y/alpha)**2+1  ## never negative
+        Z = delta*np.log(y/alpha + np.sqrt(rooted_var4))
+    return Z
+
 def kurtosistest(a, dimension=None):
     """
     From stats.py.  No changes except renamed function, N->np, print updated,
@@ -2382,25 +2481,36 @@ def kurtosistest(a, dimension=None):
     if n<20:
         print('kurtosistest only valid for n>=20 ... continuing anyway, n=', n)
     kurt = kurtosis(a, dimension)  ## I changed the kurtosis code to subtract the Fischer Adjustment (3)
-    b2 = kurt + FISHER_KURTOSIS_ADJUSTMENT  ## added so that b2 is exactly as it would have been in the original stats.py
-    E = 3.0*(n-1) /(n+1)
-    varb2 = 24.0*n*(n-2)*(n-3) / ((n+1)*(n+1)*(n+3)*(n+5))
-    x = (b2-E)/np.sqrt(varb2)
     try:
-        sqrtbeta1 = 6.0*(n*n-5*n+2)/((n+7)*(n+9)) * np.sqrt((6.0*(n+3)*(n+5))/
-                                                           (n*(n-2)*(n-3)))
+        Z = _get_kurtosistest_zs(kurt, n)
     except ZeroDivisionError:
         raise Exception(
             'Unable to calculate kurtosis test. Zero division error')
-    A = 6.0 + 8.0/sqrtbeta1 *(2.0/sqrtbeta1 + np.sqrt(1+4.0/(sqrtbeta1**2)))
-    term1 = 1 -2/(9.0*A)
-    denom = 1 +x*np.sqrt(2/(A-4.0))
-    denom = np.where(np.less(denom,0), 99, denom)
-    term2 = np.where(np.equal(denom,0), term1, np.power((1-2.0/A)/denom,1/3.0))
-    Z = ( term1 - term2 ) / np.sqrt(2/(9.0*A))
-    Z = np.where(np.equal(denom,99), 0, Z)
     return Z, (1.0-azprob(Z))*2, kurt  ## I want to return the Fischer Adjusted kurtosis, not b2
 
+def _get_kurtosistest_zs(kurt, n):
+    """
+    Z-scores for kurtosistest given Fisher-adjusted kurtosis. Element-wise so
+    works for many samples at once (kurt and n can be arrays). NaN where not
+    calculable e.g. n of 2 or 3.
+    """
+    with np.errstate(all='ignore'):
+        b2 = kurt + FISHER_KURTOSIS_ADJUSTMENT  ## added so that b2 is exactly as it would have been in the original stats.py
+        E = 3.0*(n-1) /(n+1)
+        varb2 = 24.0*n*(n-2)*(n-3) / ((n+1)*(n+1)*(n+3)*(n+5))
+        x = (b2-E)/np.sqrt(varb2)
+        sqrtbeta1 = (6.0*(n*n-5*n+2)/((n+7)*(n+9))
+            * np.sqrt((6.0*(n+3)*(n+5)) / (n*(n-2)*(n-3))))
+        A = 6.0 + 8.0/sqrtbeta1 *(2.0/sqrtbeta1 + np.sqrt(1+4.0/(sqrtbeta1**2)))
+        term1 = 1 -2/(9.0*A)
+        denom = 1 +x*np.sqrt(2/(A-4.0))
+        denom = np.where(np.less(denom,0), 99, denom)
+        term2 = np.where(np.equal(denom,0), term1,
+            np.power((1-2.0/A)/denom,1/3.0))
+        Z = ( term1 - term2 ) / np.sqrt(2/(9.0*A))
+        Z = np.where(np.equal(denom,99), 0, Z)
+    return Z
+
 def normaltest(a, dimension=None):
     """
     From stats.py.  No changes except renamed function, some vars names, N->np,
@@ -2440,12 +2550,77 @@ def normaltest(a, dimension=None):
         ckurtosis = None
     try:
         k2 = np.power(zskew, 2) + np.power(zkurtosis, 2)
-        p_arr = achisqprob(k2, 2)
+        p_arr = chisqprobs(np.atleast_1d(k2), 2)
     except Exception:
         k2 = None
         p_arr = None
     return k2, p_arr, cskew, zskew, ckurtosis, zkurtosis
 
+NormalityDets = namedtuple('NormalityDets', 'n, skew, zskew, kurtosis, '
+    'zkurtosis, k2, p, y_vals, bin_start, bin_width')
+
+def get_normality_dets(samples, *, inc_histo=True):
+    """
+    Normality test results for many samples (e.g. several numeric columns, or
+    groups within one column) at once. The central moments for every sample
+    come from the one vectorised pass over all the values (bincount on sample
+    indexes) and the z-scores and p-values (as per normaltest) are calculated
+    for all samples together.
+
+    Statistics not calculable (e.g. too few values) are NaN. If inc_histo,
+    also includes histogram bin counts, start, and width (as for the
+    histogram charts) otherwise those are None.
+
+    :param list samples: sequences of (non-null) numbers
+    :return: one NormalityDets per sample
+    :rtype: list
+    """
+    arrs = [_get_float_array(sample) for sample in samples]
+    sample_ns = np.array([len(arr) for arr in arrs])
+    ns = sample_ns.astype(float)
+    n_samples = len(arrs)
+    if not n_samples:
+        return []
+    all_vals = np.concatenate(arrs)
+    sample_idxs = np.repeat(np.arange(n_samples), sample_ns)
+    with np.errstate(all='ignore'):
+        means = np.bincount(sample_idxs, weights=all_vals,
+            minlength=n_samples) / ns
+        devs = all_vals - means[sample_idxs]
+        devs_squ = np.square(devs)
+        m2 = np.bincount(sample_idxs, weights=devs_squ,
+            minlength=n_samples) / ns
+        m3 = np.bincount(sample_idxs, weights=devs_squ*devs,
+            minlength=n_samples) / ns
+        m4 = np.bincount(sample_idxs, weights=np.square(devs_squ),
+            minlength=n_samples) / ns
+        is_flat = np.equal(m2, 0)  ## skew and kurtosis set to ZERO as per skew() etc
+        skews = np.where(is_flat, 0, m3 / np.where(is_flat, 1, m2**1.5))
+        kurts = (np.where(is_flat, 0, m4 / np.where(is_flat, 1, m2**2))
+            - FISHER_KURTOSIS_ADJUSTMENT)
+        zskews = _get_skewtest_zs(skews, ns)
+        zkurts = _get_kurtosistest_zs(kurts, ns)
+        k2s = np.power(zskews, 2) + np.power(zkurts, 2)
+    ps = np.full(n_samples, np.nan)
+    has_k2 = np.isfinite(k2s)
+    ps[has_k2] = chisqprobs(k2s[has_k2], 2)
+    normality_dets = []
+    for i, arr in enumerate(arrs):
+        y_vals = bin_start = bin_width = None
+        if inc_histo and len(arr):
+            n_bins, lower_limit, upper_limit = lib.get_bins(
+                float(arr.min()), float(arr.max()),
+                n_distinct=len(np.unique(arr)))
+            y_vals, bin_start, bin_width, unused = histogram(arr, n_bins,
+                defaultreallimits=[lower_limit, upper_limit])
+            y_vals, bin_start, bin_width = fix_sawtoothing(arr, n_bins,
+                y_vals, bin_start, bin_width)
+        normality_dets.append(NormalityDets(int(sample_ns[i]),
+            float(skews[i]), float(zskews[i]), float(kurts[i]),
+            float(zkurts[i]), float(k2s[i]), float(ps[i]),
+            y_vals, bin_start, bin_width))
+    return normality_dets
+
 ## misc
 
 def obrientransform(*args):
@@ -1,3 +1,5 @@
+import threading
+
 import wx  #@UnusedImport
 import wx.html2
 
@@ -9,6 +11,8 @@ from .. import config_output
 from .. import config_ui
 from .. import output
 from .. import projects
+from . import core_stats
+from . import resampling
 
 def get_range_idxs(vals, val_a, val_b):
     """
@@ -39,6 +43,7 @@ class DlgIndep2VarConfig(wx.Dialog, config_ui.ConfigUI):
     responds to selections etc.
     """
     inc_gp_by_select = False
+    resampling_test = None  ## e.g. resampling.TTEST_IND to offer resampling
 
     def __init__(self, title, takes_range=False):
         cc = output.get_cc()
@@ -157,6 +162,14 @@ class DlgIndep2VarConfig(wx.Dialog, config_ui.ConfigUI):
         if mg.PLATFORM != mg.MAC:
             style |= wx.TOP
         szr_vars_bottom.Add(self.lbl_phrase, 0, style, 5)
+        if self.resampling_test:
+            self.btn_resample = wx.Button(self.panel_vars, -1, _('Resample'))
+            self.btn_resample.SetFont(mg.BTN_FONT)
+            self.btn_resample.Bind(wx.EVT_BUTTON, self.on_btn_resample)
+            self.btn_resample.SetToolTip(_('Permutation p-value and bootstrap '
+                'confidence interval for the selected groups'))
+            szr_vars_bottom.AddStretchSpacer(1)
+            szr_vars_bottom.Add(self.btn_resample, 0, style, 5)
         szr_vars.Add(szr_vars_top, 0)      
         szr_vars.Add(szr_vars_bottom, 0, wx.GROW)
         self.panel_vars.SetSizer(szr_vars)
@@ -703,6 +716,83 @@ class DlgIndep2VarConfig(wx.Dialog, config_ui.ConfigUI):
                 'details': mg.DEFAULT_DETAILS}
             config_ui.ConfigUI.on_btn_run(self, event, get_script_args)
 
+    def get_resampling_samples(self):
+        """
+        Samples for the selected groups (the whole range if range_gps). Read
+        here, on the GUI thread, so the cursor stays on the thread that made it.
+        """
+        dd = mg.DATADETS_OBJ
+        (unused, var_gp, unused, val_a, unused,
+         val_b, unused, var_avg, unused) = self.get_drop_vals()
+        unused, tbl_filt = lib.FiltLib.get_tbl_filt(dd.dbe, dd.db, dd.tbl)
+        if self.range_gps:
+            idx_val_a, idx_val_b = get_range_idxs(
+                self.gp_vals_sorted, val_a, val_b)
+            filter_vals = self.gp_vals_sorted[idx_val_a: idx_val_b + 1]
+        else:
+            filter_vals = [
+                self.gp_vals_sorted[self.drop_group_a.GetSelection()],
+                self.gp_vals_sorted[self.drop_group_b.GetSelection()]]
+        return core_stats.get_grouped_samples(dd.dbe, dd.cur, dd.tbl,
+            tbl_filt, dd.flds, var_avg, var_gp, filter_vals, db=dd.db)
+
+    def on_btn_resample(self, event):
+        """
+        Resampling runs in a background thread (which farms the batches out to
+        worker processes) so the dialog stays responsive. The results come back
+        via wx.CallAfter.
+        """
+        if not self.check_config_ok():
+            return
+        try:
+            samples = self.get_resampling_samples()
+        except Exception as e:
+            wx.MessageBox(
+                f'Unable to get samples to resample. Orig error: {b.ue(e)}')
+            return
+        if any(len(sample) < 2 for sample in samples):
+            wx.MessageBox(_('Each group needs at least two values to resample'))
+            return
+        self.btn_resample.Disable()
+        self.btn_resample.SetLabel(_('Resampling ...'))
+        threading.Thread(target=self._resample,
+            args=(self.resampling_test, samples), daemon=True).start()
+        event.Skip()
+
+    def _resample(self, test, samples):
+        "Runs in a background thread - no wx calls except CallAfter"
+        try:
+            dets = resampling.get_resampling_dets(test, samples,
+                n_perms=mg.RESAMPLING_ITERS, n_boots=mg.RESAMPLING_ITERS,
+                batch_n=mg.RESAMPLING_BATCH_N,
+                max_batch_elements=mg.RESAMPLING_MAX_BATCH_ELEMENTS,
+                max_secs=mg.RESAMPLING_MAX_SECS)
+        except Exception as e:
+            wx.CallAfter(self.on_resampling_done, None, b.ue(e))
+        else:
+            wx.CallAfter(self.on_resampling_done, dets, None)
+
+    def on_resampling_done(self, dets, err):
+        if not self or self.exiting:  ## closed while resampling
+            return
+        self.btn_resample.SetLabel(_('Resample'))
+        self.btn_resample.Enable()
+        if err:
+            wx.MessageBox(f'Unable to resample. Orig error: {err}')
+            return
+        wx.MessageBox(_('Statistic: %(stat)s'
+            '\nPermutation p-value: %(p)s (%(n_perms)s permutations)'
+            '\n95%% bootstrap confidence interval: %(lower)s to %(upper)s '
+            '(%(n_boots)s resamples)'
+            '\nSeed: %(seed)s')
+            % {'stat': round(dets.stat, mg.DEFAULT_STATS_DP),
+               'p': lib.OutputLib.get_p(dets.p) if dets.n_perms else '-',
+               'n_perms': dets.n_perms,
+               'lower': round(dets.ci_lower, mg.DEFAULT_STATS_DP),
+               'upper': round(dets.ci_upper, mg.DEFAULT_STATS_DP),
+               'n_boots': dets.n_boots, 'seed': dets.seed},
+            caption=_('Resampling results'))
+
     def check_config_ok(self):
         """
         Are the appropriate selections made to enable an analysis to be run?
@@ -47,33 +47,29 @@ class DlgConfig(indep2var.DlgIndep2VarConfig):
         script_lst = ['dp = 3']
         script_lst.append(
             lib.FiltLib.get_tbl_filt_clause(dd.dbe, dd.db, dd.tbl))
-        lst_samples = []
+        lst_vals_quoted = []
         lst_labels = []
         ## need sample for each of the values in range
         idx_val_a, idx_val_b = indep2var.get_range_idxs(
             self.gp_vals_sorted, val_a, val_b)
         vals_in_range = self.gp_vals_sorted[idx_val_a: idx_val_b + 1]
-        str_get_sample = ('{} = core_stats.get_list('
-            + f'dbe=mg.{mg.DBE_KEY2KEY_AS_STR[dd.dbe]}, '
-            + f'cur=cur, tbl="{dd.tbl}",'
-            + '\n    tbl_filt=tbl_filt, flds=flds, '
-            + f'fld_measure="{lib.esc_str_input(var_avg)}", '
-            + f'fld_filter="{lib.esc_str_input(var_gp)}", '
-            + 'filter_val={})')
-        for i, val in enumerate(vals_in_range):
-            sample_name = f'sample_{i}'
+        for val in vals_in_range:
             val_str_quoted = val if var_gp_numeric else f'"{val}"'
-            script_lst.append(
-                str_get_sample.format(sample_name, val_str_quoted))
-            lst_samples.append(sample_name)
+            lst_vals_quoted.append(str(val_str_quoted))
             try:
                 val_label = self.val_dics[var_gp][val]
             except KeyError:
                 val_label = str(val).title()
             lst_labels.append(val_label)
-        samples = '[{}]'.format(', '.join(lst_samples))
+        ## one query for all groups rather than one per group
+        script_lst.append('raw_samples = core_stats.get_grouped_samples('
+            + f'dbe=mg.{mg.DBE_KEY2KEY_AS_STR[dd.dbe]}, '
+            + f'cur=cur, tbl="{dd.tbl}",'
+            + '\n    tbl_filt=tbl_filt, flds=flds, '
+            + f'fld_measure="{lib.esc_str_input(var_avg)}", '
+            + f'fld_filter="{lib.esc_str_input(var_gp)}", '
+            + 'filter_vals=[{}], db=db)'.format(', '.join(lst_vals_quoted)))
         script_lst.append(f'raw_labels = {lst_labels}')
-        script_lst.append(f'raw_samples = {samples}')
         script_lst.append('raw_sample_dets = zip(raw_labels, raw_samples)')
         script_lst.append('sample_dets = [x for x in raw_sample_dets '
             'if len(x[1]) > 0]')
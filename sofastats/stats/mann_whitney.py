@@ -4,12 +4,14 @@ from sofastats import basic_lib as b
 from sofastats import my_globals as mg
 from sofastats import lib
 from sofastats.stats import indep2var
+from sofastats.stats import resampling
 
 
 class DlgConfig(indep2var.DlgIndep2VarConfig):
 
     averaged = _('Ranked')
     range_gps = False
+    resampling_test = resampling.MANN_WHITNEY
     min_data_type = mg.VAR_TYPE_ORD_KEY
 
     def get_examples(self):
@@ -53,7 +55,7 @@ sample_%s = core_stats.get_list(dbe=mg.{dbe_str}, cur=cur,
         tbl="{dd.tbl}", tbl_filt=tbl_filt, flds=flds,
         fld_measure="{lib.esc_str_input(var_ranked)}",
         fld_filter="{lib.esc_str_input(var_gp)}",
-        filter_val=%s)""")
+        filter_val=%s, db=db)""")
         val_str_quoted_a = val_a if var_gp_numeric else f'"{val_a}"'
         val_str_quoted_b = val_b if var_gp_numeric else f'"{val_b}"'
         script_lst.append(str_get_sample % ('a', val_str_quoted_a))
@@ -65,12 +67,16 @@ if len(sample_a) < 2 or len(sample_b) < 2:
         script_lst.append(f'label_a = "{label_a}"')
         script_lst.append(f'label_b = "{label_b}"')
         script_lst.append(f'label_ranked = "{label_ranked}"')
+        script_lst.append('rank_tie_dets = core_stats.get_rank_tie_dets('
+            'sample_a + sample_b)')
         script_lst.append('u, p, dic_a, dic_b, z = core_stats.mannwhitneyu('
-            'sample_a, sample_b, label_a, label_b, headless=False)')
+            'sample_a, sample_b, label_a, label_b, headless=False,'
+            '\n    rank_tie_dets=rank_tie_dets)')
         if details:
             script_lst.append(
                 'details = core_stats.mannwhitneyu_details(sample_a, sample_b,'
-                ' label_a, label_b, headless=False)')
+                ' label_a, label_b, headless=False,'
+                '\n    rank_tie_dets=rank_tie_dets)')
         else:
             script_lst.append('details = {}')
         script_lst.append(f"""
@@ -45,7 +45,7 @@ class DlgConfig(paired2var.DlgPaired2VarConfig):
         script_lst.append(f"""
 sample_a, sample_b, data_tups = core_stats.get_paired_data(dbe=mg.{dbe_str},
     cur=cur, tbl="{dd.tbl}", tbl_filt=tbl_filt, fld_a="{var_a}",
-    fld_b="{var_b}")""")
+    fld_b="{var_b}", flds=flds, db=db)""")
         script_lst.append(
             'add_to_report = %s' % ('True' if mg.ADD2RPT else 'False'))
         script_lst.append(f'css_fpath = Path("{lib.escape_pre_write(css_fpath)}")')
@@ -0,0 +1,346 @@
+"""
+Resampling inference for the core tests - permutation p-values and bootstrap
+confidence intervals for the statistics from ttest_ind, mannwhitneyu, pearsonr,
+spearmanr, and anova.
+
+Resamples are made and scored in NumPy batches (one row per resample) and the
+batches are farmed out to a process pool. Every batch gets its own generator
+spawned from a single SeedSequence so results only depend on the seed - not on
+the number of workers or the order in which batches finish. Work stops at the
+iteration cap or the time cap, whichever comes first.
+
+Memory is bounded too. Batches are shrunk so no array in a batch (resamples x
+values, or resamples x distinct values for ranks) goes over an element budget,
+and only a few batches per worker are in flight at once.
+
+Nothing here imports my_globals (and so wx) - worker processes import this
+module so callers pass in the limits (e.g. mg.RESAMPLING_ITERS) instead.
+"""
+from collections import namedtuple
+from collections import deque
+from concurrent import futures
+import math
+import os
+import time
+import numpy as np
+
+TTEST_IND = 'ttest_ind'
+MANN_WHITNEY = 'mannwhitneyu'
+PEARSONR = 'pearsonr'
+SPEARMANR = 'spearmanr'
+ANOVA = 'anova'
+PAIRED_TESTS = (PEARSONR, SPEARMANR)
+RANKED_TESTS = (MANN_WHITNEY, SPEARMANR)
+
+PERMUTATION = 'permutation'
+BOOTSTRAP = 'bootstrap'
+
+STAT_REL_TOL = 1e-9  ## so float noise doesn't make a resample less extreme
+JOBS_IN_FLIGHT_PER_WORKER = 2  ## enough to keep workers busy without piling up
+
+ResamplingDets = namedtuple('ResamplingDets',
+    'stat, p, ci_lower, ci_upper, n_perms, n_boots, seed')
+
+def _get_row_ranks(codes):
+    """
+    Average ranks (ties share the mean of the ranks they span) for every row of
+    codes.
+
+    :param np.array codes: 2D integer array. The codes are dense value codes
+     (np.unique return_inverse) so their order is the order of the values.
+    """
+    n_rows, n_cols = codes.shape
+    n_codes = int(codes.max()) + 1
+    row_offsets = (np.arange(n_rows)*n_codes)[:, np.newaxis]
+    counts = np.bincount((codes + row_offsets).ravel(),
+        minlength=n_rows*n_codes).reshape(n_rows, n_codes)
+    cum_counts = np.cumsum(counts, axis=1)
+    avg_ranks = cum_counts - (counts - 1)/2.0
+    return np.take_along_axis(avg_ranks, codes, axis=1)
+
+def _get_ttest_ind_ts(vals, ns):
+    """
+    t for each row of vals - same pooled variance approach as ttest_ind.
+    """
+    n_a, n_b = ns
+    sample_a, sample_b = vals[:, :n_a], vals[:, n_a:]
+    df = n_a + n_b - 2
+    svar = ((n_a - 1)*sample_a.var(axis=1, ddof=1)
+        + (n_b - 1)*sample_b.var(axis=1, ddof=1))/df
+    with np.errstate(divide='ignore', invalid='ignore'):
+        ts = ((sample_a.mean(axis=1) - sample_b.mean(axis=1))
+            / np.sqrt(svar*(1.0/n_a + 1.0/n_b)))
+    return ts
+
+def _get_mannwhitneyu_us(codes, ns):
+    """
+    Smaller U for each row of codes - as returned by mannwhitneyu.
+    """
+    n_a, n_b = ns
+    ranks = _get_row_ranks(codes)
+    u_a = n_a*n_b + (n_a*(n_a + 1))/2.0 - ranks[:, :n_a].sum(axis=1)
+    return np.minimum(u_a, n_a*n_b - u_a)
+
+def _get_anova_fs(vals, ns):
+    """
+    F for each row of vals - msb/msw as for anova.
+    """
+    samples = np.split(vals, np.cumsum(ns)[:-1], axis=1)
+    grand_means = vals.mean(axis=1)
+    ssbn = sum(n*(sample.mean(axis=1) - grand_means)**2
+        for n, sample in zip(ns, samples))
+    sswn = sum(((sample - sample.mean(axis=1, keepdims=True))**2).sum(axis=1)
+        for sample in samples)
+    dfbn = len(ns) - 1
+    dfwn = sum(ns) - len(ns)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        fs = (ssbn/dfbn)/(sswn/dfwn)
+    return fs
+
+def _get_pearsonr_rs(xs, ys):
+    """
+    r for each row of xs and ys. xs can be a single row shared by all ys.
+    """
+    x_devs = xs - xs.mean(axis=1, keepdims=True)
+    y_devs = ys - ys.mean(axis=1, keepdims=True)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        rs = ((x_devs*y_devs).sum(axis=1)
+            / np.sqrt((x_devs**2).sum(axis=1)*(y_devs**2).sum(axis=1)))
+    return rs
+
+def _get_spearmanr_rhos(x_codes, y_codes):
+    """
+    rho for each row of x_codes and y_codes - same d squared formula as
+    spearmanr. x_codes can be a single row shared by all y_codes.
+    """
+    n = x_codes.shape[1]
+    dsq = ((_get_row_ranks(x_codes) - _get_row_ranks(y_codes))**2).sum(axis=1)
+    return 1 - 6*dsq/float(n*(n**2 - 1))
+
+STAT_FUNCS = {
+    TTEST_IND: _get_ttest_ind_ts,
+    MANN_WHITNEY: _get_mannwhitneyu_us,
+    ANOVA: _get_anova_fs,
+    PEARSONR: _get_pearsonr_rs,
+    SPEARMANR: _get_spearmanr_rhos,
+}
+
+def _get_batch_stats(test, kind, samples, batch_n, seed_seq):
+    """
+    Make batch_n resamples and return the statistic for each of them. Runs in
+    a worker process so everything it needs is passed in (and pickled).
+
+    Permutations shuffle the pooled values between the samples (or, for paired
+    tests, shuffle y against x). Bootstraps resample with replacement within
+    each sample (or resample the pairs).
+    """
+    rng = np.random.default_rng(seed_seq)
+    stat_func = STAT_FUNCS[test]
+    if test in PAIRED_TESTS:
+        x, y = samples
+        if kind == PERMUTATION:
+            xs = x[np.newaxis, :]
+            ys = rng.permuted(np.tile(y, (batch_n, 1)), axis=1)
+        else:
+            idxs = rng.integers(0, len(x), size=(batch_n, len(x)))
+            xs, ys = x[idxs], y[idxs]
+        return stat_func(xs, ys)
+    ns = [len(sample) for sample in samples]
+    if kind == PERMUTATION:
+        vals = rng.permuted(np.tile(np.concatenate(samples), (batch_n, 1)),
+            axis=1)
+    else:
+        vals = np.hstack([
+            sample[rng.integers(0, len(sample), size=(batch_n, len(sample)))]
+            for sample in samples])
+    return stat_func(vals, ns)
+
+def _get_prepared_samples(test, samples):
+    """
+    Float arrays ready for the workers. Ranked tests get dense value codes
+    instead so ranks can be worked out per resample with a bincount.
+    """
+    samples = [np.asarray(sample, dtype=float) for sample in samples]
+    if test in PAIRED_TESTS:
+        if len(samples) != 2 or len(samples[0]) != len(samples[1]):
+            raise ValueError('Input values not paired in '
+                f'{test} resampling. Aborting.')
+        if test in RANKED_TESTS:
+            samples = [np.unique(sample, return_inverse=True)[1]
+                for sample in samples]
+    else:
+        min_samples, max_samples = (2, None) if test == ANOVA else (2, 2)
+        if (len(samples) < min_samples
+                or (max_samples and len(samples) > max_samples)):
+            raise Exception(f'Wrong number of samples ({len(samples)}) '
+                f'for {test} resampling')
+        if test in RANKED_TESTS:
+            codes = np.unique(np.concatenate(samples), return_inverse=True)[1]
+            samples = np.split(codes, np.cumsum(
+                [len(sample) for sample in samples])[:-1])
+    return samples
+
+def _get_observed_stat(test, samples):
+    if test in PAIRED_TESTS:
+        x, y = samples
+        stat = STAT_FUNCS[test](x[np.newaxis, :], y[np.newaxis, :])
+    else:
+        stat = STAT_FUNCS[test](np.concatenate(samples)[np.newaxis, :],
+            [len(sample) for sample in samples])
+    return float(stat[0])
+
+def _get_batch_n(test, samples, batch_n, max_batch_elements):
+    """
+    batch_n reduced (if needed) so the biggest arrays made for a batch have no
+    more than max_batch_elements elements. Every resample has a row of N values
+    (all values across the samples, or each of x and y) and ranked tests also
+    count ties in a row per distinct value.
+
+    :param int max_batch_elements: None for no limit
+    """
+    if max_batch_elements is None:
+        return batch_n
+    n_vals = len(samples[0]) if test in PAIRED_TESTS else sum(
+        len(sample) for sample in samples)
+    n_elements = n_vals
+    if test in RANKED_TESTS:
+        n_elements += max(int(sample.max()) + 1 for sample in samples)
+    return max(1, min(batch_n, max_batch_elements//n_elements))
+
+def _get_batch_jobs(n_perms, n_boots, batch_n, seed_seq):
+    """
+    (kind, batch size, seed sequence) for every batch. Permutation and
+    bootstrap batches are interleaved so both progress if the time cap bites.
+    Each kind gets its own child seed sequence so changing n_boots doesn't
+    change the permutations and vice versa.
+    """
+    kind_jobs = []
+    for kind, n_iters, kind_seed_seq in zip((PERMUTATION, BOOTSTRAP),
+            (n_perms, n_boots), seed_seq.spawn(2)):
+        n_batches = math.ceil(n_iters/batch_n)
+        batch_seed_seqs = kind_seed_seq.spawn(n_batches)
+        kind_jobs.append([
+            (kind, min(batch_n, n_iters - i*batch_n), batch_seed_seqs[i])
+            for i in range(n_batches)])
+    perm_jobs, boot_jobs = kind_jobs
+    jobs = []
+    for i in range(max(len(perm_jobs), len(boot_jobs))):
+        jobs.extend(kind_jobs[i] for kind_jobs in (perm_jobs, boot_jobs)
+            if i < len(kind_jobs))
+    return jobs
+
+def _run_jobs(test, samples, jobs, *, deadline, max_workers):
+    """
+    Run batch jobs until all are done or the deadline passes. Results are only
+    kept for an unbroken run of jobs from the start so a time-capped run is a
+    prefix of the full run given the same seed.
+
+    Jobs are submitted as earlier ones finish rather than all up front so only
+    JOBS_IN_FLIGHT_PER_WORKER batches per worker (and their results) are held
+    in memory at once.
+
+    :return: list of (kind, stats) in job order
+    :rtype: list
+    """
+    results = []
+    if max_workers == 1:
+        for kind, batch_n, seed_seq in jobs:
+            if deadline is not None and time.monotonic() > deadline:
+                break
+            results.append((kind,
+                _get_batch_stats(test, kind, samples, batch_n, seed_seq)))
+        return results
+    if max_workers is None:
+        max_workers = os.cpu_count() or 1
+    max_in_flight = JOBS_IN_FLIGHT_PER_WORKER*max_workers
+    executor = futures.ProcessPoolExecutor(max_workers=max_workers)
+    try:
+        jobs = iter(jobs)
+        batch_futures = deque()
+        while True:
+            for kind, batch_n, seed_seq in jobs:
+                batch_futures.append((kind, executor.submit(
+                    _get_batch_stats, test, kind, samples, batch_n, seed_seq)))
+                if len(batch_futures) >= max_in_flight:
+                    break
+            if not batch_futures:
+                break
+            kind, future = batch_futures.popleft()
+            timeout = (None if deadline is None
+                else max(deadline - time.monotonic(), 0))
+            try:
+                results.append((kind, future.result(timeout=timeout)))
+            except futures.TimeoutError:
+                break
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
+    return results
+
+def get_resampling_dets(test, samples, *, n_perms, n_boots, batch_n, ci=95,
+        seed=None, max_secs=None, max_workers=None, max_batch_elements=None):
+    """
+    Permutation p-value and bootstrap confidence interval for the statistic of
+    one of the core tests.
+
+    p-values are two-tailed for t, r, and rho (at least as far from 0 as the
+    observed statistic), use the lower tail of the smaller U (as reported by
+    mannwhitneyu) which is also two-tailed in effect (unlike the one-tailed p
+    from mannwhitneyu), and use the upper tail for F. They include the observed data as
+    one of the permutations so are never 0. Confidence intervals are percentile
+    intervals of the bootstrapped statistic.
+
+    :param str test: TTEST_IND, MANN_WHITNEY, PEARSONR, SPEARMANR, or ANOVA
+    :param list samples: for paired tests x and y, otherwise the samples (two,
+     or more for anova)
+    :param int n_perms: cap on permutations. 0 for none.
+    :param int n_boots: cap on bootstrap resamples. 0 for none.
+    :param int batch_n: resamples per batch (one job per batch). Reduced for
+     big samples if needed to stay within max_batch_elements. Results for a
+     seed depend on the batch size actually used.
+    :param int seed: makes results reproducible. If None, fresh entropy is used
+     and returned as the seed in the results.
+    :param float max_secs: time cap (None for none). Whatever has finished by
+     then is used and the counts in the results show how far it got.
+    :param int max_workers: processes to use. None means one per CPU; 1 runs
+     everything in this process.
+    :param int max_batch_elements: cap on the elements in the biggest arrays
+     made for a batch e.g. mg.RESAMPLING_MAX_BATCH_ELEMENTS. None for no cap.
+    :return: stat, p, ci_lower, ci_upper, n_perms, n_boots, seed (p and the CI
+     are NaN if there were no usable resamples of that kind)
+    :rtype: ResamplingDets
+    """
+    if test not in STAT_FUNCS:
+        raise Exception(f'Resampling not available for test "{test}"')
+    samples = _get_prepared_samples(test, samples)
+    stat = _get_observed_stat(test, samples)
+    seed_seq = np.random.SeedSequence(seed)
+    deadline = None if max_secs is None else time.monotonic() + max_secs
+    batch_n = _get_batch_n(test, samples, batch_n, max_batch_elements)
+    jobs = _get_batch_jobs(n_perms, n_boots, batch_n, seed_seq)
+    results = _run_jobs(test, samples, jobs, deadline=deadline,
+        max_workers=max_workers)
+    stats4kind = {kind: [] for kind in (PERMUTATION, BOOTSTRAP)}
+    for kind, batch_stats in results:
+        stats4kind[kind].append(batch_stats)
+    perm_stats, boot_stats = (
+        np.concatenate(stats4kind[kind]) if stats4kind[kind] else np.empty(0)
+        for kind in (PERMUTATION, BOOTSTRAP))
+    perm_stats = perm_stats[np.isfinite(perm_stats)]
+    boot_stats = boot_stats[np.isfinite(boot_stats)]
+    tol = STAT_REL_TOL*max(abs(stat), 1)
+    if test == ANOVA:
+        n_extreme = int(np.count_nonzero(perm_stats >= stat - tol))
+    elif test == MANN_WHITNEY:
+        n_extreme = int(np.count_nonzero(perm_stats <= stat + tol))
+    else:
+        n_extreme = int(np.count_nonzero(
+            np.abs(perm_stats) >= abs(stat) - tol))
+    p = ((n_extreme + 1)/float(len(perm_stats) + 1) if len(perm_stats)
+        else float('nan'))
+    if len(boot_stats):
+        tail = (100 - ci)/2.0
+        ci_lower, ci_upper = np.percentile(boot_stats, [tail, 100 - tail])
+    else:
+        ci_lower = ci_upper = np.nan
+    return ResamplingDets(stat, p, float(ci_lower), float(ci_upper),
+        len(perm_stats), len(boot_stats), seed_seq.entropy)
@@ -50,7 +50,8 @@ class DlgConfig(paired2var.DlgPaired2VarConfig):
         script_lst.append(f"""
 sample_x, sample_y, data_tups = core_stats.get_paired_data(
     dbe=mg.{dbe}, cur=cur, tbl="{dd.tbl}",
-    tbl_filt=tbl_filt, fld_a="{var_x}", fld_b="{var_y}")""")
+    tbl_filt=tbl_filt, fld_a="{var_x}", fld_b="{var_y}",
+    flds=flds, db=db)""")
         add_to_report = "True" if mg.ADD2RPT else "False"
         script_lst.append(f'add_to_report = {add_to_report}')
         script_lst.append(
@@ -0,0 +1,525 @@
+"""
+Special functions behind the p-values e.g. incomplete beta and chi square
+probabilities.
+
+The scalar functions are memoised (LRU) on their arguments because the same
+degrees of freedom and statistics come up again and again e.g. across the cells
+of a table or when a report is rerun. There are also vectorised versions
+(gammlns, betacfs, betais, fprobs, zprobs, chisqprobs) so p-values for a whole
+batch of tests can be had in a single call.
+"""
+import decimal
+from functools import lru_cache, wraps
+import math
+import numpy as np
+
+from .. import my_globals as mg
+from .. import lib
+
+D = decimal.Decimal
+
+def _lru_cached(func):
+    """
+    Memoise func using an LRU cache keyed on its arguments e.g. (df, statistic).
+    NumPy scalars are turned into plain Python numbers first so they share
+    cache entries. Anything unhashable bypasses the cache.
+    """
+    cached_func = lru_cache(maxsize=mg.SPECIAL_FUNCS_CACHE_SIZE)(func)
+
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        args = tuple((arg.item() if isinstance(arg, (np.generic, np.ndarray))
+                and np.ndim(arg) == 0 else arg)
+            for arg in args)
+        try:
+            hash(args)
+        except TypeError:
+            return func(*args, **kwargs)
+        return cached_func(*args, **kwargs)
+
+    wrapper.cache_info = cached_func.cache_info
+    wrapper.cache_clear = cached_func.cache_clear
+    return wrapper
+
+@_lru_cached
+def gammln(xx, *, high=False):
+    """
+    From stats.py.  No changes except using option of using Decimals not floats.
+    -------------------------------------
+    Returns the gamma function of xx.
+        Gamma(z) = Integral(0,infinity) of t^(z-1)exp(-t) dt.
+    (Adapted from: Numerical Recipies in C.)
+
+    Usage:   gammln(xx)
+    """
+    if high:
+        intone = D('1')
+        one = D('1.0')
+        fiveptfive = D('5.5')
+        xx = lib.n2d(xx)
+        coeff = [
+            D('76.18009173'),
+            D('-86.50532033'),
+            D('24.01409822'), 
+            D('-1.231739516'),
+            D('0.120858003e-2'),
+            D('-0.536382e-5'),
+        ]
+    else:
+        intone = 1
+        one = 1.0
+        fiveptfive = 5.5
+        coeff = [
+            76.18009173,
+            -86.50532033,
+            24.01409822,
+            -1.231739516,
+            0.120858003e-2,
+            -0.536382e-5,
+        ]
+    x = xx - one
+    tmp = x + fiveptfive
+    if high:
+        tmp = tmp - (x + D('0.5')) * lib.n2d(math.log(tmp))
+    else:
+        tmp = tmp - (x + 0.5) * math.log(tmp)
+    ser = one
+    for j in range(len(coeff)):
+        x = x + intone
+        ser = ser + coeff[j] / x
+    if high:
+        gammln = -tmp + lib.n2d(math.log(D('2.50662827465')*ser))
+    else:
+        gammln = -tmp + math.log(2.50662827465*ser)
+    return gammln
+
+
+@_lru_cached
+def betacf(a, b, x, *, high=False):
+    """
+    From stats.py. No changes.
+    -------------------------------------
+    This function evaluates the continued fraction form of the incomplete
+    Beta function, betai.  (Adapted from: Numerical Recipies in C.)
+
+    Usage:   betacf(a,b,x)
+    """
+    if high:
+        one = D('1')
+        ITMAX = D('200')
+        EPS = D('3.0e-7')
+        a = lib.n2d(a)
+        b = lib.n2d(b)
+        x = lib.n2d(x)
+        bm = az = am = one
+        qab = a+b
+        qap = a+one
+        qam = a-one
+        bz = one-qab*x/qap
+    else:
+        one = 1.0
+        ITMAX = 200
+        EPS = 3.0e-7
+        bm = az = am = one
+        qab = a+b
+        qap = a+one
+        qam = a-one
+        bz = one-qab*x/qap
+    for i in range(int(ITMAX)+1):
+        if high:
+            i = lib.n2d(i)
+        em = i + one
+        tem = em + em
+        d = em*(b-em)*x/((qam+tem)*(a+tem))
+        ap = az + d*am
+        bp = bz+d*bm
+        d = -(a+em)*(qab+em)*x/((qap+tem)*(a+tem))
+        app = ap+d*az
+        bpp = bp+d*bz
+        aold = az
+        am = ap/bpp
+        bm = bp/bpp
+        az = app/bpp
+        bz = one
+        if (abs(az-aold)<(EPS*abs(az))):
+            return az
+    print('a or b too big, or ITMAX too small in Betacf.')
+
+
+@_lru_cached
+def betai(a, b, x, *, high=False):
+    """
+    From stats.py.  No changes apart from adding detail to error message.
+    -------------------------------------
+    Returns the incomplete beta function:
+
+        I-sub-x(a,b) = 1/B(a,b)*(Integral(0,x) of t^(a-1)(1-t)^(b-1) dt)
+
+    where a,b>0 and B(a,b) = G(a)*G(b)/(G(a+b)) where G(a) is the gamma
+    function of a.  The continued fraction formulation is implemented here,
+    using the betacf function.  (Adapted from: Numerical Recipies in C.)
+
+    Usage:   betai(a,b,x)
+    """
+    if high:        
+        a = lib.n2d(a)
+        b = lib.n2d(b)
+        x = lib.n2d(x)
+        zero = D('0')
+        one = D('1')
+        two = D('2')
+    else:
+        zero = 0.0
+        one = 1.0
+        two = 2.0
+    if (x < zero or x > one):
+        raise ValueError(f'Bad x {x} in betai')
+    if (x==zero or x==one):
+        bt = zero
+    else:
+        if high:
+            bt_raw = math.exp(
+                gammln(a+b, high=high)
+                - gammln(a, high=high)
+                - gammln(b, high=high)
+                + a*lib.n2d(math.log(x))
+                + b*lib.n2d(math.log(one - x)))
+            bt = lib.n2d(bt_raw)
+        else:
+            bt = math.exp(
+                gammln(a+b, high=high)
+                - gammln(a, high=high)
+                - gammln(b, high=high)
+                + a*math.log(x)
+                + b*math.log(1.0 - x))
+    if (x < (a + one)/(a + b + two)):
+        if high:
+            return bt*betacf(a,b,x, high=high)/a
+        else:
+            return bt*betacf(a,b,x)/float(a)
+    else:
+        if high:
+            return one-bt*betacf(b, a, one-x, high=high)/b
+        else:
+            return 1.0-bt*betacf(b,a,1.0-x)/float(b)
+
+
+@_lru_cached
+def fprob (dfnum, dfden, F, *, high=False):
+    """
+    From stats.py. No changes except uses Decimals instead of floats.  
+    -------------------------------------
+    Returns the (1-tailed) significance level (p-value) of an F
+    statistic given the degrees of freedom for the numerator (dfR-dfF) and
+    the degrees of freedom for the denominator (dfF).
+
+    Usage:   fprob(dfnum, dfden, F) where usually dfnum=dfbn, dfden=dfwn
+    """
+    debug = False
+    if high:
+        dfnum = lib.n2d(dfnum)
+        dfden = lib.n2d(dfden)
+        F = lib.n2d(F)
+        a = D('0.5')*dfden
+        b = D('0.5')*dfnum
+        x = dfden/(dfden + dfnum*F)
+        if debug:
+            print('a: %s' % a)
+            print('b: %s' % b)
+            print('x: %s' % x)
+        p = betai(a, b, x, high=high)
+    else:
+        p = betai(0.5*dfden, 0.5*dfnum, dfden/float(dfden+dfnum*F), high=high)
+    return p
+
+
+@_lru_cached
+def zprob(z):
+    """
+    From stats.py. No changes.
+    -------------------------------------
+    Returns the area under the normal curve 'to the left of' the given z value.
+    Thus,
+        - for z<0, zprob(z) = 1-tail probability
+        - for z>0, 1.0-zprob(z) = 1-tail probability
+        - for any z, 2.0*(1.0-zprob(abs(z))) = 2-tail probability
+    Adapted from z.c in Gary Perlman's |Stat.
+
+    Usage:   zprob(z)
+    """
+    Z_MAX = 6.0  ## maximum meaningful z-value
+    if z == 0.0:
+        x = 0.0
+    else:
+        y = 0.5 * math.fabs(z)
+        if y >= (Z_MAX*0.5):
+            x = 1.0
+        elif (y < 1.0):
+            w = y*y
+            x = ((((((((0.000124818987 * w
+                        -0.001075204047) * w +0.005198775019) * w
+                      -0.019198292004) * w +0.059054035642) * w
+                    -0.151968751364) * w +0.319152932694) * w
+                  -0.531923007300) * w +0.797884560593) * y * 2.0
+        else:
+            y = y - 2.0
+            x = (((((((((((((-0.000045255659 * y
+                             +0.000152529290) * y -0.000019538132) * y
+                           -0.000676904986) * y +0.001390604284) * y
+                         -0.000794620820) * y -0.002034254874) * y
+                       +0.006549791214) * y -0.010557625006) * y
+                     +0.011630447319) * y -0.009279453341) * y
+                   +0.005353579108) * y -0.002141268741) * y
+                 +0.000535310849) * y +0.999936657524
+    if z > 0.0:
+        prob = ((x+1.0)*0.5)
+    else:
+        prob = ((1.0-x)*0.5)
+    return prob
+
+
+def azprob(z):
+    """
+    From stats.py. No changes except N->np.
+    -------------------------------------
+    Returns the area under the normal curve 'to the left of' the given z value.
+    Thus,
+        - for z < 0, zprob(z) = 1-tail probability
+        - for z > 0, 1.0-zprob(z) = 1-tail probability
+        - for any z, 2.0*(1.0-zprob(abs(z))) = 2 - tail probability
+    Adapted from z.c in Gary Perlman's |Stat.  Can handle multiple dimensions.
+
+    Usage:   azprob(z)    where z is a z-value
+    """
+    def yfunc(y):
+        x = (((((((((((((-0.000045255659 * y
+                         +0.000152529290) * y -0.000019538132) * y
+                       -0.000676904986) * y +0.001390604284) * y
+                     -0.000794620820) * y -0.002034254874) * y
+                   +0.006549791214) * y -0.010557625006) * y
+                 +0.011630447319) * y -0.009279453341) * y
+               +0.005353579108) * y -0.002141268741) * y
+             +0.000535310849) * y +0.999936657524
+        return x
+
+    def wfunc(w):
+        x = ((((((((0.000124818987 * w
+                    -0.001075204047) * w +0.005198775019) * w
+                  -0.019198292004) * w +0.059054035642) * w
+                -0.151968751364) * w +0.319152932694) * w
+              -0.531923007300) * w +0.797884560593) * np.sqrt(w) * 2.0
+        return x
+
+    Z_MAX = 6.0  ## maximum meaningful z-value
+    #x = np.zeros(z.shape, np.float_) # initialize
+    y = 0.5 * np.fabs(z)
+    x = np.where(np.less(y,1.0),wfunc(y*y),yfunc(y-2.0))  ## get x's
+    x = np.where(np.greater(y, Z_MAX*0.5), 1.0, x)  ## kill those with big Z
+    prob = np.where(np.greater(z,0), (x+1)*0.5, (1-x)*0.5)
+    return prob
+
+
+@_lru_cached
+def chisqprob(chisq, df):
+    """
+    From stats.py.  No changes.
+    -------------------------------------
+    Returns the (1-tailed) probability value associated with the provided
+    chi-square value and df.  Adapted from chisq.c in Gary Perlman's |Stat.
+
+    Usage:   chisqprob(chisq,df)
+    """
+    BIG = 20.0
+    def ex(x):
+        BIG = 20.0
+        if x < -BIG:
+            return 0.0
+        else:
+            return math.exp(x)
+
+    if chisq <=0 or df < 1:
+        return 1.0
+    a = 0.5 * chisq
+    if df%2 == 0:
+        even = 1
+    else:
+        even = 0
+    if df > 1:
+        y = ex(-a)
+    if even:
+        s = y
+    else:
+        s = 2.0 * zprob(-math.sqrt(chisq))
+    if (df > 2):
+        chisq = 0.5 * (df - 1.0)
+        if even:
+            z = 1.0
+        else:
+            z = 0.5
+        if a > BIG:
+            if even:
+                e = 0.0
+            else:
+                e = math.log(math.sqrt(math.pi))
+            c = math.log(a)
+            while (z <= chisq):
+                e = math.log(z) + e
+                s = s + ex(c*z-a-e)
+                z = z + 1.0
+            return s
+        else:
+            if even:
+                e = 1.0
+            else:
+                e = 1.0 / math.sqrt(math.pi) / math.sqrt(a)
+            c = 0.0
+            while (z <= chisq):
+                e = e * (a/float(z))
+                c = c + e
+                z = z + 1.0
+            return (c*y+s)
+    else:
+        return s
+
+def gammlns(xx):
+    """
+    Vectorised gammln (float only). Same algorithm so same results.
+    """
+    x = np.asarray(xx, dtype=float) - 1.0
+    tmp = x + 5.5
+    tmp = tmp - (x + 0.5) * np.log(tmp)
+    ser = np.ones(x.shape)
+    for coeff in (76.18009173, -86.50532033, 24.01409822, -1.231739516,
+            0.120858003e-2, -0.536382e-5):
+        x = x + 1
+        ser = ser + coeff / x
+    return -tmp + np.log(2.50662827465*ser)
+
+def betacfs(a, b, x):
+    """
+    Vectorised betacf (float only). Each element stops iterating once it has
+    converged, exactly as in the scalar version, so results are identical.
+    Elements which never converge are NaN.
+    """
+    ITMAX = 200
+    EPS = 3.0e-7
+    a, b, x = np.broadcast_arrays(*[np.asarray(arg, dtype=float)
+        for arg in (a, b, x)])
+    results = np.full(a.shape, np.nan)
+    todo = np.ones(a.shape, dtype=bool)
+    bm = np.ones(a.shape)
+    az = np.ones(a.shape)
+    am = np.ones(a.shape)
+    qab = a + b
+    qap = a + 1.0
+    qam = a - 1.0
+    bz = 1.0 - qab*x/qap
+    with np.errstate(all='ignore'):
+        for i in range(ITMAX+1):
+            em = i + 1.0
+            tem = em + em
+            d = em*(b-em)*x/((qam+tem)*(a+tem))
+            ap = az + d*am
+            bp = bz + d*bm
+            d = -(a+em)*(qab+em)*x/((qap+tem)*(a+tem))
+            app = ap + d*az
+            bpp = bp + d*bz
+            aold = az
+            am = ap/bpp
+            bm = bp/bpp
+            az = app/bpp
+            bz = np.ones(a.shape)
+            converged = todo & (np.abs(az-aold) < (EPS*np.abs(az)))
+            results[converged] = az[converged]
+            todo &= ~converged
+            if not todo.any():
+                break
+    return results
+
+def betais(a, b, x, *, high=False):
+    """
+    Vectorised betai. If high, each element goes through the (cached) high
+    precision scalar version instead.
+    """
+    a, b, x = np.broadcast_arrays(*[np.asarray(arg, dtype=float)
+        for arg in (a, b, x)])
+    if high:
+        return np.array([float(betai(*args, high=True))
+            for args in zip(a.flat, b.flat, x.flat)]).reshape(a.shape)
+    if ((x < 0) | (x > 1)).any():
+        raise ValueError(f'Bad x {x[(x < 0) | (x > 1)][0]} in betais')
+    with np.errstate(all='ignore'):
+        bt = np.where((x == 0) | (x == 1), 0.0, np.exp(
+            gammlns(a+b) - gammlns(a) - gammlns(b)
+            + a*np.log(x) + b*np.log(1.0 - x)))
+    is_direct = x < (a + 1.0)/(a + b + 2.0)
+    cf = betacfs(np.where(is_direct, a, b), np.where(is_direct, b, a),
+        np.where(is_direct, x, 1.0 - x))
+    return np.where(is_direct, bt*cf/a, 1.0 - bt*cf/b)
+
+def fprobs(dfnum, dfden, F, *, high=False):
+    """
+    Vectorised fprob e.g. p-values for a whole batch of ANOVAs in one call.
+    Arguments are broadcast against each other so a single df can be shared.
+    """
+    dfnum, dfden, F = np.broadcast_arrays(*[np.asarray(arg, dtype=float)
+        for arg in (dfnum, dfden, F)])
+    return betais(0.5*dfden, 0.5*dfnum, dfden/(dfden + dfnum*F), high=high)
+
+def zprobs(z):
+    "Vectorised zprob"
+    return azprob(np.asarray(z, dtype=float))
+
+def _get_chisqprobs_for_df(chisq, df):
+    """
+    Vectorised chisqprob for an array of chi square values sharing the one df.
+    Mirrors the scalar version step by step - the series only depends on df so
+    every element can share the loop.
+    """
+    BIG = 20.0
+    probs = np.ones(chisq.shape)
+    if df < 1:
+        return probs
+    has_prob = chisq > 0
+    chisq = chisq[has_prob]
+    a = 0.5 * chisq
+    even = (df % 2 == 0)
+    with np.errstate(all='ignore'):
+        y = np.where(-a < -BIG, 0.0, np.exp(-a))
+        s = y if even else 2.0 * zprobs(-np.sqrt(chisq))
+        if df > 2:
+            max_z = 0.5 * (df - 1.0)
+            z = 1.0 if even else 0.5
+            ## a > BIG - work with logs
+            e_big = (np.zeros(a.shape) if even
+                else np.full(a.shape, math.log(math.sqrt(math.pi))))
+            c_big = np.log(a)
+            s_big = s
+            ## otherwise
+            e = (np.ones(a.shape) if even
+                else 1.0 / math.sqrt(math.pi) / np.sqrt(a))
+            c = 0.0
+            while z <= max_z:
+                e_big = math.log(z) + e_big
+                x = c_big*z - a - e_big
+                s_big = s_big + np.where(x < -BIG, 0.0, np.exp(x))
+                e = e * (a/float(z))
+                c = c + e
+                z = z + 1.0
+            s = np.where(a > BIG, s_big, c*y + s)
+    probs[has_prob] = s
+    return probs
+
+def chisqprobs(chisq, df):
+    """
+    Vectorised chisqprob e.g. p-values for all the cells in a table in one
+    call. Arguments are broadcast against each other so a single df can be
+    shared.
+    """
+    chisq, df = np.broadcast_arrays(
+        np.asarray(chisq, dtype=float), np.asarray(df))
+    probs = np.ones(chisq.shape)
+    for unique_df in np.unique(df):
+        is_df = (df == unique_df)
+        probs[is_df] = _get_chisqprobs_for_df(chisq[is_df], unique_df.item())
+    return probs
@@ -4,12 +4,14 @@ from sofastats import basic_lib as b
 from sofastats import my_globals as mg
 from sofastats import lib
 from sofastats.stats import indep2var
+from sofastats.stats import resampling
 
 
 class DlgConfig(indep2var.DlgIndep2VarConfig):
 
     averaged = mg.CHART_AVERAGED_LBL
     range_gps = False
+    resampling_test = resampling.TTEST_IND
     min_data_type = mg.VAR_TYPE_QUANT_KEY
 
     def get_examples(self):
@@ -53,7 +55,7 @@ class DlgConfig(indep2var.DlgIndep2VarConfig):
 sample_%s = core_stats.get_list(dbe=mg.{dbe_str}, cur=cur,
     tbl="{dd.tbl}", tbl_filt=tbl_filt, flds=flds,
     fld_measure="{lib.esc_str_input(var_avg)}",
-    fld_filter="{lib.esc_str_input(var_gp)}", filter_val=%s)""")
+    fld_filter="{lib.esc_str_input(var_gp)}", filter_val=%s, db=db)""")
         script_lst.append(str_get_sample % ('a', val_str_quoted_a))
         script_lst.append(str_get_sample % ('b', val_str_quoted_b))
         script_lst.append("""
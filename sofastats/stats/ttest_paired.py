@@ -36,7 +36,7 @@ class DlgConfig(paired2var.DlgPaired2VarConfig):
             dbe=mg.{mg.DBE_KEY2KEY_AS_STR[dd.dbe]},
             cur=cur, tbl='{dd.tbl}', tbl_filt=tbl_filt,
             fld_a='{lib.esc_str_input(var_a)}',
-            fld_b='{lib.esc_str_input(var_b)}')"""))
+            fld_b='{lib.esc_str_input(var_b)}', flds=flds, db=db)"""))
         script_lst.append('dp = 3')
         script_lst.append(f'label_a = "{label_a}"')
         script_lst.append(f'label_b = "{label_b}"')
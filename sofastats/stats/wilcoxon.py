@@ -37,15 +37,19 @@ class DlgConfig(paired2var.DlgPaired2VarConfig):
         script_lst.append(f"""
 sample_a, sample_b, data_tups = core_stats.get_paired_data(dbe=mg.{dbe},
                 cur=cur, tbl="{dd.tbl}", tbl_filt=tbl_filt,
-                fld_a="{var_a}", fld_b="{var_b}")""")
+                fld_a="{var_a}", fld_b="{var_b}", flds=flds, db=db)""")
         script_lst.append('dp = 3')
         script_lst.append(f'label_a = "{label_a}"')
         script_lst.append(f'label_b = "{label_b}"')
+        script_lst.append('rank_tie_dets = core_stats.get_signed_rank_tie_dets('
+            'sample_a, sample_b)')
         script_lst.append('t, p, dic_a, dic_b = core_stats.wilcoxont('
-            'sample_a, sample_b, label_a, label_b, headless=False)')
+            'sample_a, sample_b, label_a, label_b, headless=False,'
+            '\n    rank_tie_dets=rank_tie_dets)')
         if details:
             script_lst.append(
-                'details = core_stats.wilcoxont_details(sample_a, sample_b)')
+                'details = core_stats.wilcoxont_details(sample_a, sample_b,'
+                ' rank_tie_dets=rank_tie_dets)')
         else:
             script_lst.append('details = {}')
         script_lst.append(f"""
@@ -1226,7 +1226,6 @@ def add_chi_square_clustered_barcharts(grid_bg, bar_colours, line_colour,
     plot.setAxesLabelSize(11)
     plot.setXTickLabelSize(get_xaxis_fontsize(val_labels_a))
     plot.setLegendLabelSize(9)
-    ## only need 6 because program limits to that. See core_stats.get_obs_exp().
     charting_pylab.config_clustered_barchart(grid_bg, bar_colours,
         plot, var_label_a, y_label, val_labels_a, val_labels_b, as_in_bs_lst)
     img_src = charting_pylab.save_report_img(add_to_report, report_fpath,
@@ -0,0 +1,114 @@
+"""
+Make many report tables over the one dataset in a single run without the GUI
+e.g. a nightly run of hundreds of similar tables with one variable swapped per
+table.
+
+Unlike running a script per table (see report_table.get_script), every table
+shares the one connection, the distinct values behind the label trees are
+only looked up once (the data is treated as unchanged for the run - see
+getdata.rerendering_tables), and all the tables are streamed into the one
+report file. The report is framed as for reports made in the GUI (css files
+comment, source and filter divider before each table - see
+output.save_to_report) so it can be opened and added to from the GUI.
+
+E.g.
+
+    specs = []
+    for fld in ['agegroup', 'country', 'browser']:
+        tree_rows = dimtables.DimNodeTree()
+        tree_rows.add_child(dimtables.DimNode(fld=fld, has_tot=True))
+        tree_cols = dimtables.DimNodeTree()
+        tree_cols.add_child(dimtables.DimNode(fld='gender',
+            measures=[mg.FREQ_KEY, mg.COLPCT_KEY]))
+        specs.append(batch_tables.TableSpec(mg.CROSSTAB, tree_rows, tree_cols,
+            titles=[f'{fld.title()} by Gender']))
+    timings = batch_tables.make_report_tables(specs, dbe=mg.DBE_SQLITE,
+        con_dets=con_dets, db='sofa_db', tbl='demo_tbl',
+        report_fpath='nightly.htm')
+"""
+from collections import namedtuple
+import time
+
+from .. import my_globals as mg
+from .. import getdata
+from .. import output
+from . import dimtables
+
+TableSpec = namedtuple('TableSpec',
+    'tab_type, tree_rows, tree_cols, titles, subtitles, show_perc',
+    defaults=(None, None, True))  ## titles and subtitles None for none
+TableTiming = namedtuple('TableTiming', 'idx, title, secs')
+
+def make_report_tables(specs, *, dbe, con_dets, db, tbl, report_fpath,
+        tbl_filt_label='', tbl_filt='', css_fpaths=None,
+        dp=mg.DEFAULT_REPORT_DP):
+    """
+    Write the report tables for all the specs into one report file.
+
+    :param list specs: TableSpecs - tab_type must be mg.FREQS, mg.CROSSTAB, or
+     mg.ROW_STATS.
+    :param dict con_dets: connection details as for a project e.g.
+     {mg.DBE_SQLITE: {'sofa_db': {'database': '/path/to/sofa_db'}}}
+    :param str tbl_filt_label: label for the filter (if any) as shown in the
+     divider before each table
+    :param str tbl_filt: the filter clause (if any) applying to every table
+    :param list css_fpaths: only the first style is used. None for the fallback
+     style.
+    :return: TableTiming for each table (in spec order)
+    :rtype: list
+    """
+    for spec in specs:
+        if spec.tab_type not in (mg.FREQS, mg.CROSSTAB, mg.ROW_STATS):
+            raise Exception(f'Unable to make batch table of type '
+                f'"{spec.tab_type}"')
+    dbe_resources = getdata.get_dbe_resources(dbe, con_dets=con_dets,
+        default_dbs={}, default_tbls={}, db=db, tbl=tbl)
+    con = dbe_resources[mg.DBE_CON]
+    cur = dbe_resources[mg.DBE_CUR]
+    flds = dbe_resources[mg.DBE_FLDS]
+    getdata.clear_vals_cache(dbe, db, tbl)  ## fresh for this run
+    css_fpaths = css_fpaths or []
+    css_idx = 0
+    source = output.get_source(db, tbl)
+    timings = []
+    try:
+        with getdata.rerendering_tables():
+            with open(report_fpath, 'w', encoding='utf-8') as fil:
+                hdr_title = (_('SOFA Statistics Report')
+                    + time.strftime(' %Y-%m-%d_%H:%M:%S'))
+                fil.write(output.get_css_fils_comment(css_fpaths))
+                fil.write(output.get_html_hdr(hdr_title, css_fpaths,
+                    new_js_n_charts=None, has_dojo=False,
+                    default_if_prob=True))
+                for idx, spec in enumerate(specs):
+                    start = time.perf_counter()
+                    titles = spec.titles or []
+                    subtitles = spec.subtitles or []
+                    if spec.tab_type in (mg.FREQS, mg.CROSSTAB):
+                        tab_test = dimtables.GenTable(titles=titles,
+                            subtitles=subtitles, tab_type=spec.tab_type,
+                            dbe=dbe, db=db, tbl=tbl, tbl_filt=tbl_filt,
+                            cur=cur, flds=flds, tree_rows=spec.tree_rows,
+                            tree_cols=spec.tree_cols,
+                            show_perc=spec.show_perc)
+                    else:
+                        tab_test = dimtables.SummTable(titles=titles,
+                            subtitles=subtitles, tab_type=spec.tab_type,
+                            dbe=dbe, db=db, tbl=tbl, tbl_filt=tbl_filt,
+                            cur=cur, flds=flds, tree_rows=spec.tree_rows,
+                            tree_cols=spec.tree_cols,
+                            show_perc=spec.show_perc)
+                    tab_test.prep_table(css_idx)
+                    fil.write('\n'*4)
+                    fil.write(output.get_divider(source, tbl_filt_label,
+                        tbl_filt, page_break_before=idx > 0))
+                    tab_test.write_html(fil, css_idx, dp=dp,
+                        page_break_after=False)
+                    fil.write('\n'*4)
+                    title = titles[0] if titles else ''
+                    timings.append(
+                        TableTiming(idx, title, time.perf_counter() - start))
+                fil.write(output.get_html_ftr())
+    finally:
+        con.close()
+    return timings
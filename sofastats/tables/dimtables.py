@@ -1,3 +1,4 @@
+from collections import namedtuple
 import math
 import numpy
 from textwrap import dedent
@@ -51,9 +52,64 @@ measure e.g. we may need a frequency, a col and a row %.
 """
 
 NOTNULL = ' %s IS NOT NULL '  ## NOT ISNULL() is not universally supported
+TOT = '_tot_'  ## stands in for a value where any non-missing value will do
 ## don't use dd - this needs to be runnable as a standalone script - everything 
 ## has to be explicit
 
+## Table results as numbers rather than HTML (see LiveTable.get_pivot_result).
+## measure2vals has an array (rows x cols) per measure - NaN if the measure
+## isn't shown under that column or can't be calculated.
+PivotResult = namedtuple('PivotResult',
+    'row_lbls, col_lbls, measures, measure2vals')
+
+## Summary table aggregates for the non-missing values in a cell (see
+## SummTable.get_row_col_dets) and the values themselves if a measure needs them
+SummAggs = namedtuple('SummAggs', 'n, min_val, max_val, tot, float_tot')
+SummCellDets = namedtuple('SummCellDets', 'aggs, vals')
+SUMM_RAW_VALS_MEASURES = {mg.MEDIAN_KEY, mg.MODE_KEY, mg.LOWER_QUARTILE_KEY,
+    mg.UPPER_QUARTILE_KEY, mg.IQR_KEY, mg.STD_DEV_KEY}
+
+
+def get_combined_aggs(group_aggs):
+    """
+    Combine the aggregates for groups (COUNT, MIN, MAX, SUM, and float SUM -
+    see SummTable.get_group_aggs) into those for all the groups together.
+
+    :return: None if there are non-numeric values so the cell can be left to
+     SummTable.get_data_val
+    :rtype: SummAggs
+    """
+    n = 0
+    min_vals, max_vals, tots, float_tots = [], [], [], []
+    for group_n, min_val, max_val, tot, float_tot in group_aggs:
+        if not group_n:
+            continue
+        if isinstance(min_val, (str, bytes)) or isinstance(
+                max_val, (str, bytes)):
+            return None
+        n += group_n
+        min_vals.append(min_val)
+        max_vals.append(max_val)
+        tots.append(tot)
+        float_tots.append(float_tot)
+    if not n:
+        return SummAggs(0, None, None, None, None)
+    if any(isinstance(tot, float) for tot in tots):
+        tot = math.fsum(tots)
+    else:  ## integer sums stay integers
+        tot = sum(tots)
+    return SummAggs(n, min(min_vals), max(max_vals), tot, math.fsum(float_tots))
+
+def get_lbl_path(node):
+    """
+    Get labels from the top of the tree down to node e.g. ('Gender', 'Male').
+    """
+    lbls = []
+    while node.parent is not None:  ## stop at root
+        lbls.append(node.label)
+        node = node.parent
+    return tuple(reversed(lbls))
+
 
 class DimNodeTree(tree.NodeTree):
     """
@@ -148,6 +204,9 @@ class LabelNode(tree.Node):
         the label nodes tree is being built from the dim node tree node (which
         is where we get it from).
 
+        filt_vals has the value behind each of the filts (TOT if any non-missing
+        value) so the filtering can be applied to grouped results without SQL.
+
         :param str label: the most important data of all - what to display for
          this node
         :param str filts: a list of all the filter clauses inherited from the
@@ -157,6 +216,7 @@ class LabelNode(tree.Node):
         :param bool is_coltot: used for calculations of data values
         """
         self.filt_flds = [] 
+        self.filt_vals = []
         if not filts:
             self.filts = []
         else:
@@ -411,9 +471,15 @@ class LiveTable(DimTable):
     """
 
     def __init__(self, titles, subtitles, tab_type, dbe, tbl, tbl_filt, cur,
-                 flds, tree_rows, tree_cols, *, show_perc=True):
+                 flds, tree_rows, tree_cols, *, show_perc=True, db=None):
         """
         cur - must return tuples, not dictionaries
+
+        :param str db: if supplied, the distinct values used to build the label
+         trees are cached (see getdata.get_cached_vals()) so re-rendering
+         the same table doesn't have to scan the table again. The results the
+         cells are calculated from are also kept for re-rendering (see
+         get_all_rows()).
         """
         self.debug = False
         self.prepared = False
@@ -424,6 +490,7 @@ class LiveTable(DimTable):
         rpt_config = mg.RPT_CONFIG[self.tab_type]
         self.default_measure = rpt_config[mg.DEFAULT_MEASURE_KEY]
         self.dbe = dbe
+        self.db = db
         self.tbl = tbl
         self.tbl_filt = tbl_filt
         self.where_tbl_filt, self.and_tbl_filt = lib.FiltLib.get_tbl_filts(
@@ -439,6 +506,19 @@ class LiveTable(DimTable):
         self.tree_cols = tree_cols
         self.show_perc = show_perc
 
+    def get_all_rows(self, SQL):
+        """
+        Get all rows returned by SQL. If db supplied, and only re-rendering
+        after a cosmetic change e.g. to decimal places, the percent symbol, or
+        style, use the results from the last run (see
+        getdata.get_tbl_results()) so only the HTML is regenerated.
+        """
+        if self.db is None:
+            self.cur.execute(SQL)
+            return self.cur.fetchall()
+        key = (self.dbe, self.db, self.tbl, SQL)
+        return getdata.get_tbl_results(self.cur, SQL, key)
+
     def get_data_cell_n(self, tree_col_labels, tree_row_labels):
         col_term_nodes = tree_col_labels.get_terminal_nodes()
         row_term_nodes = tree_row_labels.get_terminal_nodes()
@@ -465,24 +545,79 @@ class LiveTable(DimTable):
         """
         Returns False if too many cells to proceed (according to max_cells).
 
-        Used to determine whether to proceed with table or not.
+        Used to determine whether to proceed with table or not. The table HTML
+        can be streamed (see write_html) so max_cells is a budget for how long
+        we are prepared to wait rather than a memory limit. None means no
+        limit.
         """
         try:
             data_cell_n = self.get_data_cell_n(
                 self.tree_col_labels, self.tree_row_labels)
         except AttributeError:
             raise Exception('Must run prep_table() before get_cell_n_ok().')
-        return max_cells >= data_cell_n
+        return max_cells is None or max_cells >= data_cell_n
 
     def get_html(self, css_idx, *, dp, page_break_after=False):
         """
-        Get HTML for table.
+        Get HTML for table. Use write_html instead for big tables.
+        """
+        return ''.join(self.iter_html(
+            css_idx, dp=dp, page_break_after=page_break_after))
+
+    def write_html(self, fil, css_idx, *, dp, page_break_after=False):
+        """
+        Write HTML for table to fil (e.g. the report file) a chunk at a time so
+        the HTML for the full table never has to be held in memory.
+        """
+        for html_chunk in self.iter_html(
+                css_idx, dp=dp, page_break_after=page_break_after):
+            fil.write(html_chunk)
+
+    def get_pivot_result(self):
+        """
+        Get the table results as numbers (unrounded) with the row and col label
+        paths rather than as formatted HTML e.g. so they can be exported to CSV,
+        spreadsheets, or JSON without scraping the HTML.
+
+        :rtype: PivotResult
+        """
+        if not self.prepared:
+            self.prep_table(0)
+        row_term_nodes = self.tree_row_labels.get_terminal_nodes()
+        col_term_nodes = self.tree_col_labels.get_terminal_nodes()
+        vals = numpy.array(list(self.iter_raw_vals(
+                row_filters_lst=[x.filts for x in row_term_nodes],
+                row_filt_flds_lst=[x.filt_flds for x in row_term_nodes],
+                row_filt_vals_lst=[x.filt_vals for x in row_term_nodes],
+                col_measures_lst=[x.measure for x in col_term_nodes],
+                col_filters_lst=[x.filts for x in col_term_nodes],
+                col_tots_lst=[x.is_coltot for x in col_term_nodes],
+                col_filt_flds_lst=[x.filt_flds for x in col_term_nodes],
+                col_term_nodes=col_term_nodes)),
+            dtype=float).reshape(len(row_term_nodes), len(col_term_nodes))
+        row_lbls = [get_lbl_path(node) for node in row_term_nodes]
+        ## col terminal nodes are the measures under each col label path
+        col_lbl_per_col = [get_lbl_path(node.parent) for node in col_term_nodes]
+        col_lbls = list(dict.fromkeys(col_lbl_per_col))
+        measures = list(dict.fromkeys(node.measure for node in col_term_nodes))
+        measure2vals = {measure: numpy.full((len(row_lbls), len(col_lbls)),
+            numpy.nan) for measure in measures}
+        for data_col_idx, (node, col_lbl) in enumerate(
+                zip(col_term_nodes, col_lbl_per_col)):
+            col_idx = col_lbls.index(col_lbl)
+            measure2vals[node.measure][:, col_idx] = vals[:, data_col_idx]
+        return PivotResult(row_lbls, col_lbls, measures, measure2vals)
+
+    def iter_html(self, css_idx, *, dp, page_break_after=False):
+        """
+        Yield HTML for table in chunks. Body rows are yielded one at a time as
+        their data cells are ready. Joined together, the chunks are the full
+        HTML for the table.
         """
-        html = []
         title_dets_html = output.get_title_dets_html(self.titles,
             self.subtitles, css_idx, istable=True)
-        html.append(title_dets_html)
-        html.append(f"{mg.REPORT_TABLE_START}<table cellspacing='0'>\n")  ## IE6 no support CSS borderspacing
+        yield title_dets_html
+        yield f"\n{mg.REPORT_TABLE_START}<table cellspacing='0'>\n"  ## IE6 no support CSS borderspacing
         if not (self.prepared and self.prep_css_idx == css_idx):
             ## need to get fresh - otherwise, can skip this step. Did it in prep.
             (self.row_label_rows_lst,
@@ -490,16 +625,14 @@ class LiveTable(DimTable):
              row_label_cols_n) = self.get_row_dets(css_idx)
             (self.tree_col_labels,
              self.hdr_html) = self.get_hdr_dets(row_label_cols_n, css_idx)
-        row_label_rows_lst = self.get_body_html_rows(self.row_label_rows_lst,
-            self.tree_row_labels, self.tree_col_labels, css_idx, dp=dp)
-        body_html = '\n\n<tbody>'
-        for row in row_label_rows_lst:
+        yield '\n' + self.hdr_html
+        yield '\n\n\n<tbody>'
+        for row in self.iter_body_html_rows(self.row_label_rows_lst,
+                self.tree_row_labels, self.tree_col_labels, css_idx, dp=dp):
             ## flatten row list
-            body_html += '\n' + ''.join(row) + '</tr>'
-        body_html += '\n</tbody>'
-        html.append(self.hdr_html)
-        html.append(body_html)
-        html.append('\n</table>')
+            yield '\n' + ''.join(row) + '</tr>'
+        yield '\n</tbody>'
+        html = ['\n</table>']
         try:
             if self.warnings:
                 html.append('<p><b>%s</b><p>' % _('Warnings'))
@@ -525,7 +658,7 @@ class LiveTable(DimTable):
         title = (self.titles[0] if self.titles else overall_title)
         output.append_divider(html, title, indiv_title='',
             item_type=mg.TAB_TYPE2LBL[self.tab_type])
-        return '\n'.join(html)
+        yield '\n' + '\n'.join(html)
 
     def get_hdr_dets(self, row_label_cols_n, css_idx):
         """
@@ -542,15 +675,18 @@ class LiveTable(DimTable):
                 'the col no vars item')
         return self.process_hdr_tree(tree_col_labels, row_label_cols_n, css_idx)
 
-    def get_body_html_rows(self, row_label_rows_lst,
+    def iter_body_html_rows(self, row_label_rows_lst,
             tree_row_labels, tree_col_labels, css_idx, *, dp):
         """
-        Make table body rows based on contents of row_label_rows_lst:
+        Yield table body rows based on contents of row_label_rows_lst:
         e.g. [['<tr>', "<td class='firstrowvar' rowspan='8'>Gender</td>" ...],
         ...]
-        It already contains row label data - we need to add the data cells into
-        the appropriate row list within row_label_rows_lst before concatenating
+        It already contains row label data - we need to add the data cells to
+        the appropriate row list from row_label_rows_lst before concatenating
         and appending '</tr>'.
+
+        If there is a problem, a single problem cell is yielded instead (after
+        any rows already yielded).
         """
         debug = False
         try:
@@ -565,17 +701,18 @@ class LiveTable(DimTable):
                 print(row_filters_lst)
                 print(col_term_nodes)
             row_filt_flds_lst = [x.filt_flds for x in row_term_nodes]
+            row_filt_vals_lst = [x.filt_vals for x in row_term_nodes]
             data_cells_n = len(row_term_nodes) * len(col_term_nodes)
             if self.debug or debug:
                 print(f'{data_cells_n} data cells in table')
-            row_label_rows_lst = self.get_row_labels_row_lst(row_filters_lst,
+            yield from self.iter_row_label_rows(row_filters_lst,
                 row_filt_flds_lst, col_measures_lst, col_filters_lst,
                 col_tots_lst, col_filt_flds_lst, row_label_rows_lst,
-                data_cells_n, col_term_nodes, css_idx, dp)
+                data_cells_n, col_term_nodes, css_idx, dp,
+                row_filt_vals_lst=row_filt_vals_lst)
         except Exception as e:
-            row_label_rows_lst = ['<td>Problem getting table output: '
-                f'Orig error: {b.ue(e)}</td>']
-        return row_label_rows_lst
+            yield ('<td>Problem getting table output: '
+                f'Orig error: {b.ue(e)}</td>')
 
     def get_row_dets(self, css_idx):
         """
@@ -804,7 +941,6 @@ class LiveTable(DimTable):
         We do this by filtering the raw data by the appropriate row and column
         filters. If any records remain, we can show the cell.
         """
-        TOT = '_tot_'
         debug = False
         if debug:
             print('running add_subtree_if_vals') 
@@ -813,8 +949,12 @@ class LiveTable(DimTable):
         SQL_get_vals = self.get_vals_sql(
             fld, tree_dims_node, tree_labels_node, oth_dim_root)
         if debug: print(SQL_get_vals)
-        self.cur.execute(SQL_get_vals)
-        all_vals = self.cur.fetchall()
+        if self.db is None:
+            self.cur.execute(SQL_get_vals)
+            all_vals = self.cur.fetchall()
+        else:
+            key = (self.dbe, self.db, self.tbl, SQL_get_vals)
+            all_vals = getdata.get_cached_vals(self.cur, SQL_get_vals, key)
         ## some of these values might not be broken text
         if debug: print(all_vals)
         if not all_vals:
@@ -848,6 +988,7 @@ class LiveTable(DimTable):
             is_coltot=(is_tot and dim == mg.COLDIM_KEY)
             val_node = node_lev1.add_child(
                 LabelNode(label=val_label, filts=val_node_filts))
+            val_node.filt_vals = tree_labels_node.filt_vals + [val]
             ## if node has children, send through again to add further subtree
             if terminal_var:  ## a terminal node - add measures
                 ## only gen and sum table cols can have measures
@@ -896,6 +1037,7 @@ class LiveTable(DimTable):
             label = mg.MEASURE_KEY2LBL[measure]
             measure_node = LabelNode(label, filts, measure, is_coltot=is_coltot)
             measure_node.filt_flds = filt_flds
+            measure_node.filt_vals = label_node.filt_vals
             label_node.add_child(measure_node)
 
     def tree_fld_lsts_to_clause(self, tree_fld_lsts):
@@ -923,6 +1065,46 @@ class LiveTable(DimTable):
             ## e.g. see method documentation at top
             return clause
 
+    def get_fld2codes(self, data_rows, flds):
+        """
+        Code the values of each field so rows can be filtered in memory.
+
+        :param list data_rows: rows from the database - the first fields
+         in each row must be flds (in that order)
+        :return: e.g. {'gender': (codes, {1: 0, 2: 1})} where codes has the
+         code for each row's value for that field (-1 if missing) and the dict
+         maps values to codes.
+        :rtype: dict
+        """
+        fld2codes = {}
+        for fld_idx, fld in enumerate(flds):
+            val2code = {}
+            codes = numpy.empty(len(data_rows), dtype=numpy.int64)
+            for row_idx, row in enumerate(data_rows):
+                val = row[fld_idx]
+                codes[row_idx] = (-1 if val is None
+                    else val2code.setdefault(val, len(val2code)))
+            fld2codes[fld] = (codes, val2code)
+        return fld2codes
+
+    def get_group_mask(self, filt_flds, filt_vals, fld2codes, n_groups, *,
+            is_tot4oth_dim=False):
+        """
+        Which rows (or groups) meet all the filters for a row or col. If is_tot4oth_dim,
+        the final field only has to be non-missing - see
+        get_dim_filts_4_oth_dim_tot_lst.
+        """
+        mask = numpy.ones(n_groups, dtype=bool)
+        if is_tot4oth_dim and filt_vals:
+            filt_vals = filt_vals[:-1] + [TOT]
+        for fld, val in zip(filt_flds, filt_vals):
+            codes, val2code = fld2codes[fld]
+            if val == TOT:
+                mask &= (codes != -1)
+            else:
+                mask &= (codes == val2code.get(val, -2))
+        return mask
+
 
 class GenTable(LiveTable):
     "A general table (not a summary table)"
@@ -931,6 +1113,27 @@ class GenTable(LiveTable):
     var_summarised = False
     row_var_optional = False
 
+    def __init__(self, titles, subtitles, tab_type, dbe, tbl, tbl_filt, cur,
+            flds, tree_rows, tree_cols, *, show_perc=True, db=None,
+            use_group_by=mg.GEN_TABLE_USE_GROUP_BY, con_dets=None,
+            con_pool_size=mg.CON_POOL_SIZE):
+        """
+        :param bool use_group_by: if True, get all the data values from a single
+         GROUP BY query rather than from batches of SUM(CASE ...) clauses (each
+         batch a full scan of the table).
+        :param dict con_dets: only for the SUM(CASE ...) fallback (use_group_by
+         False). If supplied (along with db), the batches are run side by side
+         through a getdata.ConPool of con_pool_size connections. Results are
+         still in cell order. Not passed by the generated scripts because the
+         default GROUP BY approach is a single query with nothing to share out.
+        """
+        LiveTable.__init__(self, titles, subtitles, tab_type, dbe, tbl,
+            tbl_filt, cur, flds, tree_rows, tree_cols, show_perc=show_perc,
+            db=db)
+        self.use_group_by = use_group_by
+        self.con_dets = con_dets
+        self.con_pool_size = con_pool_size
+
     def get_data_sql(self, SQL_table_select_clauses_lst):
         """
         Get SQL for data values e.g. percentages, frequencies etc.
@@ -965,38 +1168,116 @@ class GenTable(LiveTable):
         tot4dim_filt_lst[-1] = last_dim_filter
         return tot4dim_filt_lst
 
-    def get_row_labels_row_lst(self, row_filters_lst, row_filt_flds_lst,
+    def iter_row_label_rows(self, row_filters_lst, row_filt_flds_lst,
             col_measures_lst, col_filters_lst, col_tots_lst, col_filt_flds_lst,
-            row_label_rows_lst, data_cells_n, col_term_nodes, css_idx, dp):
+            row_label_rows_lst, data_cells_n, col_term_nodes, css_idx, dp, *,
+            row_filt_vals_lst=None):
         """
-        Get list of row data. Each row in the list is represented by a row of
-        strings to concatenate, one per data point.
+        Yield row data one row at a time. Each row is represented by a list of
+        strings to concatenate - the row labels then one per data point.
 
-        Build lists of data item HTML (data_item_presn_lst) and data item values
-        (results) ready to combine.
+        col_presn_lst is a list of tuples with left and right HTML wrappers for
+        data ("<td class='%s'>" % cellclass, "</td>") plus the measure label
+        for each col. The same wrappers apply to every row.
 
-        data_item_presn_lst is a list of tuples with left and right HTML
-        wrappers for data ("<td class='%s'>" % cellclass, "</td>").
-
-        As each data point is processed, a tuple is added to the list.
-
-        results is built once per batch of data points for database efficiency
-        reasons. Each call returns multiple values.
+        results either come from a single GROUP BY query (see
+        get_group_by_results) or from batches of SUM(CASE ...) clauses as each
+        batch comes back (see iter_sum_case_results).
         """
-        debug = False
         CSS_FIRST_DATACELL = mg.CSS_SUFFIX_TEMPLATE % (
             mg.CSS_FIRST_DATACELL, css_idx)
         CSS_DATACELL = mg.CSS_SUFFIX_TEMPLATE % (mg.CSS_DATACELL, css_idx)
+        col_presn_lst = []
+        first = True  ## styling
+        for colmeasure in col_measures_lst:
+            if first:
+                cellclass = CSS_FIRST_DATACELL
+                first = False
+            else:
+                cellclass = CSS_DATACELL
+            col_presn_lst.append((f"<td class='{cellclass}'>",
+                mg.MEASURE_KEY2LBL[colmeasure], '</td>'))
+        results = self.iter_raw_vals(row_filters_lst, row_filt_flds_lst,
+            row_filt_vals_lst, col_measures_lst, col_filters_lst, col_tots_lst,
+            col_filt_flds_lst, col_term_nodes)
+        dp_tpl = '%.{}f'.format(dp)
+        ## using the data item HTML tuples and the results data, build the body row html
+        for row in row_label_rows_lst:
+            data_cells = []
+            for (left_html, measure_lbl, right_html), unused in zip(
+                    col_presn_lst, col_term_nodes):
+                output_type = mg.MEASURE_LBL2KEY[measure_lbl]
+                val = next(results)
+                is_freq = (output_type == mg.FREQ_KEY)
+                num2use = val if is_freq else dp_tpl % val  ## show integers for freqs (that's what the process in get_func_clause will have done by SUMming 1 and 0s. We don't alter that.
+                num2display = lib.OutputLib.get_num2display(num=num2use,
+                    output_type=output_type, inc_perc=self.show_perc)
+                data_cells.append(left_html + num2display + right_html)
+            yield row + data_cells
+
+    def iter_raw_vals(self, row_filters_lst, row_filt_flds_lst,
+            row_filt_vals_lst, col_measures_lst, col_filters_lst, col_tots_lst,
+            col_filt_flds_lst, col_term_nodes):
+        """
+        Yield data values (row by row) before any formatting.
+        """
+        if self.use_group_by and row_filt_vals_lst is not None:
+            col_filt_vals_lst = [x.filt_vals for x in col_term_nodes]
+            yield from self.get_group_by_results(row_filt_flds_lst,
+                row_filt_vals_lst, col_measures_lst, col_tots_lst,
+                col_filt_flds_lst, col_filt_vals_lst)
+        else:
+            data_cells_n = len(row_filters_lst) * len(col_term_nodes)
+            yield from self.iter_sum_case_results(row_filters_lst,
+                row_filt_flds_lst, col_measures_lst, col_filters_lst,
+                col_tots_lst, col_filt_flds_lst, data_cells_n)
+
+    def iter_sum_case_results(self, row_filters_lst, row_filt_flds_lst,
+            col_measures_lst, col_filters_lst, col_tots_lst, col_filt_flds_lst,
+            data_cells_n):
+        """
+        Yield data values (row by row) with one SUM(CASE ...) clause per cell.
+
+        Values are fetched once per batch of data points for database
+        efficiency reasons. Each call returns multiple values. But each batch is
+        a full scan of the table so the GROUP BY approach is usually much
+        faster.
+
+        Batches are independent so can run side by side if there is a pool of
+        connections available.
+        """
+        debug = False
+        SQLs = self.iter_sum_case_sqls(row_filters_lst, row_filt_flds_lst,
+            col_measures_lst, col_filters_lst, col_tots_lst, col_filt_flds_lst,
+            data_cells_n)
+        use_pool = (self.con_dets is not None and self.db is not None
+            and self.con_pool_size > 1 and getdata.con_pool_available(self.dbe))
+        if use_pool:
+            with getdata.ConPool(self.dbe, self.con_dets, self.db,
+                    size=self.con_pool_size) as con_pool:
+                for batch_results in con_pool.iter_fetchone(SQLs):
+                    if debug: print(batch_results)
+                    yield from batch_results
+        else:
+            for SQL_select_results in SQLs:
+                batch_results = self.get_all_rows(SQL_select_results)[0]
+                if debug: print(batch_results)
+                yield from batch_results
+
+    def iter_sum_case_sqls(self, row_filters_lst, row_filt_flds_lst,
+            col_measures_lst, col_filters_lst, col_tots_lst, col_filt_flds_lst,
+            data_cells_n):
+        """
+        Yield SQL for each batch of SUM(CASE ...) clauses - in cell order.
+        """
+        debug = False
         i=0
-        data_item_presn_lst = []
-        results = []
         SQL_table_select_clauses_lst = []
         max_select_vars = 1 if debug else 50  ## same speed from 30-100 but twice as slow if much smaller or larger.
         for (row_filter,
              row_filt_flds) in zip(row_filters_lst, row_filt_flds_lst):
             row_filts_tot4col_lst = self.get_dim_filts_4_oth_dim_tot_lst(
                 row_filter, row_filt_flds)
-            first = True  ## styling
             col_zipped = zip(
                 col_measures_lst,
                 col_filters_lst,
@@ -1005,15 +1286,6 @@ class GenTable(LiveTable):
             for (colmeasure, col_filter, coltot, col_filt_flds) in col_zipped:
                 col_filts_tot4row_lst = self.get_dim_filts_4_oth_dim_tot_lst(
                     col_filter, col_filt_flds)
-                ## styling
-                if first:
-                    cellclass = CSS_FIRST_DATACELL
-                    first = False
-                else:
-                    cellclass = CSS_DATACELL
-                ## build data row list
-                data_item_presn_lst.append((f"<td class='{cellclass}'>", 
-                    mg.MEASURE_KEY2LBL[colmeasure], '</td>'))
                 ## build SQL clauses for next SQL query
                 clause = self.get_func_clause(measure=colmeasure,
                     row_filters_lst=row_filter,
@@ -1028,28 +1300,90 @@ class GenTable(LiveTable):
                     SQL_select_results = self.get_data_sql(
                         SQL_table_select_clauses_lst)
                     if debug: print(SQL_select_results)
-                    self.cur.execute(SQL_select_results)
-                    is_freq = (colmeasure == mg.FREQ_KEY)
-                    results.extend(self.cur.fetchone())
+                    yield SQL_select_results
                     SQL_table_select_clauses_lst = []
                 i=i+1
-                if debug:
-                    print(results)
-        i=0
-        ## using the data item HTML tuples and the results data, build the body row html
-        for row in row_label_rows_lst:
-            for unused in col_term_nodes:
-                output_type = mg.MEASURE_LBL2KEY[data_item_presn_lst[i][1]]
-                dp_tpl = '%.{}f'.format(dp)
-                val = results[i]
-                is_freq = (output_type == mg.FREQ_KEY)
-                num2use = val if is_freq else dp_tpl % val  ## show integers for freqs (that's what the process in get_func_clause will have done by SUMming 1 and 0s. We don't alter that.
-                num2display = lib.OutputLib.get_num2display(num=num2use,
-                    output_type=output_type, inc_perc=self.show_perc)
-                row.append(data_item_presn_lst[i][0]
-                    + num2display + data_item_presn_lst[i][2])
-                i=i+1
-        return row_label_rows_lst
+
+    def get_group_freqs(self, flds):
+        """
+        Run one GROUP BY query across every field used in the table.
+
+        :return: freqs (numpy array - one per group) and fld2codes (see
+         get_fld2codes)
+        :rtype: tuple
+        """
+        debug = False
+        flds_clause = ', '.join(self.quote_obj(fld) for fld in flds)
+        tbl_str = getdata.tblname_qtr(self.dbe, self.tbl)
+        SQL_get_freqs = dedent(f"""\
+        SELECT {flds_clause}, COUNT(*)
+        FROM {tbl_str}
+        {self.where_tbl_filt}
+        GROUP BY {flds_clause}""")
+        if debug: print(SQL_get_freqs)
+        group_rows = self.get_all_rows(SQL_get_freqs)
+        freqs = numpy.array([row[-1] for row in group_rows], dtype=numpy.int64)
+        fld2codes = self.get_fld2codes(group_rows, flds)
+        return freqs, fld2codes
+
+    def get_group_by_results(self, row_filt_flds_lst, row_filt_vals_lst,
+            col_measures_lst, col_tots_lst, col_filt_flds_lst,
+            col_filt_vals_lst):
+        """
+        Get data values (row by row) from a single GROUP BY query across all
+        the row and col fields. The frequencies, and the totals needed for
+        percentages (see get_func_clause), are then the sums of the group
+        frequencies meeting the row and col filters - all done in memory as
+        matrix products of the row and col group masks.
+
+        Totals are worked out from the ungrouped results rather than by the
+        database (e.g. WITH ROLLUP) because the totals needed are for
+        non-missing values and that works the same for every DBE.
+        """
+        flds = []
+        for filt_flds in row_filt_flds_lst + col_filt_flds_lst:
+            flds.extend(fld for fld in filt_flds
+                if fld is not None and fld not in flds)
+        freqs, fld2codes = self.get_group_freqs(flds)
+        n_groups = len(freqs)
+        row_dets = list(zip(row_filt_flds_lst, row_filt_vals_lst))
+        col_dets = list(zip(col_filt_flds_lst, col_filt_vals_lst))
+        def get_masks(dets, *, is_tot4oth_dim):
+            return numpy.array([self.get_group_mask(filt_flds, filt_vals,
+                    fld2codes, n_groups, is_tot4oth_dim=is_tot4oth_dim)
+                for filt_flds, filt_vals in dets],
+                dtype=numpy.int64).reshape(len(dets), n_groups)
+        row_freqs = get_masks(row_dets, is_tot4oth_dim=False)*freqs
+        row_tot_freqs = get_masks(row_dets, is_tot4oth_dim=True)*freqs
+        col_masks = get_masks(col_dets, is_tot4oth_dim=False).T
+        col_tot_masks = get_masks(col_dets, is_tot4oth_dim=True).T
+        cell_freqs = (row_freqs @ col_masks).tolist()
+        tots4row = (row_freqs @ col_tot_masks).tolist()
+        tots4col = (row_tot_freqs @ col_masks).tolist()
+        tots4all = (row_tot_freqs @ col_tot_masks).tolist()
+        results = []
+        for row_idx in range(len(row_dets)):
+            col_zipped = zip(col_measures_lst, col_tots_lst)
+            for col_idx, (colmeasure, coltot) in enumerate(col_zipped):
+                freq = cell_freqs[row_idx][col_idx]
+                tot4row = tots4row[row_idx][col_idx]
+                tot4col = tots4col[row_idx][col_idx]
+                tot4all = tots4all[row_idx][col_idx]
+                if colmeasure == mg.FREQ_KEY:
+                    val = freq if not coltot else tot4row
+                elif colmeasure == mg.COLPCT_KEY:
+                    num, den = (freq, tot4col) if not coltot else (
+                        tot4row, tot4all)
+                    val = 100.0*num/den if den else 0
+                elif colmeasure == mg.ROWPCT_KEY:
+                    if not coltot:
+                        val = 100.0*freq/tot4row if tot4row else 0
+                    else:
+                        val = 100
+                else:
+                    raise Exception(f'Measure {colmeasure} not available')
+                results.append(val)
+        return results
 
     def get_func_clause(self, measure, row_filters_lst, col_filts_tot4row_lst,
             col_filters_lst, row_filts_tot4col_lst, is_coltot):
@@ -1136,20 +1470,55 @@ class SummTable(LiveTable):
     row_var_optional = True
 
     def __init__(self, titles, subtitles, tab_type, dbe, tbl, tbl_filt, cur,
-            flds, tree_rows, tree_cols, *, show_perc=True):
+            flds, tree_rows, tree_cols, *, show_perc=True, db=None,
+            approx_quantiles=False, single_scan=mg.SUMM_TABLE_SINGLE_SCAN):
+        """
+        :param bool approx_quantiles: if True, median and quartiles come from a
+         bounded-memory sketch streamed from the database rather than from
+         every value held in memory at once. Good for tables too big to
+         materialise but results are approximate.
+        :param bool single_scan: if True, get the min, max, sum, and N of every
+         col field for every row from one GROUP BY query (see
+         get_row_col_dets) rather than querying the database for each cell.
+         The values themselves are only read (once, for all cells) if a measure
+         needs them e.g. mode (see get_raw_vals_measures).
+        """
         LiveTable.__init__(self, titles, subtitles, tab_type, dbe, tbl,
-            tbl_filt, cur, flds, tree_rows, tree_cols, show_perc=show_perc)
+            tbl_filt, cur, flds, tree_rows, tree_cols, show_perc=show_perc,
+            db=db)
+        self.approx_quantiles = approx_quantiles
+        self.get_percentiles_sql = getdata.get_percentiles_sql_func(dbe)
+        self.single_scan = single_scan
         self.warnings = []
+        self.last_streaming_dets = (None, None)
 
-    def get_row_labels_row_lst(self, row_filters_lst, row_filt_flds_lst,
+    def get_raw_vals_measures(self):
+        """
+        Measures needing the values themselves rather than SQL aggregates.
+        Quartile-based measures are left to get_data_val if the database can
+        calculate percentiles itself (see getdata.get_percentiles_sql_func) or
+        if approx_quantiles - in which case nothing is read in full.
+        """
+        if self.approx_quantiles:
+            return set()
+        raw_vals_measures = {mg.MODE_KEY, mg.STD_DEV_KEY}
+        if not self.get_percentiles_sql:
+            raw_vals_measures.update([mg.MEDIAN_KEY, mg.LOWER_QUARTILE_KEY,
+                mg.UPPER_QUARTILE_KEY, mg.IQR_KEY])
+        return raw_vals_measures
+
+    def iter_row_label_rows(self, row_filters_lst, row_filt_flds_lst,
             col_measures_lst, col_filters_lst, col_tots_lst, col_filt_flds_lst,
-            row_label_rows_lst, data_cells_n, col_term_nodes, css_idx, dp):
+            row_label_rows_lst, data_cells_n, col_term_nodes, css_idx, dp, *,
+            row_filt_vals_lst=None):
         """
-        Get list of row data. Each row in the list is represented by a row of
-        strings to concatenate, one per data point.
+        Yield row data one row at a time. Each row is represented by a list of
+        strings to concatenate - the row labels then one per data point.
 
         Get data values one at a time (no batches unlike Gen Tables) and add to
-        html chunks.
+        html chunks. If single_scan, the aggregates (and values if needed) for
+        each cell are sliced out of the results of get_row_col_dets instead of
+        being queried for separately.
 
         Example data if two col variables - mean, median, mean, median
         """
@@ -1158,30 +1527,279 @@ class SummTable(LiveTable):
         CSS_DATACELL = mg.CSS_SUFFIX_TEMPLATE % (mg.CSS_DATACELL, css_idx)
         debug = False
         if debug: print(col_measures_lst)
-        data_item_lst = []
-        for row_filter, unused in zip(row_filters_lst, row_filt_flds_lst):
+        self.last_streaming_dets = (None, None)
+        col_flds = [col_filt_flds[0] for col_filt_flds in col_filt_flds_lst]
+        raw_vals_measures = self.get_raw_vals_measures()
+        if self.single_scan and row_filt_vals_lst is not None:
+            raw_col_flds = [col_fld for colmeasure, col_fld
+                in zip(col_measures_lst, col_flds)
+                if colmeasure in raw_vals_measures]
+            row_col_dets = self.get_row_col_dets(
+                row_filt_flds_lst, row_filt_vals_lst, col_flds, raw_col_flds)
+        else:
+            row_col_dets = None
+        for row_idx, (row, row_filter) in enumerate(
+                zip(row_label_rows_lst, row_filters_lst)):
+            data_item_lst = []
             first = True  ## styling
-            col_zipped = zip(
-                col_measures_lst, col_filters_lst, col_filt_flds_lst)
-            for (colmeasure, unused, col_filt_flds) in col_zipped:
-                col_fld = col_filt_flds[0]
+            for colmeasure, col_fld in zip(col_measures_lst, col_flds):
                 ## styling
                 if first:
                     cellclass = CSS_FIRST_DATACELL
                     first = False
                 else:
                     cellclass = CSS_DATACELL
-                data_val, msg = self.get_data_val(
-                    colmeasure, col_fld, row_filter, dp)
+                if row_col_dets:
+                    aggs, vals = row_col_dets[row_idx][col_fld]
+                    ## None unless read for one of raw_vals_measures
+                    if colmeasure in SUMM_RAW_VALS_MEASURES:
+                        dets = vals
+                    else:
+                        dets = aggs
+                else:
+                    aggs, vals, dets = None, None, None
+                if dets is not None:
+                    data_val, msg = self.get_data_val_from_dets(
+                        colmeasure, aggs, vals, dp)
+                else:  ## includes non-numeric values - query for details
+                    data_val, msg = self.get_data_val(
+                        colmeasure, col_fld, row_filter, dp)
                 if msg:
                     self.warnings.append(f'<p>{msg}</p>')
                 data_item_lst.append(f"<td class='{cellclass}'>{data_val}</td>")
-        i=0
-        for row in row_label_rows_lst:
-            for unused in col_term_nodes:
-                row.append(data_item_lst[i])
-                i=i+1
-        return row_label_rows_lst
+            yield row + data_item_lst
+
+    def iter_raw_vals(self, row_filters_lst, row_filt_flds_lst,
+            row_filt_vals_lst, col_measures_lst, col_filters_lst, col_tots_lst,
+            col_filt_flds_lst, col_term_nodes):
+        """
+        Yield data values (row by row) before any formatting. Always calculated
+        from the results of get_row_col_dets (reading the values for any
+        measures needing them) - NaN if there are non-numeric values.
+        """
+        col_flds = [col_filt_flds[0] for col_filt_flds in col_filt_flds_lst]
+        raw_col_flds = [col_fld for colmeasure, col_fld
+            in zip(col_measures_lst, col_flds)
+            if colmeasure in SUMM_RAW_VALS_MEASURES]
+        row_col_dets = self.get_row_col_dets(
+            row_filt_flds_lst, row_filt_vals_lst, col_flds, raw_col_flds)
+        for col_fld2dets in row_col_dets:
+            for colmeasure, col_fld in zip(col_measures_lst, col_flds):
+                aggs, vals = col_fld2dets[col_fld]
+                if colmeasure in SUMM_RAW_VALS_MEASURES:
+                    dets = vals
+                else:
+                    dets = aggs
+                if dets is None:
+                    yield numpy.nan
+                else:
+                    yield self.get_raw_val_from_dets(colmeasure, aggs, vals)
+
+    def get_group_aggs(self, row_flds, col_flds):
+        """
+        Get the aggregates for each col field for every combination of row
+        field values (missing included) from one GROUP BY query.
+
+        :return: group_rows, fld2codes - each group row has the row field
+         values then COUNT, MIN, MAX, SUM, and float SUM for each col field.
+        """
+        debug = False
+        val2float = getdata.get_val2float_func(self.dbe)
+        aggs_clauses = []
+        for col_fld in col_flds:
+            col_fld_str = self.quote_obj(col_fld)
+            aggs_clauses.append(f'COUNT({col_fld_str}), MIN({col_fld_str}), '
+                f'MAX({col_fld_str}), SUM({col_fld_str}), '
+                f'SUM({val2float(col_fld_str)})')
+        row_flds_clause = ', '.join(self.quote_obj(fld) for fld in row_flds)
+        select_clause = ', '.join(
+            ([row_flds_clause] if row_flds else []) + aggs_clauses)
+        group_by_clause = (f'GROUP BY {row_flds_clause}' if row_flds else '')
+        tbl_str = getdata.tblname_qtr(self.dbe, self.tbl)
+        SQL_get_aggs = dedent(f"""\
+        SELECT {select_clause}
+        FROM {tbl_str}
+        {self.where_tbl_filt}
+        {group_by_clause}""")
+        if debug: print(SQL_get_aggs)
+        group_rows = self.get_all_rows(SQL_get_aggs)
+        fld2codes = self.get_fld2codes(group_rows, row_flds)
+        return group_rows, fld2codes
+
+    def get_row_col_dets(self, row_filt_flds_lst, row_filt_vals_lst, col_flds,
+            raw_col_flds):
+        """
+        Get the aggregates for each row and col field by combining the results
+        of one GROUP BY query (see get_group_aggs) for the groups meeting the
+        row filters. Only read the (non-missing) values themselves for
+        raw_col_flds - and then all in one query.
+
+        :param list raw_col_flds: col fields with a measure needing the values
+         themselves e.g. mode. Can be empty.
+        :return: one dict per row of SummCellDets (aggs, vals) e.g.
+         {'age': (SummAggs(n=2, ...), [23, 45]), 'weight': (SummAggs(...),
+         None)}. aggs or vals are None if there are non-numeric values - leave
+         those to get_data_val so the problem can be reported. vals are also
+         None if not in raw_col_flds.
+        :rtype: list
+        """
+        debug = False
+        row_flds = []
+        for row_filt_flds in row_filt_flds_lst:
+            row_flds.extend(fld for fld in row_filt_flds
+                if fld is not None and fld not in row_flds)
+        uniq_col_flds = list(dict.fromkeys(col_flds))
+        row_dets = list(zip(row_filt_flds_lst, row_filt_vals_lst))
+        ## aggregates
+        group_rows, fld2codes = self.get_group_aggs(row_flds, uniq_col_flds)
+        n_groups = len(group_rows)
+        row_col_aggs = [{} for unused in row_dets]
+        for col_idx, col_fld in enumerate(uniq_col_flds):
+            start_idx = len(row_flds) + 5*col_idx
+            col_aggs = numpy.empty((n_groups, 5), dtype=object)
+            col_aggs[:] = [row[start_idx: start_idx + 5] for row in group_rows]
+            for row_idx, (row_filt_flds, row_filt_vals) in enumerate(row_dets):
+                mask = self.get_group_mask(
+                    row_filt_flds, row_filt_vals, fld2codes, n_groups)
+                row_col_aggs[row_idx][col_fld] = get_combined_aggs(
+                    col_aggs[mask])
+        ## values
+        uniq_raw_col_flds = list(dict.fromkeys(raw_col_flds))
+        row_col_vals = [{} for unused in row_dets]
+        if uniq_raw_col_flds:
+            flds_clause = ', '.join(
+                self.quote_obj(fld) for fld in row_flds + uniq_raw_col_flds)
+            tbl_str = getdata.tblname_qtr(self.dbe, self.tbl)
+            SQL_get_data = dedent(f"""\
+            SELECT {flds_clause}
+            FROM {tbl_str}
+            {self.where_tbl_filt}""")
+            if debug: print(SQL_get_data)
+            data_rows = self.get_all_rows(SQL_get_data)
+            fld2codes = self.get_fld2codes(data_rows, row_flds)
+            n_rows = len(data_rows)
+            for col_idx, col_fld in enumerate(uniq_raw_col_flds, len(row_flds)):
+                col_vals = numpy.empty(n_rows, dtype=object)
+                col_vals[:] = [row[col_idx] for row in data_rows]
+                for row_idx, (row_filt_flds, row_filt_vals) in enumerate(
+                        row_dets):
+                    mask = self.get_group_mask(
+                        row_filt_flds, row_filt_vals, fld2codes, n_rows)
+                    vals = [val for val in col_vals[mask] if val is not None]
+                    is_num = all(lib.TypeLib.is_basic_num(val) for val in vals)
+                    row_col_vals[row_idx][col_fld] = vals if is_num else None
+        row_col_dets = []
+        for col_fld2aggs, col_fld2vals in zip(row_col_aggs, row_col_vals):
+            row_col_dets.append({
+                col_fld: SummCellDets(aggs, col_fld2vals.get(col_fld))
+                for col_fld, aggs in col_fld2aggs.items()})
+        return row_col_dets
+
+    def get_data_val_from_dets(self, measure, aggs, vals,
+            dp=mg.DEFAULT_REPORT_DP):
+        """
+        As for get_data_val but calculated from aggregates and values already
+        read from the database. Must give the same results as the SQL used in
+        get_data_val e.g. integer sums stay integers.
+
+        :param SummAggs aggs: aggregates for the cell
+        :param list vals: the non-missing (and numeric) values for the cell.
+         Only needed for measures in SUMM_RAW_VALS_MEASURES.
+        :return: data_val, msg (msg always None - non-numeric values are left
+         to get_data_val)
+        :rtype: tuple
+        """
+        dp2_tpl = f'%.{dp}f'
+        data = [float(x) for x in vals] if vals is not None else None
+        def get_agg(agg):
+            if not aggs.n:
+                raise Exception('No values')  ## SQL aggregate would be NULL
+            return agg
+        def get_mode():
+            maxfreq, mode = core_stats.mode(data)
+            if len(mode) > mg.MAX_MODES:
+                return 'Too many modes to display'
+            mode2show = ', '.join(str(x) for x in mode)
+            return f'{mode2show} (N={maxfreq:,})'
+        def get_quartile_based(get_raw):
+            raw = get_raw(*core_stats.get_quartiles(data))
+            return mg.NO_CALC_LBL if math.isnan(raw) else dp2_tpl % raw
+        def get_sd():
+            moments = core_stats.MomentsAccumulator()
+            moments.add_batch(data)
+            return dp2_tpl % moments.sd if moments.n > 1 else mg.NO_CALC_LBL
+        measure2calc = {
+            mg.MIN_KEY: lambda: lib.formatnum(get_agg(aggs.min_val)),
+            mg.MAX_KEY: lambda: lib.formatnum(get_agg(aggs.max_val)),
+            mg.RANGE_KEY: lambda: dp2_tpl % (
+                get_agg(aggs.max_val) - aggs.min_val),
+            mg.SUM_KEY: lambda: lib.formatnum(get_agg(aggs.tot)),
+            mg.MEAN_KEY: lambda: dp2_tpl % (aggs.float_tot/aggs.n),
+            mg.MEDIAN_KEY: lambda: dp2_tpl % numpy.median(data),
+            mg.MODE_KEY: get_mode,
+            mg.LOWER_QUARTILE_KEY: lambda: get_quartile_based(
+                lambda lq, uq: lq),
+            mg.UPPER_QUARTILE_KEY: lambda: get_quartile_based(
+                lambda lq, uq: uq),
+            mg.IQR_KEY: lambda: get_quartile_based(lambda lq, uq: uq - lq),
+            mg.SUMM_N_KEY: lambda: f'N={aggs.n:,}',
+            mg.STD_DEV_KEY: get_sd,
+        }
+        try:
+            calc = measure2calc[measure]
+        except KeyError:
+            raise Exception('Measure not available')
+        try:
+            data_val = calc()
+        except Exception:
+            data_val = mg.NO_CALC_LBL
+        return data_val, None
+
+    def get_raw_val_from_dets(self, measure, aggs, vals):
+        """
+        As for get_data_val_from_dets but the number rather than the text to
+        display.
+
+        :return: NaN if it can't be calculated, or for mode, if there is more
+         than one.
+        :rtype: float
+        """
+        data = [float(x) for x in vals] if vals is not None else None
+        def get_mode():
+            unused, mode = core_stats.mode(data)
+            return mode[0] if len(mode) == 1 else numpy.nan
+        def get_sd():
+            moments = core_stats.MomentsAccumulator()
+            moments.add_batch(data)
+            return moments.sd if moments.n > 1 else numpy.nan
+        def get_iqr():
+            lq, uq = core_stats.get_quartiles(data)
+            return uq - lq
+        measure2calc = {
+            mg.MIN_KEY: lambda: aggs.min_val,
+            mg.MAX_KEY: lambda: aggs.max_val,
+            mg.RANGE_KEY: lambda: aggs.max_val - aggs.min_val,
+            mg.SUM_KEY: lambda: aggs.float_tot,
+            mg.MEAN_KEY: lambda: aggs.float_tot/aggs.n,
+            mg.MEDIAN_KEY: lambda: numpy.median(data),
+            mg.MODE_KEY: get_mode,
+            mg.LOWER_QUARTILE_KEY: lambda: core_stats.get_quartiles(data)[0],
+            mg.UPPER_QUARTILE_KEY: lambda: core_stats.get_quartiles(data)[1],
+            mg.IQR_KEY: get_iqr,
+            mg.SUMM_N_KEY: lambda: aggs.n,
+            mg.STD_DEV_KEY: get_sd,
+        }
+        try:
+            calc = measure2calc[measure]
+        except KeyError:
+            raise Exception('Measure not available')
+        if not aggs.n:
+            return 0.0 if measure == mg.SUMM_N_KEY else numpy.nan
+        try:
+            raw = float(calc())
+        except Exception:
+            raw = numpy.nan
+        return raw
 
     def _get_non_num_val(self, SQL_get_vals):
         """
@@ -1201,11 +1819,59 @@ class SummTable(LiveTable):
                 break
         return val
 
+    def _get_streaming_dets(self, SQL_get_vals):
+        """
+        Stream the values for a cell (see core_stats.get_streaming_dets) only
+        once however many of median, quartiles, IQR, and std dev are shown for
+        it. Only the latest cell's details are kept - the measures for a cell
+        are next to each other in the table.
+        """
+        last_SQL, dets = self.last_streaming_dets
+        if SQL_get_vals != last_SQL:
+            dets = core_stats.get_streaming_dets(self.cur, SQL_get_vals,
+                quantiles=self.approx_quantiles)
+            self.last_streaming_dets = (SQL_get_vals, dets)
+        return dets
+
+    def _get_server_percentiles(self, server_args, percs):
+        """
+        Get percentiles calculated by the database (see get_percentiles_sql in
+        the server dbe plugins).
+
+        :param tuple server_args: col_fld_str, tbl_str, overall_filter
+        """
+        SQL_get_percs = self.get_percentiles_sql(*server_args, percs)
+        return [float(val) for val in self.get_all_rows(SQL_get_percs)[0]]
+
+    def _get_server_quartiles(self, server_args):
+        """
+        Need N first to get the percentiles matching core_stats.get_quartiles.
+        """
+        col_fld_str, tbl_str, overall_filter = server_args
+        SQL_get_n = f"""\
+        SELECT COUNT({col_fld_str})
+        FROM {tbl_str} {overall_filter}
+        """
+        n = self.get_all_rows(SQL_get_n)[0][0]
+        percs = core_stats.get_quartile_percs(n)
+        lq, uq = self._get_server_percentiles(server_args, percs)
+        return lq, uq
+
+    def _get_quartiles(self, data, SQL_get_vals, server_args=None):
+        if self.approx_quantiles:
+            dets = self._get_streaming_dets(SQL_get_vals)
+            return dets.lq, dets.uq
+        if server_args:
+            return self._get_server_quartiles(server_args)
+        return core_stats.get_quartiles(data)
+
     ## Only separated those out where handling NaN
-    def _lq(self, data, SQL_get_vals, col_fld, dp2_tpl):
+    def _lq(self, data, SQL_get_vals, col_fld, dp2_tpl, *,
+            server_args=None):
         msg = None
         try:
-            lq, unused = core_stats.get_quartiles(data)
+            lq, unused = self._get_quartiles(data, SQL_get_vals,
+                server_args=server_args)
             if math.isnan(lq):
                 data_val = mg.NO_CALC_LBL
             else:
@@ -1219,10 +1885,12 @@ class SummTable(LiveTable):
             data_val = mg.NO_CALC_LBL
         return data_val, msg
 
-    def _uq(self, data, SQL_get_vals, col_fld, dp2_tpl):
+    def _uq(self, data, SQL_get_vals, col_fld, dp2_tpl, *,
+            server_args=None):
         msg = None
         try:
-            unused, uq = core_stats.get_quartiles(data)
+            unused, uq = self._get_quartiles(data, SQL_get_vals,
+                server_args=server_args)
             if math.isnan(uq):
                 data_val = mg.NO_CALC_LBL
             else:
@@ -1236,10 +1904,12 @@ class SummTable(LiveTable):
             data_val = mg.NO_CALC_LBL
         return data_val, msg
 
-    def _iq_range(self, data, SQL_get_vals, col_fld, dp2_tpl):
+    def _iq_range(self, data, SQL_get_vals, col_fld, dp2_tpl, *,
+            server_args=None):
         msg = None
         try:
-            lq, uq = core_stats.get_quartiles(data)
+            lq, uq = self._get_quartiles(data, SQL_get_vals,
+                server_args=server_args)
             if math.isnan(lq) or math.isnan(uq):
                 data_val = mg.NO_CALC_LBL
             else:
@@ -1254,11 +1924,15 @@ class SummTable(LiveTable):
             data_val = mg.NO_CALC_LBL
         return data_val, msg
 
-    def _std_dev(self, data, SQL_get_vals, col_fld, dp2_tpl):
+    def _std_dev(self, SQL_get_vals, col_fld, dp2_tpl):
+        """
+        Streamed through a one-pass accumulator so the values never need to be
+        held in memory all at once.
+        """
         msg = None
         try:
-            raw = numpy.std(data, ddof=1)  ## use ddof=1 for sample sd
-            if math.isnan(raw):
+            raw = self._get_streaming_dets(SQL_get_vals).sd
+            if raw is None or math.isnan(raw):
                 data_val = mg.NO_CALC_LBL
             else:
                 data_val = dp2_tpl % raw
@@ -1300,11 +1974,18 @@ class SummTable(LiveTable):
         {overall_filter}
         {and_or_where} {col_fld_str} IS NOT NULL
         """
-        sql_for_raw_only = [mg.MEDIAN_KEY, mg.MODE_KEY, mg.LOWER_QUARTILE_KEY,
-            mg.UPPER_QUARTILE_KEY, mg.IQR_KEY, mg.STD_DEV_KEY]
+        ## let the database do the percentiles if it can
+        if self.get_percentiles_sql and not self.approx_quantiles:
+            server_args = (col_fld_str, tbl_str, overall_filter)
+        else:
+            server_args = None
+        sql_for_raw_only = [mg.MODE_KEY, ]
+        if not (self.approx_quantiles or server_args):
+            sql_for_raw_only.extend([mg.MEDIAN_KEY, mg.LOWER_QUARTILE_KEY,
+                mg.UPPER_QUARTILE_KEY, mg.IQR_KEY])
+        data = None
         if measure in sql_for_raw_only:
-            self.cur.execute(SQL_get_vals)
-            raw_vals = self.cur.fetchall()  ## sometimes returns REALS as strings
+            raw_vals = self.get_all_rows(SQL_get_vals)  ## sometimes returns REALS as strings
             if debug: print(raw_vals)
             ## SQLite sometimes returns strings even if REAL
             data = [float(x[0]) for x in raw_vals]
@@ -1316,8 +1997,7 @@ class SummTable(LiveTable):
             {overall_filter}
             """
             try:
-                self.cur.execute(SQL_get_min)
-                data_val = lib.formatnum(self.cur.fetchone()[0])
+                data_val = lib.formatnum(self.get_all_rows(SQL_get_min)[0][0])
             except Exception:
                 data_val = mg.NO_CALC_LBL
         elif measure == mg.MAX_KEY:
@@ -1327,8 +2007,7 @@ class SummTable(LiveTable):
             {overall_filter}
             """
             try:
-                self.cur.execute(SQL_get_max)
-                data_val = lib.formatnum(self.cur.fetchone()[0])
+                data_val = lib.formatnum(self.get_all_rows(SQL_get_max)[0][0])
             except Exception:
                 data_val = mg.NO_CALC_LBL
         elif measure == mg.RANGE_KEY:
@@ -1338,8 +2017,7 @@ class SummTable(LiveTable):
             {overall_filter}
             """
             try:
-                self.cur.execute(SQL_get_range)
-                data_val = dp2_tpl % self.cur.fetchone()[0]
+                data_val = dp2_tpl % self.get_all_rows(SQL_get_range)[0][0]
             except Exception:
                 data_val = mg.NO_CALC_LBL
         elif measure == mg.SUM_KEY:
@@ -1349,8 +2027,7 @@ class SummTable(LiveTable):
             {overall_filter}
             """
             try:
-                self.cur.execute(SQL_get_sum)
-                data_val = lib.formatnum(self.cur.fetchone()[0])
+                data_val = lib.formatnum(self.get_all_rows(SQL_get_sum)[0][0])
             except Exception:
                 data_val = mg.NO_CALC_LBL
         elif measure == mg.MEAN_KEY:
@@ -1362,13 +2039,18 @@ class SummTable(LiveTable):
             {overall_filter}
             """
             try:
-                self.cur.execute(SQL_get_mean)
-                data_val = dp2_tpl % self.cur.fetchone()[0]
+                data_val = dp2_tpl % self.get_all_rows(SQL_get_mean)[0][0]
             except Exception:
                 data_val = mg.NO_CALC_LBL
         elif measure == mg.MEDIAN_KEY:
             try:
-                data_val = dp2_tpl % numpy.median(data)
+                if self.approx_quantiles:
+                    median = self._get_streaming_dets(SQL_get_vals).median
+                elif server_args:
+                    median, = self._get_server_percentiles(server_args, [0.5])
+                else:
+                    median = numpy.median(data)
+                data_val = dp2_tpl % median
             except Exception:
                 bad_val = self._get_non_num_val(SQL_get_vals)
                 if bad_val is not None:
@@ -1392,24 +2074,25 @@ class SummTable(LiveTable):
                         f'contains at least one non-numeric value: "{bad_val}"')
                 data_val = mg.NO_CALC_LBL
         elif measure == mg.LOWER_QUARTILE_KEY:
-            data_val, msg = self._lq(data, SQL_get_vals, col_fld, dp2_tpl)
+            data_val, msg = self._lq(data, SQL_get_vals, col_fld,
+                dp2_tpl, server_args=server_args)
         elif measure == mg.UPPER_QUARTILE_KEY:
-            data_val, msg = self._uq(data, SQL_get_vals, col_fld, dp2_tpl)
+            data_val, msg = self._uq(data, SQL_get_vals, col_fld,
+                dp2_tpl, server_args=server_args)
         elif measure == mg.IQR_KEY:
-            data_val, msg = self._iq_range(data, SQL_get_vals, col_fld, dp2_tpl)
+            data_val, msg = self._iq_range(data, SQL_get_vals, col_fld,
+                dp2_tpl, server_args=server_args)
         elif measure == mg.SUMM_N_KEY:
             SQL_get_n = f"""\
             SELECT COUNT({col_fld_str})
             FROM {tbl_str} {overall_filter}
             """
             try:
-                self.cur.execute(SQL_get_n)
-                data_val = f'N={self.cur.fetchone()[0]:,}'
+                data_val = f'N={self.get_all_rows(SQL_get_n)[0][0]:,}'
             except Exception:
                 data_val = mg.NO_CALC_LBL
         elif measure == mg.STD_DEV_KEY:
-            data_val, msg = self._std_dev(
-                data, SQL_get_vals, col_fld, dp2_tpl)
+            data_val, msg = self._std_dev(SQL_get_vals, col_fld, dp2_tpl)
         else:
             raise Exception('Measure not available')
         return data_val, msg
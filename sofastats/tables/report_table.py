@@ -216,6 +216,8 @@ class DlgMakeTable(wx.Dialog, config_ui.ConfigUI, dimtree.DimTree):
             (None, 'output'),
             (None, 'getdata'), ]
         self.Bind(wx.EVT_CLOSE, self.set_exiting)
+        ## Data may have changed outside SOFA since the values were cached
+        getdata.clear_vals_cache()
         self.url_load = True  ## btn_expand
         (self.var_labels, self.var_notes,
          self.var_types,
@@ -441,7 +443,7 @@ class DlgMakeTable(wx.Dialog, config_ui.ConfigUI, dimtree.DimTree):
         cc = output.get_cc()
         config_ui.ConfigUI.update_css(self)
         self.demo_tab.fil_css = cc[mg.CURRENT_CSS_PATH]
-        self.update_demo_display()
+        self.update_demo_display(rerender=True)
 
     # database/ tables (and views)
     def on_database_sel(self, event):
@@ -591,11 +593,11 @@ class DlgMakeTable(wx.Dialog, config_ui.ConfigUI, dimtree.DimTree):
 
     def on_chk_show_perc_symbol(self, _evt):
         "Update display as show percentage symbol checkbox changes"
-        self.update_demo_display()
+        self.update_demo_display(rerender=True)
 
     def on_dp_spin(self, evt):
         config_ui.ConfigUI.on_dp_spin(self, evt)
-        self.update_demo_display()
+        self.update_demo_display(rerender=True)
 
     ## titles/subtitles
     def on_title_change(self, _evt):
@@ -703,7 +705,7 @@ class DlgMakeTable(wx.Dialog, config_ui.ConfigUI, dimtree.DimTree):
                 subtitles={subtitles},
                 tab_type={self.tab_type},
                 dbe=mg.{mg.DBE_KEY2KEY_AS_STR[dd.dbe]},
-            tbl="{dd.tbl}", tbl_filt=tbl_filt,
+            db=db, tbl="{dd.tbl}", tbl_filt=tbl_filt,
                 cur=cur, flds=flds, tree_rows=tree_rows,
             tree_cols=tree_cols, show_perc={show_perc})"""))
         elif self.tab_type == mg.ROW_STATS:
@@ -713,7 +715,7 @@ class DlgMakeTable(wx.Dialog, config_ui.ConfigUI, dimtree.DimTree):
                 subtitles={subtitles},
                 tab_type={self.tab_type},
                 dbe=mg.{mg.DBE_KEY2KEY_AS_STR[dd.dbe]},
-            tbl="{dd.tbl}", tbl_filt=tbl_filt,
+            db=db, tbl="{dd.tbl}", tbl_filt=tbl_filt,
                 cur=cur, flds=flds, tree_rows=tree_rows,
                 tree_cols=tree_cols)"""))
         elif self.tab_type == mg.DATA_LIST:
@@ -738,10 +740,10 @@ class DlgMakeTable(wx.Dialog, config_ui.ConfigUI, dimtree.DimTree):
             ## get_html() API.
             script_lst.append(dedent(f"""\
             tab_test.prep_table({css_idx})
-            max_cells = {mg.MAX_CELLS_IN_REPORT_TABLE}
+            max_cells = mg.MAX_CELLS_IN_REPORT_TABLE  ## None for no limit e.g. headless runs
             if tab_test.get_cell_n_ok(max_cells=max_cells):
-                fil.write(tab_test.get_html(
-                    {css_idx}, dp={dp}, page_break_after=False))
+                tab_test.write_html(fil,
+                    {css_idx}, dp={dp}, page_break_after=False)
             else:
                 raise my_exceptions.ExcessReportTableCells(max_cells)"""))
         else:  ## e.g. DATA_LIST rawtables.RawTable
@@ -868,7 +870,7 @@ class DlgMakeTable(wx.Dialog, config_ui.ConfigUI, dimtree.DimTree):
             new_has_dojo=new_has_dojo, allow_add2rpt=False)
         return bolran_report, str_content
 
-    def update_demo_display(self, titles_only=False):
+    def update_demo_display(self, titles_only=False, *, rerender=False):
         """
         Update demo table display. If small data volume, use real data.
         Otherwise use random data.
@@ -877,6 +879,10 @@ class DlgMakeTable(wx.Dialog, config_ui.ConfigUI, dimtree.DimTree):
 
         If only changing titles or subtitles, keep the rest constant to avoid
         random twitching as we add letters to the title.
+
+        If rerender, only the presentation has changed (e.g. decimal places) so
+        real data can come from the results of the last run rather than the
+        database (see getdata.rerendering_tables()).
         """
         debug = False
         demo_html = ''
@@ -898,7 +904,11 @@ class DlgMakeTable(wx.Dialog, config_ui.ConfigUI, dimtree.DimTree):
                 rpt_config = mg.RPT_CONFIG[self.tab_type]
                 quick_enough = (self.rows_n < rpt_config[mg.QUICK_IF_BELOW_KEY])
                 if quick_enough:
-                    bolran_report, demo_html = self.get_live_html()
+                    if rerender:
+                        with getdata.rerendering_tables():
+                            bolran_report, demo_html = self.get_live_html()
+                    else:
+                        bolran_report, demo_html = self.get_live_html()
                     self.btn_expand.Enable(bolran_report)
                     self.content2expand = demo_html
                     demo_was_live = bolran_report
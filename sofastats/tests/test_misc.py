@@ -8,24 +8,38 @@ from nose.tools import assert_almost_equals, assert_not_equal, assert_raises, as
 from calendar import timegm
 from datetime import datetime
 import decimal
+import io
+import json
 from pathlib import Path
+import random
+import sqlite3
+import tempfile
 import time
 
+import numpy as np
+
 from .. import basic_lib as b
 from .. import my_globals as mg
 from .. import config_globals
 from .. import lib
+from .. import my_exceptions
 from ..charting import charting_output
+from ..exporting import export_pivot
 from ..importing import csv_importer
 from .. import filtselect
 from .. import getdata
 from ..importing import importer
+from ..stats import core_stats
 from ..stats import indep2var
 from .. import output
 from .. import projects
 from .. import recode
+from .. import snapshots
+from ..tables import batch_tables
+from ..tables import dimtables
 from ..tables import report_table
 from ..tables import table_config
+from ..dbe_plugins import dbe_globals
 from ..dbe_plugins import dbe_sqlite
 
 test_us_style = False
@@ -47,6 +61,17 @@ STD_TAGS_DIC = {
     'ITEM_TITLE_START': mg.ITEM_TITLE_START,
 }
 
+class CountingCursor:
+    "Cursor counting the queries run through it"
+    def __init__(self, cur):
+        self.cur = cur
+        self.executed_n = 0
+    def execute(self, *args):
+        self.executed_n += 1
+        return self.cur.execute(*args)
+    def __getattr__(self, name):
+        return getattr(self.cur, name)
+
 def test_get_epoch_secs_from_datetime_str():
     ONE_DAY = 60*60*24
     t1970 = datetime(1970, 1, 1, 0, 0, 0)
@@ -895,6 +920,304 @@ def test_get_prestructured_grouped_data():
             raw_data, fldnames, chart_ns)
         assert_equal(actual_output, expected_output)
 
+def test_gen_chart_group_by_matches_cartesian_join():
+    """
+    Zero-filling in Python after one GROUP BY query must give the same chart
+    data as zero-filling in SQL using a cartesian join of distinct values.
+    """
+    con = sqlite3.connect(':memory:')
+    cur = con.cursor()
+    cur.execute('CREATE TABLE charttbl (gender INTEGER, country TEXT, '
+        'agegp INTEGER, age REAL)')
+    rows = []
+    for i in range(120):
+        rows.append((
+            None if i % 17 == 0 else 1 + i % 2,
+            ['Japan', 'italy', 'Germany', None][i % 4] if i % 5 else 'Italy',
+            None if i % 13 == 0 else 1 + (i * 7) % 5,
+            None if i % 11 == 0 else 20 + (i * 3) % 50))
+    rows.append((2, 'Nauru', 9, 33))  ## combination only found once
+    cur.executemany('INSERT INTO charttbl VALUES (?, ?, ?, ?)', rows)
+    def get_var_role_dic(agg, cat, series, charts):
+        var_role_dic = {}
+        for var_role, fld in [('agg', agg), ('cat', cat), ('series', series),
+                ('charts', charts)]:
+            var_role_dic[var_role] = fld
+            var_role_dic[f'{var_role}_name'] = fld.title() if fld else None
+            var_role_dic[f'{var_role}_lbls'] = {}
+        return var_role_dic
+    tests = [
+        (mg.SIMPLE_BARCHART, None, 'agegp', None, None, mg.SHOW_FREQ_KEY, ''),
+        (mg.CLUSTERED_BARCHART, None, 'agegp', 'country', None,
+            mg.SHOW_FREQ_KEY, ''),
+        (mg.CLUSTERED_BARCHART, None, 'country', 'agegp', 'gender',
+            mg.SHOW_PERC_KEY, 'age > 30'),
+        (mg.LINE_CHART, 'age', 'agegp', 'country', None, mg.SHOW_AVG_KEY, ''),
+        (mg.AREA_CHART, 'age', 'country', None, 'gender', mg.SHOW_SUM_KEY,
+            'agegp < 5'),
+    ]
+    for (chart_type, agg, cat, series, charts,
+            data_show, tbl_filt) in tests:
+        chart_output_dets = []
+        for use_group_by in (False, True):
+            chart_output_dets.append(charting_output.get_gen_chart_output_dets(
+                chart_type, mg.DBE_SQLITE, cur, 'charttbl', tbl_filt,
+                get_var_role_dic(agg, cat, series, charts),
+                mg.SORT_VALUE_KEY, data_show=data_show,
+                use_group_by=use_group_by))
+        assert_equal(chart_output_dets[0], chart_output_dets[1])
+    ## database order (case-insensitive here) even if a category is missing
+    ## from the first series
+    cur.execute('CREATE TABLE nocasetbl (gp TEXT COLLATE NOCASE, '
+        'cat TEXT COLLATE NOCASE)')
+    cur.executemany('INSERT INTO nocasetbl VALUES (?, ?)', [
+        ('a', 'B'), ('a', 'c'), ('B', 'a'), ('B', 'B'), ('B', 'B'), ])
+    chart_output_dets = []
+    for use_group_by in (False, True):
+        chart_output_dets.append(charting_output.get_gen_chart_output_dets(
+            mg.CLUSTERED_BARCHART, mg.DBE_SQLITE, cur, 'nocasetbl', '',
+            get_var_role_dic(None, 'cat', 'gp', None), mg.SORT_VALUE_KEY,
+            data_show=mg.SHOW_FREQ_KEY, use_group_by=use_group_by))
+    assert_equal(chart_output_dets[0], chart_output_dets[1])
+    raw_data, unused = charting_output.DataPrep.get_zero_filled_data(
+        [(1, 'a', 'B', 1, 1), (1, 'a', 'c', 1, 1), (1, 'B', 'a', 1, 1),
+         (1, 'B', 'B', 2, 2)])
+    assert_equal([row[1:3] for row in raw_data], [('a', 'a'), ('a', 'B'),
+        ('a', 'c'), ('B', 'a'), ('B', 'B'), ('B', 'c')])
+    con.close()
+
+def test_zero_filled_data_many_cats():
+    """
+    Merging the categories of each series must stay quick (one pass) with
+    thousands of categories e.g. ten years of daily data - and still end up in
+    database order with the categories of the series interleaved.
+    """
+    start_ordinal = datetime(2000, 1, 1).toordinal()
+    days = [datetime.fromordinal(start_ordinal + i).strftime('%Y-%m-%d')
+        for i in range(3_650)]
+    grouped_data = []
+    for series_val, series_days in [
+            (1, days[1::2]), (2, days[::2]), (3, days[::3] + ['2050-01-01'])]:
+        grouped_data.extend((1, series_val, day, 1, 1) for day in series_days)
+    start = time.perf_counter()
+    raw_data, chart_ns = charting_output.DataPrep.get_zero_filled_data(
+        grouped_data)
+    assert_true(time.perf_counter() - start < 10)
+    cat_vals = [row[2] for row in raw_data[:3_651]]
+    assert_equal(cat_vals, days + ['2050-01-01'])
+    assert_equal(len(raw_data), 3*3_651)
+    assert_equal(chart_ns, {1: len(grouped_data)})
+
+def test_boxplot_dets_from_one_fetch():
+    """
+    Every box must come from the one fetch (not a query per box) and have the
+    quartiles, whiskers, and outliers of its own values.
+    """
+    con = sqlite3.connect(':memory:')
+    cur = CountingCursor(con.cursor())
+    cur.execute('CREATE TABLE boxtbl (gp INTEGER, country TEXT, x REAL)')
+    rows = [(i % 5, ['NZ', 'Japan', None][i % 3], (i * 37) % 101)
+        for i in range(300)]
+    rows.extend([(0, 'NZ', 500), (0, 'NZ', -400), (4, 'Palau', 3)])
+    cur.executemany('INSERT INTO boxtbl VALUES (?, ?, ?)', rows)
+    flds = {
+        'gp': {mg.FLD_BOLNUMERIC: True},
+        'country': {mg.FLD_BOLNUMERIC: False},
+        'x': {mg.FLD_BOLNUMERIC: True}, }
+    var_role_dic = {}
+    for var_role, fld in [('desc', 'x'), ('cat', 'gp'), ('series', 'country')]:
+        var_role_dic[var_role] = fld
+        var_role_dic[f'{var_role}_name'] = fld.title()
+        var_role_dic[f'{var_role}_lbls'] = {}
+    cur.executed_n = 0
+    (n_chart, xaxis_dets, unused, unused, unused, unused, unused, unused,
+     unused, chart_dets,
+     any_missing_boxes) = charting_output.BoxPlot.get_boxplot_dets(
+        mg.DBE_SQLITE, cur, 'boxtbl', '', flds, var_role_dic,
+        mg.SORT_VALUE_KEY)
+    assert_equal(cur.executed_n, 3)  ## series, categories, and values
+    assert_equal(n_chart, len([row for row in rows if row[1] is not None]))
+    assert_equal(len(xaxis_dets), 5)
+    assert_equal([series_dic[mg.CHART_SERIES_LBL] for series_dic in chart_dets],
+        ['Japan', 'NZ', 'Palau'])
+    assert any_missing_boxes  ## Palau only has gp 4
+    nz_box = chart_dets[1][mg.CHART_BOXDETS][0]  ## NZ and gp 0
+    vals = sorted(x for gp, country, x in rows if gp == 0 and country == 'NZ')
+    lq, uq = core_stats.get_quartiles(vals)
+    assert_equal(nz_box[mg.CHART_BOXPLOT_MEDIAN], np.median(vals))
+    assert_equal(nz_box[mg.CHART_BOXPLOT_LBOX], lq)
+    assert_equal(nz_box[mg.CHART_BOXPLOT_UBOX], uq)
+    iqr = uq - lq
+    assert_equal(nz_box[mg.CHART_BOXPLOT_LWHISKER],
+        min(x for x in vals if x >= lq - 1.5*iqr))
+    assert_equal(nz_box[mg.CHART_BOXPLOT_UWHISKER],
+        max(x for x in vals if x <= uq + 1.5*iqr))
+    assert_equal(nz_box[mg.CHART_BOXPLOT_OUTLIERS], [500, -400])
+    con.close()
+
+def test_histo_bins_in_db_match_python():
+    """
+    Binning in the database must give the same bins and counts as binning in
+    Python, and near enough the same normal curve - incl when there are
+    multiple charts and when saw-toothing has to be fixed.
+    """
+    con = sqlite3.connect(':memory:')
+    cur = con.cursor()
+    cur.execute('CREATE TABLE histotbl (gp INTEGER, age INTEGER, wt REAL, '
+        'score INTEGER)')
+    rows = [(None if i % 23 == 0 else i % 3,
+        None if i % 19 == 0 else 20 + 2*((i * 7) % 30),  ## even ages only
+        None if i % 11 == 0 else 50 + ((i * 37) % 101)/3.0,
+        2*(i % 4))  ## gaps between scores so saw-toothing
+        for i in range(400)]
+    cur.executemany('INSERT INTO histotbl VALUES (?, ?, ?, ?)', rows)
+    flds = {
+        'gp': {mg.FLD_BOLNUMERIC: True},
+        'age': {mg.FLD_BOLNUMERIC: True},
+        'wt': {mg.FLD_BOLNUMERIC: True},
+        'score': {mg.FLD_BOLNUMERIC: True}, }
+    n_compared = 0
+    for bin_fld in ('age', 'wt', 'score'):
+        for charts, tbl_filt in [(None, ''), ('gp', ''), ('gp', 'wt > 60')]:
+            var_role_dic = {'bin': bin_fld, 'bin_name': bin_fld.title(),
+                'charts': charts, 'charts_name': charts and charts.title(),
+                'charts_lbls': {}}
+            histo_dets = []
+            for bin_in_db in (False, True):
+                histo_dets.append(charting_output.Histo.get_histo_dets(
+                    mg.DBE_SQLITE, cur, 'histotbl', tbl_filt, flds,
+                    var_role_dic, inc_normal=True, bin_in_db=bin_in_db))
+            (py_title, py_histo_dics), (db_title, db_histo_dics) = histo_dets
+            assert_equal(py_title, db_title)
+            assert_equal(len(py_histo_dics), len(db_histo_dics))
+            for py_histo_dic, db_histo_dic in zip(py_histo_dics, db_histo_dics):
+                py_norm_ys = py_histo_dic.pop(mg.CHART_NORMAL_Y_VALS)
+                db_norm_ys = db_histo_dic.pop(mg.CHART_NORMAL_Y_VALS)
+                assert_equal(py_histo_dic, db_histo_dic)
+                assert_true(np.allclose(py_norm_ys, db_norm_ys))
+            n_compared += 1
+    assert_equal(n_compared, 9)  ## every field, chart, and filter combination
+    con.close()
+
+def test_scatterplot_thinned_for_dojo():
+    """
+    Too many points for an interactive chart must be thinned to no more than
+    the maximum, all kept points must be real, crowded areas must keep their
+    share of the points, and the regression line must still come from every
+    point.
+    """
+    con = sqlite3.connect(':memory:')
+    cur = con.cursor()
+    cur.execute('CREATE TABLE scattertbl (country TEXT, x REAL, y REAL)')
+    rng = np.random.default_rng(42)
+    xs = rng.normal(50, 10, 6_000)
+    ys = 2*xs + rng.normal(0, 15, 6_000)
+    cur.executemany('INSERT INTO scattertbl VALUES (?, ?, ?)',
+        [(['NZ', 'Japan'][i % 2], float(x), float(y))
+         for i, (x, y) in enumerate(zip(xs, ys))])
+    var_role_dic = {'x_axis': 'x', 'x_axis_name': 'X', 'y_axis': 'y',
+        'y_axis_name': 'Y', 'series': 'country', 'series_name': 'Country',
+        'series_lbls': {}, 'charts': None, 'charts_name': None,
+        'charts_lbls': {}}
+    scatterplot_dets = []
+    for thin in (False, True):
+        unused, dets = charting_output.ScatterPlot.get_scatterplot_dets(
+            mg.DBE_SQLITE, cur, 'scattertbl', '', var_role_dic,
+            inc_regression=True, thin=thin)
+        scatterplot_dets.append(dets)
+    all_series_dets, thinned_series_dets = [
+        dets[mg.CHARTS_CHART_DETS][0][mg.CHARTS_SERIES_DETS]
+        for dets in scatterplot_dets]
+    assert_true(charting_output.ScatterPlot._use_mpl_scatterplots(
+        scatterplot_dets[0]))
+    assert_true(not charting_output.ScatterPlot._use_mpl_scatterplots(
+        scatterplot_dets[1]))
+    n_shown = 0
+    for all_series_det, thinned_series_det in zip(all_series_dets,
+            thinned_series_dets):
+        thinned_data_tups = thinned_series_det[mg.DATA_TUPS]
+        assert_true(set(thinned_data_tups) <= set(all_series_det[mg.DATA_TUPS]))
+        assert_true(len(thinned_data_tups) > 100)  ## not thinned to nothing
+        n_shown += len(thinned_data_tups)
+        def get_central_share(data_tups):
+            return sum(1 for x, unused in data_tups
+                if 40 <= x <= 60)/len(data_tups)  ## within 1 SD
+        assert_true(abs(get_central_share(thinned_data_tups)
+            - get_central_share(all_series_det[mg.DATA_TUPS])) < 0.05)
+        assert_equal(thinned_series_det[mg.LIST_X], all_series_det[mg.LIST_X])
+        assert_equal(thinned_series_det[mg.LINE_LST],
+            all_series_det[mg.LINE_LST])
+    assert_true(n_shown <= mg.MAX_POINTS_DOJO_SCATTERPLOT)
+    con.close()
+
+def test_time_series_reduced_keeping_shape():
+    """
+    Long time series must be reduced to the maximum points with the first,
+    last, and extreme points kept, and with x-axis details, y values, and
+    tooltips still lined up.
+    """
+    n = 5_000
+    start_ordinal = datetime(2000, 1, 1).toordinal()
+    xaxis_dets = []
+    for i in range(n):
+        day = datetime.fromordinal(start_ordinal + i).strftime('%Y-%m-%d')
+        xaxis_dets.append((day, day, day))
+    y_vals = [10 + (i % 7) for i in range(n)]
+    y_vals[1_234] = 500  ## spike
+    y_vals[4_321] = -500  ## trough
+    series_det = {mg.CHARTS_SERIES_LBL_IN_LEGEND: None,
+        mg.CHARTS_XAXIS_DETS: xaxis_dets,
+        mg.CHARTS_SERIES_Y_VALS: y_vals,
+        mg.CHARTS_SERIES_TOOLTIPS: [str(y_val) for y_val in y_vals]}
+    (reduced_series_det,
+     n_points) = charting_output.LineAreaChart._get_reduced_series_det(
+        series_det, 'Day', max_points=300)
+    assert_equal(n_points, n)
+    reduced_xaxis_dets = reduced_series_det[mg.CHARTS_XAXIS_DETS]
+    reduced_y_vals = reduced_series_det[mg.CHARTS_SERIES_Y_VALS]
+    assert_equal(len(reduced_y_vals), 300)
+    assert_equal(reduced_xaxis_dets[0], xaxis_dets[0])
+    assert_equal(reduced_xaxis_dets[-1], xaxis_dets[-1])
+    assert_true(500 in reduced_y_vals and -500 in reduced_y_vals)
+    assert_equal(reduced_xaxis_dets, sorted(reduced_xaxis_dets))
+    for xaxis_det, y_val, tooltip in zip(reduced_xaxis_dets, reduced_y_vals,
+            reduced_series_det[mg.CHARTS_SERIES_TOOLTIPS]):
+        idx = xaxis_dets.index(xaxis_det)
+        assert_equal(y_val, y_vals[idx])
+        assert_equal(tooltip, str(y_vals[idx]))
+    assert_equal(series_det[mg.CHARTS_SERIES_Y_VALS], y_vals)  ## not altered
+    ## short enough already
+    assert_true(charting_output.LineAreaChart._get_reduced_series_det(
+        series_det, 'Day', max_points=n)[0] is series_det)
+
+def test_reduced_msg_only_counts_data_points():
+    """
+    Trend and smooth lines are not data so mustn't be counted in the message
+    about how many points are shown.
+    """
+    n = 1_000
+    start_ordinal = datetime(2000, 1, 1).toordinal()
+    xaxis_dets = []
+    for i in range(n):
+        day = datetime.fromordinal(start_ordinal + i).strftime('%Y-%m-%d')
+        xaxis_dets.append((day, day, day))
+    series_det = {mg.CHARTS_SERIES_LBL_IN_LEGEND: None,
+        mg.CHARTS_XAXIS_DETS: xaxis_dets,
+        mg.CHARTS_SERIES_Y_VALS: [10 + (i % 7) for i in range(n)],
+        mg.CHARTS_SERIES_TOOLTIPS: ['']}
+    chart_output_dets = {mg.CHARTS_OVERALL_TITLE: '',
+        mg.CHARTS_OVERALL_LEGEND_LBL: None, mg.CHARTS_MAX_X_LBL_LEN: 10,
+        mg.CHARTS_MAX_Y_LBL_LEN: 3, mg.CHARTS_MAX_LBL_LINES: 1,
+        mg.CHARTS_CHART_DETS: [{mg.CHARTS_CHART_LBL: 'Day',
+            mg.CHARTS_CHART_N: n, mg.CHARTS_SERIES_DETS: [series_det]}]}
+    css_fpath = Path(__file__).resolve().parent.parent / 'css' / 'default.css'
+    html = charting_output.LineAreaChart.linechart_output(['Title'], [], 'Day',
+        'Freq', chart_output_dets, css_fpath, 0, time_series=True,
+        rotate=False, show_n=False, major_ticks=False, inc_trend=True,
+        inc_smooth=True, hide_markers=False, page_break_after=False,
+        max_points=300)
+    assert_true('Showing 300 of 1,000 points' in html)
+
 def test_get_blocks():
     tests = [
              ((range(1,44), 20), ## 1-43 in blocks of 20 please :-)
@@ -1610,6 +1933,705 @@ def test_get_range_idxs():
     for vals, val_a, val_b, idx_tup in tests:
         assert_equal(indep2var.get_range_idxs(vals, val_a, val_b), idx_tup)
 
+def test_get_grouped_samples():
+    """
+    Must match what separate get_list calls per group would have returned.
+    Groups are interleaved in the table so rows for a group are not contiguous.
+    """
+    con = sqlite3.connect(':memory:')
+    cur = con.cursor()
+    cur.execute('CREATE TABLE grouped (gp TEXT, num_gp INTEGER, x REAL)')
+    cur.executemany('INSERT INTO grouped VALUES (?, ?, ?)', [
+        ('a', 1, 1.5), ('b', 2, 2), ('a', 1, None), ("o'c", 3, 4),
+        ('b', 2, 3.5), ('a', 1, 2.5), ("o'c", 3, 5), ('b', 1, 7),
+        ('d', 3, 8), ('a', 2, 6), ])
+    flds = {
+        'gp': {mg.FLD_BOLNUMERIC: False},
+        'num_gp': {mg.FLD_BOLNUMERIC: True},
+        'x': {mg.FLD_BOLNUMERIC: True}, }
+    tests = [
+        ('gp', ["o'c", 'a', 'b'], ''),
+        ('gp', ['a', 'b'], 'x < 7'),
+        ('num_gp', [1, 2, 3], ''),
+    ]
+    for fld_filter, filter_vals, tbl_filt in tests:
+        samples = core_stats.get_grouped_samples(mg.DBE_SQLITE, cur,
+            'grouped', tbl_filt, flds, 'x', fld_filter, filter_vals)
+        for sample, filter_val in zip(samples, filter_vals):
+            expected = core_stats.get_list(mg.DBE_SQLITE, cur, 'grouped',
+                tbl_filt, flds, 'x', fld_filter, filter_val)
+            assert_equal(sorted(sample.tolist()), sorted(expected))
+    assert_raises(my_exceptions.TooFewValsInSamplesForAnalysis,
+        core_stats.get_grouped_samples, mg.DBE_SQLITE, cur, 'grouped', '',
+        flds, 'x', 'gp', ['a', 'd'])
+    con.close()
+
+def test_get_col_samples():
+    """
+    Non-numeric values in a numeric field (SQLite allows them) must be skipped
+    like missing values - not stop every column being read. Same from a
+    snapshot.
+    """
+    orig_use_tbl_snapshots = mg.USE_TBL_SNAPSHOTS
+    getdata.clear_vals_cache()
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        con = sqlite3.connect(str(Path(tmp_dir) / 'coldb.db'))
+        cur = con.cursor()
+        cur.execute('CREATE TABLE coltbl (x REAL, y REAL)')
+        cur.executemany('INSERT INTO coltbl VALUES (?, ?)', [
+            (1.5, 2), (None, 3), (2, 'n/a'), ('4', 5), ])
+        con.commit()
+        flds = {
+            'x': {mg.FLD_BOLNUMERIC: True},
+            'y': {mg.FLD_BOLNUMERIC: True}, }
+        mg.USE_TBL_SNAPSHOTS = True
+        try:
+            for db in (None, 'coldb'):
+                samples = core_stats.get_col_samples(mg.DBE_SQLITE, cur,
+                    'coltbl', '', ['x', 'y'], flds=flds, db=db)
+                assert_equal([sample.tolist() for sample in samples],
+                    [[1.5, 2, 4], [2, 3, 5]])
+            assert_equal(len(getdata.tbl_snapshots), 1)
+        finally:
+            mg.USE_TBL_SNAPSHOTS = orig_use_tbl_snapshots
+            getdata.clear_vals_cache()
+        con.close()
+
+def test_tbl_snapshots():
+    """
+    Samples taken from a snapshot must match those taken from the database, the
+    database must only be read once for repeated analyses, and changes to the
+    data (even through another connection) must mean a fresh snapshot. No
+    snapshot if there's no change stamp to check it against, or too many rows -
+    and no counting or stamping again for tables known not to suit.
+    """
+    orig_use_tbl_snapshots = mg.USE_TBL_SNAPSHOTS
+    orig_max_rows = mg.TBL_SNAPSHOT_MAX_ROWS
+    getdata.clear_vals_cache()
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db_path = Path(tmp_dir) / 'snapdb.db'
+        con = sqlite3.connect(str(db_path))
+        cur = con.cursor()
+        cur.execute('CREATE TABLE snaptbl (gp TEXT, num_gp INTEGER, x REAL, '
+            'y REAL)')
+        cur.executemany('INSERT INTO snaptbl VALUES (?, ?, ?, ?)', [
+            ('a', 1, 1.5, 2), ('b', 2, 2, None), ('a', 1, None, 3),
+            ("o'c", 3, 4, 4), ('b', 2, 3.5, 1), ('a', 1, 2.5, 2.5),
+            ("o'c", 3, 5, 5), ('b', 1, 7, 7), (None, 3, 8, 8),
+            ('a', 2, 6, 1.5), ])
+        con.commit()
+        flds = {
+            'gp': {mg.FLD_BOLNUMERIC: False},
+            'num_gp': {mg.FLD_BOLNUMERIC: True},
+            'x': {mg.FLD_BOLNUMERIC: True},
+            'y': {mg.FLD_BOLNUMERIC: True}, }
+        def get_results(db, tbl_filt):
+            return [
+                core_stats.get_list(mg.DBE_SQLITE, cur, 'snaptbl', tbl_filt,
+                    flds, 'x', 'gp', 'a', db=db),
+                core_stats.get_list(mg.DBE_SQLITE, cur, 'snaptbl', tbl_filt,
+                    flds, 'y', 'num_gp', 1, db=db),
+                [sample.tolist() for sample in core_stats.get_grouped_samples(
+                    mg.DBE_SQLITE, cur, 'snaptbl', tbl_filt, flds, 'x', 'gp',
+                    ['b', 'a'], db=db)],
+                [sample.tolist() for sample in core_stats.get_col_samples(
+                    mg.DBE_SQLITE, cur, 'snaptbl', tbl_filt, ['x', 'y'],
+                    flds=flds, db=db)],
+                core_stats.get_paired_data(mg.DBE_SQLITE, cur, 'snaptbl',
+                    tbl_filt, 'x', 'y', flds=flds, db=db)[:2],
+                sorted(core_stats.get_paired_data(mg.DBE_SQLITE, cur,
+                    'snaptbl', tbl_filt, 'num_gp', 'y', unique=True,
+                    flds=flds, db=db)[2]),
+            ]
+        mg.USE_TBL_SNAPSHOTS = True
+        try:
+            for tbl_filt in ('', 'x > 1.6'):
+                from_db = get_results(None, tbl_filt)
+                assert_equal(get_results('snapdb', tbl_filt), from_db)
+            assert_equal(len(getdata.tbl_snapshots), 2)  ## one per filter
+            snapshot = getdata.tbl_snapshots[
+                (mg.DBE_SQLITE, 'snapdb', 'snaptbl', '')]
+            get_results('snapdb', '')
+            assert snapshot is getdata.tbl_snapshots[
+                (mg.DBE_SQLITE, 'snapdb', 'snaptbl', '')]  ## no re-read
+            ## changed through another connection
+            con2 = sqlite3.connect(str(db_path))
+            con2.execute("INSERT INTO snaptbl VALUES ('a', 1, 9, 9)")
+            con2.commit()
+            con2.close()
+            results = get_results('snapdb', '')
+            assert 9 in results[0]
+            assert_equal(results, get_results(None, ''))
+            getdata.clear_vals_cache(mg.DBE_SQLITE, 'snapdb', 'snaptbl')
+            assert_equal(len(getdata.tbl_snapshots), 0)
+            mem_con = sqlite3.connect(':memory:')
+            mem_cur = mem_con.cursor()
+            mem_cur.execute('CREATE TABLE snaptbl (x REAL)')
+            assert snapshots.get_snapshot(mg.DBE_SQLITE, mem_cur, 'memdb',
+                'snaptbl', '', {'x': {mg.FLD_BOLNUMERIC: True}}) is None
+            assert_equal(len(getdata.tbl_snapshots), 0)
+            assert (mg.DBE_SQLITE, 'memdb', 'snaptbl', '') in (
+                getdata.tbl_snapshots_unavailable)
+            mem_con.close()
+            ## too big
+            mg.TBL_SNAPSHOT_MAX_ROWS = 5
+            counting_cur = CountingCursor(cur)
+            for expected_executed_n in (1, 0):  ## COUNT(*) only first time
+                counting_cur.executed_n = 0
+                assert snapshots.get_snapshot(mg.DBE_SQLITE, counting_cur,
+                    'snapdb', 'snaptbl', '', flds) is None
+                assert_equal(counting_cur.executed_n, expected_executed_n)
+            assert_equal(len(getdata.tbl_snapshots), 0)
+            getdata.clear_vals_cache(mg.DBE_SQLITE, 'snapdb', 'snaptbl')
+            assert_equal(len(getdata.tbl_snapshots_unavailable), 1)  ## memdb
+            mg.TBL_SNAPSHOT_MAX_ROWS = orig_max_rows
+            assert snapshots.get_snapshot(mg.DBE_SQLITE, cur, 'snapdb',
+                'snaptbl', '', flds) is not None
+        finally:
+            mg.USE_TBL_SNAPSHOTS = orig_use_tbl_snapshots
+            mg.TBL_SNAPSHOT_MAX_ROWS = orig_max_rows
+            getdata.clear_vals_cache()
+        con.close()
+
+def test_get_obs_exp():
+    """
+    Unseen combinations must be zero-filled and lists must be b within a.
+    """
+    con = sqlite3.connect(':memory:')
+    cur = con.cursor()
+    cur.execute('CREATE TABLE crosstab (a TEXT, b INTEGER, x REAL)')
+    cur.executemany('INSERT INTO crosstab VALUES (?, ?, ?)', [
+        ('y', 10, 1), ('x', 2, 1), ('x', 2, 1), ('y', 2, 0), ('x', 10, 1),
+        ('y', 10, 1), ('x', None, 1), (None, 2, 1), ('z', 2, 1), ])
+    flds = {
+        'a': {mg.FLD_BOLNUMERIC: False},
+        'b': {mg.FLD_BOLNUMERIC: True},
+        'x': {mg.FLD_BOLNUMERIC: True}, }
+    (vals_a, vals_b, lst_obs, lst_exp, min_count, perc_cells_lt_5,
+        df) = core_stats.get_obs_exp(mg.DBE_SQLITE, cur, 'crosstab', '', '',
+        '', flds, 'a', 'b')
+    assert_equal(vals_a, ['x', 'y', 'z'])
+    assert_equal(vals_b, [2.0, 10.0])
+    assert_equal(lst_obs, [2, 1, 1, 2, 1, 0])
+    ## row totals 3, 3, 1; col totals 4, 3; grand total 7
+    expected_exp = [12/7, 9/7, 12/7, 9/7, 4/7, 3/7]
+    for exp, expected in zip(lst_exp, expected_exp):
+        assert_almost_equals(exp, expected)
+    assert_almost_equals(min_count, 3/7)
+    assert_equal(perc_cells_lt_5, 100)
+    assert_equal(df, 2)
+    (vals_a, vals_b, lst_obs, unused, unused, unused,
+        df) = core_stats.get_obs_exp(mg.DBE_SQLITE, cur, 'crosstab', 'x > 0',
+        'WHERE x > 0', 'AND x > 0', flds, 'a', 'b')
+    assert_equal(vals_a, ['x', 'y', 'z'])
+    assert_equal(lst_obs, [2, 1, 0, 2, 1, 0])
+    ## rows and columns both in database order (not Python's)
+    cur.execute('CREATE TABLE nocase (a TEXT COLLATE NOCASE, '
+        'b TEXT COLLATE NOCASE)')
+    cur.executemany('INSERT INTO nocase VALUES (?, ?)', [
+        ('B', 'B'), ('a', 'a'), ('a', 'B'), ('B', 'a'), ('a', 'a'), ])
+    flds = {
+        'a': {mg.FLD_BOLNUMERIC: False},
+        'b': {mg.FLD_BOLNUMERIC: False}, }
+    (vals_a, vals_b, lst_obs, unused, unused, unused,
+        unused) = core_stats.get_obs_exp(mg.DBE_SQLITE, cur, 'nocase', '', '',
+        '', flds, 'a', 'b')
+    assert_equal(vals_a, ['a', 'B'])
+    assert_equal(vals_b, ['a', 'B'])
+    assert_equal(lst_obs, [2, 1, 1, 1])
+    con.close()
+
+def test_gen_table_group_by_matches_sum_case():
+    """
+    The single GROUP BY engine must give exactly the same table as the batches
+    of SUM(CASE ...) clauses - including totals, missing values, nesting, and
+    col measures without a col field.
+    """
+    con = sqlite3.connect(':memory:')
+    cur = con.cursor()
+    cur.execute('CREATE TABLE gentbl (gender INTEGER, agegp TEXT, eth INTEGER, '
+        'x REAL)')
+    cur.executemany('INSERT INTO gentbl VALUES (?, ?, ?, ?)', [
+        (1, 'a', 1, 0.1), (2, "o'b", 2, 0.5), (1, "o'b", None, 0.9),
+        (None, 'c', 3, 0.2), (2, 'a', 1, 0.7), (1, None, 2, 0.4),
+        (2, 'c', 3, None), (1, 'a', 3, 0.6), (2, 'a', 2, 0.8),
+        (1, 'c', 1, 0.3), ])
+    flds = {
+        'gender': {mg.FLD_BOLNUMERIC: True},
+        'agegp': {mg.FLD_BOLNUMERIC: False},
+        'eth': {mg.FLD_BOLNUMERIC: True},
+        'x': {mg.FLD_BOLNUMERIC: True}, }
+    all_measures = [mg.FREQ_KEY, mg.ROWPCT_KEY, mg.COLPCT_KEY]
+    def get_crosstab_trees():
+        tree_rows = dimtables.DimNodeTree()
+        gender = dimtables.DimNode(fld='gender', has_tot=True, bolnumeric=True)
+        tree_rows.add_child(gender)
+        gender.add_child(dimtables.DimNode(fld='agegp', has_tot=True))
+        tree_rows.add_child(dimtables.DimNode(fld='eth', bolnumeric=True))
+        tree_cols = dimtables.DimNodeTree()
+        tree_cols.add_child(dimtables.DimNode(fld='agegp', has_tot=True,
+            measures=all_measures))
+        gender = dimtables.DimNode(fld='gender', has_tot=True, bolnumeric=True)
+        tree_cols.add_child(gender)
+        gender.add_child(dimtables.DimNode(fld='eth', has_tot=True,
+            bolnumeric=True, measures=[mg.COLPCT_KEY, mg.ROWPCT_KEY]))
+        return tree_rows, tree_cols
+    def get_freqs_trees():
+        tree_rows = dimtables.DimNodeTree()
+        tree_rows.add_child(dimtables.DimNode(fld='agegp', has_tot=True))
+        tree_cols = dimtables.DimNodeTree()
+        tree_cols.add_child(dimtables.DimNode(measures=all_measures))
+        return tree_rows, tree_cols
+    tests = [
+        (mg.CROSSTAB, get_crosstab_trees, ''),
+        (mg.CROSSTAB, get_crosstab_trees, 'x > 0.3'),
+        (mg.FREQS, get_freqs_trees, ''),
+    ]
+    for tab_type, get_trees, tbl_filt in tests:
+        htmls = []
+        for use_group_by in (False, True):
+            tree_rows, tree_cols = get_trees()
+            tab_test = dimtables.GenTable(titles=['Test'], subtitles=[],
+                tab_type=tab_type, dbe=mg.DBE_SQLITE, tbl='gentbl',
+                tbl_filt=tbl_filt, cur=cur, flds=flds, tree_rows=tree_rows,
+                tree_cols=tree_cols, use_group_by=use_group_by)
+            htmls.append(tab_test.get_html(0, dp=1))
+        assert 'Problem getting table output' not in htmls[0]
+        assert_equal(htmls[0], htmls[1])
+        ## streamed HTML must be the same as the HTML all at once
+        tree_rows, tree_cols = get_trees()
+        tab_test = dimtables.GenTable(titles=['Test'], subtitles=[],
+            tab_type=tab_type, dbe=mg.DBE_SQLITE, tbl='gentbl',
+            tbl_filt=tbl_filt, cur=cur, flds=flds, tree_rows=tree_rows,
+            tree_cols=tree_cols)
+        tab_test.prep_table(0)
+        assert tab_test.get_cell_n_ok(max_cells=None)
+        fil = io.StringIO()
+        tab_test.write_html(fil, 0, dp=1)
+        assert_equal(fil.getvalue(), htmls[0])
+    con.close()
+
+def test_gen_table_con_pool_matches_serial():
+    """
+    SUM(CASE ...) batches run side by side through a pool of connections must
+    come back in cell order i.e. give the same table as running them one after
+    another.
+    """
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db_path = Path(tmp_dir) / 'pooldb.db'
+        con = sqlite3.connect(str(db_path))
+        cur = con.cursor()
+        cur.execute('CREATE TABLE pooltbl (a INTEGER, b INTEGER)')
+        cur.executemany('INSERT INTO pooltbl VALUES (?, ?)',
+            [(i % 7, i % 11) for i in range(200)])
+        con.commit()
+        flds = {
+            'a': {mg.FLD_BOLNUMERIC: True},
+            'b': {mg.FLD_BOLNUMERIC: True}, }
+        con_dets = {mg.DBE_SQLITE: {'pooldb': {'database': str(db_path)}}}
+        htmls = []
+        for con_pool_size in (1, 3):
+            tree_rows = dimtables.DimNodeTree()
+            tree_rows.add_child(dimtables.DimNode(fld='a', has_tot=True,
+                bolnumeric=True))
+            tree_cols = dimtables.DimNodeTree()
+            tree_cols.add_child(dimtables.DimNode(fld='b', has_tot=True,
+                bolnumeric=True,
+                measures=[mg.FREQ_KEY, mg.ROWPCT_KEY, mg.COLPCT_KEY]))
+            tab_test = dimtables.GenTable(titles=['Test'], subtitles=[],
+                tab_type=mg.CROSSTAB, dbe=mg.DBE_SQLITE, db='pooldb',
+                tbl='pooltbl', tbl_filt='', cur=cur, flds=flds,
+                tree_rows=tree_rows, tree_cols=tree_cols, use_group_by=False,
+                con_dets=con_dets, con_pool_size=con_pool_size)
+            htmls.append(tab_test.get_html(0, dp=1))
+        assert 'Problem getting table output' not in htmls[0]
+        assert_equal(htmls[0], htmls[1])
+        con.close()
+
+def test_summ_table_single_scan_matches_per_cell_sql():
+    """
+    Measures calculated from one read of the table must match those from the
+    per-cell SQL - including totals, missing values, and no row variable.
+    """
+    con = sqlite3.connect(':memory:')
+    cur = con.cursor()
+    cur.execute('CREATE TABLE summtbl (gender INTEGER, agegp TEXT, '
+        'n INTEGER, x REAL)')
+    cur.executemany('INSERT INTO summtbl VALUES (?, ?, ?, ?)', [
+        (1, 'a', 1, 0.5), (2, "o'b", 2, 1.25), (1, "o'b", None, 2.75),
+        (None, 'c', 3, 0.25), (2, 'a', 1, None), (1, None, 2, 4.5),
+        (2, 'c', 3, 1.5), (1, 'a', 3, 3.0), (2, 'a', 2, 0.75),
+        (1, 'c', 1, 2.0), (3, 'd', None, None), ])
+    flds = {
+        'gender': {mg.FLD_BOLNUMERIC: True},
+        'agegp': {mg.FLD_BOLNUMERIC: False},
+        'n': {mg.FLD_BOLNUMERIC: True},
+        'x': {mg.FLD_BOLNUMERIC: True}, }
+    measures = [mg.MIN_KEY, mg.MAX_KEY, mg.RANGE_KEY, mg.SUM_KEY, mg.MEAN_KEY,
+        mg.MEDIAN_KEY, mg.MODE_KEY, mg.LOWER_QUARTILE_KEY,
+        mg.UPPER_QUARTILE_KEY, mg.IQR_KEY, mg.SUMM_N_KEY, mg.STD_DEV_KEY]
+    def get_trees(*, inc_row_var):
+        tree_rows = dimtables.DimNodeTree()
+        if inc_row_var:
+            gender = dimtables.DimNode(fld='gender', has_tot=True,
+                bolnumeric=True)
+            tree_rows.add_child(gender)
+            gender.add_child(dimtables.DimNode(fld='agegp', has_tot=True))
+        tree_cols = dimtables.DimNodeTree()
+        for fld in ('n', 'x'):
+            tree_cols.add_child(dimtables.DimNode(fld=fld, measures=measures,
+                bolnumeric=True))
+        return tree_rows, tree_cols
+    for inc_row_var in (True, False):
+        for tbl_filt in ('', 'x > 0.5'):
+            htmls = []
+            for single_scan in (False, True):
+                tree_rows, tree_cols = get_trees(inc_row_var=inc_row_var)
+                tab_test = dimtables.SummTable(titles=['Test'], subtitles=[],
+                    tab_type=mg.ROW_STATS, dbe=mg.DBE_SQLITE, tbl='summtbl',
+                    tbl_filt=tbl_filt, cur=cur, flds=flds,
+                    tree_rows=tree_rows, tree_cols=tree_cols,
+                    single_scan=single_scan)
+                htmls.append(tab_test.get_html(0, dp=3))
+            assert 'Problem getting table output' not in htmls[0]
+            assert_equal(htmls[0], htmls[1])
+    con.close()
+
+def test_summ_table_aggs_from_one_group_by():
+    """
+    Measures only needing SQL aggregates must come from one GROUP BY query with
+    no values read. Values are only read (in one more query) if a measure needs
+    them.
+    """
+    con = sqlite3.connect(':memory:')
+    cur = con.cursor()
+    cur.execute('CREATE TABLE aggstbl (gp INTEGER, x REAL)')
+    cur.executemany('INSERT INTO aggstbl VALUES (?, ?)',
+        [(i % 3, i / 4) for i in range(30)])
+    flds = {
+        'gp': {mg.FLD_BOLNUMERIC: True},
+        'x': {mg.FLD_BOLNUMERIC: True}, }
+    aggs_measures = [mg.MIN_KEY, mg.MAX_KEY, mg.RANGE_KEY, mg.SUM_KEY,
+        mg.MEAN_KEY, mg.SUMM_N_KEY]
+    for measures, n_queries in (
+            (aggs_measures, 1),
+            (aggs_measures + [mg.MEDIAN_KEY, mg.STD_DEV_KEY], 2)):
+        tree_rows = dimtables.DimNodeTree()
+        tree_rows.add_child(dimtables.DimNode(fld='gp', has_tot=True,
+            bolnumeric=True))
+        tree_cols = dimtables.DimNodeTree()
+        tree_cols.add_child(dimtables.DimNode(fld='x', bolnumeric=True,
+            measures=measures))
+        tab_test = dimtables.SummTable(titles=['Test'], subtitles=[],
+            tab_type=mg.ROW_STATS, dbe=mg.DBE_SQLITE, tbl='aggstbl',
+            tbl_filt='', cur=cur, flds=flds, tree_rows=tree_rows,
+            tree_cols=tree_cols, single_scan=True)
+        tab_test.prep_table(0)
+        sqls = []
+        get_all_rows = tab_test.get_all_rows
+        def recording_get_all_rows(SQL):
+            sqls.append(SQL)
+            return get_all_rows(SQL)
+        tab_test.get_all_rows = recording_get_all_rows
+        html = tab_test.get_html(0, dp=3)
+        assert 'Problem getting table output' not in html
+        assert_equal(len(sqls), n_queries)
+        assert 'GROUP BY' in sqls[0]
+    con.close()
+
+def test_summ_table_approx_quantiles_stream_once_per_cell():
+    """
+    With approx_quantiles, the values for a cell must only be streamed once
+    however many quantile-based measures (and std dev) are shown for it.
+    """
+    con = sqlite3.connect(':memory:')
+    cur = CountingCursor(con.cursor())
+    cur.execute('CREATE TABLE approxtbl (gp INTEGER, x REAL)')
+    cur.executemany('INSERT INTO approxtbl VALUES (?, ?)',
+        [(i % 3, i / 4) for i in range(30)])
+    flds = {
+        'gp': {mg.FLD_BOLNUMERIC: True},
+        'x': {mg.FLD_BOLNUMERIC: True}, }
+    tree_rows = dimtables.DimNodeTree()
+    tree_rows.add_child(dimtables.DimNode(fld='gp', has_tot=True,
+        bolnumeric=True))
+    tree_cols = dimtables.DimNodeTree()
+    tree_cols.add_child(dimtables.DimNode(fld='x', bolnumeric=True,
+        measures=[mg.MEDIAN_KEY, mg.LOWER_QUARTILE_KEY, mg.UPPER_QUARTILE_KEY,
+            mg.IQR_KEY, mg.STD_DEV_KEY, mg.MEAN_KEY]))
+    tab_test = dimtables.SummTable(titles=['Test'], subtitles=[],
+        tab_type=mg.ROW_STATS, dbe=mg.DBE_SQLITE, tbl='approxtbl',
+        tbl_filt='', cur=cur, flds=flds, tree_rows=tree_rows,
+        tree_cols=tree_cols, approx_quantiles=True)
+    tab_test.prep_table(0)
+    executed_n = cur.executed_n
+    html = tab_test.get_html(0, dp=3)
+    assert 'Problem getting table output' not in html
+    assert mg.NO_CALC_LBL not in html
+    ## one GROUP BY for the mean then one stream per row (3 groups and total)
+    assert_equal(cur.executed_n - executed_n, 1 + 4)
+    con.close()
+
+def test_summ_table_server_percentiles():
+    """
+    Median and quartiles calculated by the database must give the same table as
+    those calculated from every value in Python. SQLite has no percentile
+    support in its plugin so borrow the windowed SQL used for MySQL.
+    """
+    con = sqlite3.connect(':memory:')
+    cur = con.cursor()
+    cur.execute('CREATE TABLE perctbl (gp INTEGER, x REAL)')
+    rnd = random.Random(3)
+    cur.executemany('INSERT INTO perctbl VALUES (?, ?)',
+        [(rnd.randint(1, 3), rnd.choice([None, rnd.randint(0, 50) / 4]))
+            for unused in range(60)])
+    flds = {
+        'gp': {mg.FLD_BOLNUMERIC: True},
+        'x': {mg.FLD_BOLNUMERIC: True}, }
+    htmls = []
+    for server_percs in (False, True):
+        if server_percs:
+            dbe_sqlite.get_percentiles_sql = (
+                dbe_globals.get_windowed_percentiles_sql)
+        try:
+            tree_rows = dimtables.DimNodeTree()
+            tree_rows.add_child(dimtables.DimNode(fld='gp', has_tot=True,
+                bolnumeric=True))
+            tree_cols = dimtables.DimNodeTree()
+            tree_cols.add_child(dimtables.DimNode(fld='x', bolnumeric=True,
+                measures=[mg.MEDIAN_KEY, mg.LOWER_QUARTILE_KEY,
+                    mg.UPPER_QUARTILE_KEY, mg.IQR_KEY]))
+            tab_test = dimtables.SummTable(titles=['Test'], subtitles=[],
+                tab_type=mg.ROW_STATS, dbe=mg.DBE_SQLITE, tbl='perctbl',
+                tbl_filt='', cur=cur, flds=flds, tree_rows=tree_rows,
+                tree_cols=tree_cols, single_scan=False)
+            assert_equal(tab_test.get_percentiles_sql is not None, server_percs)
+            htmls.append(tab_test.get_html(0, dp=6))
+        finally:
+            if server_percs:
+                del dbe_sqlite.get_percentiles_sql
+    assert mg.NO_CALC_LBL not in htmls[0]
+    assert_equal(htmls[0], htmls[1])
+    con.close()
+
+def test_vals_cache():
+    """
+    Label trees should only come from cached values while re-rendering - a
+    real run must pick up new values. Clearing the cache for one table should
+    leave other tables unaffected.
+    """
+    con = sqlite3.connect(':memory:')
+    cur = con.cursor()
+    cur.execute('CREATE TABLE cachetbl (agegp TEXT)')
+    cur.executemany('INSERT INTO cachetbl VALUES (?)',
+        [('a', ), ('b', ), ('a', )])
+    flds = {'agegp': {mg.FLD_BOLNUMERIC: False}, }
+    def get_html():
+        tree_rows = dimtables.DimNodeTree()
+        tree_rows.add_child(dimtables.DimNode(fld='agegp'))
+        tree_cols = dimtables.DimNodeTree()
+        tree_cols.add_child(dimtables.DimNode(measures=[mg.FREQ_KEY]))
+        tab_test = dimtables.GenTable(titles=['Test'], subtitles=[],
+            tab_type=mg.FREQS, dbe=mg.DBE_SQLITE, db='cachedb', tbl='cachetbl',
+            tbl_filt='', cur=cur, flds=flds, tree_rows=tree_rows,
+            tree_cols=tree_cols)
+        return tab_test.get_html(0, dp=1)
+    getdata.clear_vals_cache()
+    other_key = (mg.DBE_SQLITE, 'cachedb', 'othertbl', '', 'agegp', 'SQL')
+    getdata.vals_cache[other_key] = (('x', 1), )
+    html = get_html()
+    assert '>zzz<' not in html
+    cur.execute("INSERT INTO cachetbl VALUES ('zzz')")
+    with getdata.rerendering_tables():
+        assert_equal(get_html(), html)  ## labels from cache so no zzz
+    assert '>zzz<' in get_html()  ## real run so fresh labels
+    getdata.clear_vals_cache(mg.DBE_SQLITE, 'cachedb', 'cachetbl')
+    assert other_key in getdata.vals_cache
+    getdata.clear_vals_cache()
+    assert_equal(len(getdata.vals_cache), 0)
+    con.close()
+
+def test_table_rerender_from_cache():
+    """
+    Re-rendering a table with only cosmetic changes (decimal places, percent
+    symbol) shouldn't need the database - but must give the same HTML as
+    rendering from scratch. A real run must always go back to the database in
+    case the data has changed outside SOFA.
+    """
+    con = sqlite3.connect(':memory:')
+    cur = CountingCursor(con.cursor())
+    cur.execute('CREATE TABLE rerendertbl (a INTEGER, b TEXT, x REAL)')
+    cur.executemany('INSERT INTO rerendertbl VALUES (?, ?, ?)',
+        [(i % 3, 'pq'[i % 2], i / 7) for i in range(30)])
+    flds = {
+        'a': {mg.FLD_BOLNUMERIC: True},
+        'b': {mg.FLD_BOLNUMERIC: False},
+        'x': {mg.FLD_BOLNUMERIC: True}, }
+    def get_html(tab_type, db, *, dp, show_perc=True):
+        tree_rows = dimtables.DimNodeTree()
+        tree_rows.add_child(dimtables.DimNode(fld='a', has_tot=True,
+            bolnumeric=True))
+        tree_cols = dimtables.DimNodeTree()
+        if tab_type == mg.CROSSTAB:
+            tree_cols.add_child(dimtables.DimNode(fld='b', has_tot=True,
+                measures=[mg.FREQ_KEY, mg.ROWPCT_KEY]))
+            tab_test = dimtables.GenTable(titles=['Test'], subtitles=[],
+                tab_type=tab_type, dbe=mg.DBE_SQLITE, db=db,
+                tbl='rerendertbl', tbl_filt='', cur=cur, flds=flds,
+                tree_rows=tree_rows, tree_cols=tree_cols, show_perc=show_perc)
+        else:
+            tree_cols.add_child(dimtables.DimNode(fld='x', bolnumeric=True,
+                measures=[mg.MEAN_KEY, mg.MEDIAN_KEY, mg.STD_DEV_KEY]))
+            tab_test = dimtables.SummTable(titles=['Test'], subtitles=[],
+                tab_type=tab_type, dbe=mg.DBE_SQLITE, db=db,
+                tbl='rerendertbl', tbl_filt='', cur=cur, flds=flds,
+                tree_rows=tree_rows, tree_cols=tree_cols)
+        return tab_test.get_html(0, dp=dp)
+    getdata.clear_vals_cache()
+    for tab_type in (mg.CROSSTAB, mg.ROW_STATS):
+        get_html(tab_type, 'rerenderdb', dp=1)
+        executed_n = cur.executed_n
+        with getdata.rerendering_tables():
+            html = get_html(tab_type, 'rerenderdb', dp=3, show_perc=False)
+        assert_equal(cur.executed_n, executed_n)  ## all from cache
+        assert_equal(html, get_html(tab_type, None, dp=3, show_perc=False))
+    ## changed outside SOFA so nothing cleared the cache
+    cur.execute("INSERT INTO rerendertbl VALUES (0, 'p', 50.0)")
+    for tab_type in (mg.CROSSTAB, mg.ROW_STATS):
+        html = get_html(tab_type, 'rerenderdb', dp=3)
+        assert_equal(html, get_html(tab_type, None, dp=3))
+    assert not getdata.reuse_tbl_results
+    getdata.clear_vals_cache()
+    con.close()
+
+def test_batch_report_tables():
+    """
+    Many tables over the one dataset must all end up in the one report file
+    with a timing for each - framed as for GUI reports so the css files can be
+    read back and there is a source and filter divider before each table.
+    """
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db_path = Path(tmp_dir) / 'batchdb.db'
+        con = sqlite3.connect(str(db_path))
+        cur = con.cursor()
+        cur.execute('CREATE TABLE batchtbl (a INTEGER, b INTEGER, x REAL)')
+        cur.executemany('INSERT INTO batchtbl VALUES (?, ?, ?)',
+            [(i % 3, i % 4, i / 9) for i in range(60)])
+        con.commit()
+        con.close()
+        con_dets = {mg.DBE_SQLITE: {'batchdb': {'database': str(db_path)}}}
+        specs = []
+        for fld in ('a', 'b'):
+            tree_rows = dimtables.DimNodeTree()
+            tree_rows.add_child(dimtables.DimNode(fld=fld, has_tot=True,
+                bolnumeric=True))
+            tree_cols = dimtables.DimNodeTree()
+            tree_cols.add_child(dimtables.DimNode(
+                measures=[mg.FREQ_KEY, mg.COLPCT_KEY]))
+            specs.append(batch_tables.TableSpec(mg.FREQS, tree_rows, tree_cols,
+                titles=[f'Freqs {fld}']))
+        tree_rows = dimtables.DimNodeTree()
+        tree_rows.add_child(dimtables.DimNode(fld='a', bolnumeric=True))
+        tree_cols = dimtables.DimNodeTree()
+        tree_cols.add_child(dimtables.DimNode(fld='x', bolnumeric=True,
+            measures=[mg.MEAN_KEY, mg.MEDIAN_KEY]))
+        specs.append(batch_tables.TableSpec(mg.ROW_STATS, tree_rows, tree_cols,
+            titles=['Stats x']))
+        report_fpath = Path(tmp_dir) / 'batch.htm'
+        css_fpath = Path(tmp_dir) / 'batch.css'
+        css_fpath.write_text(output.get_fallback_css(), encoding='utf-8')
+        timings = batch_tables.make_report_tables(specs, dbe=mg.DBE_SQLITE,
+            con_dets=con_dets, db='batchdb', tbl='batchtbl',
+            report_fpath=report_fpath, tbl_filt_label='Not 59',
+            tbl_filt='x < 6.5', css_fpaths=[css_fpath])
+        assert_equal([timing.title for timing in timings],
+            ['Freqs a', 'Freqs b', 'Stats x'])
+        assert_true(all(timing.secs >= 0 for timing in timings))
+        html = report_fpath.read_text(encoding='utf-8')
+        assert 'Problem getting table output' not in html
+        for title in ('Freqs a', 'Freqs b', 'Stats x'):
+            assert title in html
+        assert_equal(html.count('<tbody>'), 3)
+        assert_true(html.rstrip().endswith(output.get_html_ftr()))
+        assert_equal(output.get_css_fpaths_from_report(html), [css_fpath])
+        body = output.extract_html_body(html)
+        assert_equal(body.count(mg.VISUAL_DIVIDER_BEFORE_THIS), 3)
+        assert_equal(body.count('From batchdb.batchtbl'), 3)
+        assert_equal(body.count('page-break-before'), 2)
+        assert '"Not 59": x < 6.5' in body
+        assert body.index(mg.VISUAL_DIVIDER_BEFORE_THIS) < body.index('Freqs a')
+        assert_raises(Exception, batch_tables.make_report_tables,
+            [batch_tables.TableSpec(mg.DATA_LIST, tree_rows, tree_cols)],
+            dbe=mg.DBE_SQLITE, con_dets=con_dets, db='batchdb',
+            tbl='batchtbl', report_fpath=report_fpath)
+    getdata.clear_vals_cache()
+
+def test_pivot_result():
+    """
+    Pivot results must have the unrounded numbers behind the HTML - and export
+    without losing anything.
+    """
+    con = sqlite3.connect(':memory:')
+    cur = con.cursor()
+    cur.execute('CREATE TABLE pivottbl (a INTEGER, b TEXT, x REAL)')
+    rows = [(i % 3, 'pq'[i % 2], i / 7) for i in range(31)] + [(None, 'p', 1)]
+    cur.executemany('INSERT INTO pivottbl VALUES (?, ?, ?)', rows)
+    flds = {
+        'a': {mg.FLD_BOLNUMERIC: True},
+        'b': {mg.FLD_BOLNUMERIC: False},
+        'x': {mg.FLD_BOLNUMERIC: True}, }
+    for use_group_by in (True, False):
+        tree_rows = dimtables.DimNodeTree()
+        tree_rows.add_child(dimtables.DimNode(fld='a', label='A',
+            labels={0: 'Zero'}, bolnumeric=True))
+        tree_cols = dimtables.DimNodeTree()
+        tree_cols.add_child(dimtables.DimNode(fld='b', label='B', has_tot=True,
+            measures=[mg.FREQ_KEY, mg.ROWPCT_KEY]))
+        tab_test = dimtables.GenTable(titles=['Test'], subtitles=[],
+            tab_type=mg.CROSSTAB, dbe=mg.DBE_SQLITE, tbl='pivottbl',
+            tbl_filt='', cur=cur, flds=flds, tree_rows=tree_rows,
+            tree_cols=tree_cols, use_group_by=use_group_by)
+        pivot_result = tab_test.get_pivot_result()
+        assert_equal(pivot_result.row_lbls,
+            [('A', 'Zero'), ('A', '1'), ('A', '2')])
+        assert_equal(pivot_result.col_lbls,
+            [('B', 'p'), ('B', 'q'), ('B', 'TOTAL')])
+        assert_equal(pivot_result.measures, [mg.FREQ_KEY, mg.ROWPCT_KEY])
+        expected_freqs = [[sum(1 for row in rows
+                if row[0] == a and (b is None or row[1] == b))
+            for b in ('p', 'q', None)] for a in range(3)]
+        assert_equal(pivot_result.measure2vals[mg.FREQ_KEY].tolist(),
+            expected_freqs)
+        assert_almost_equals(pivot_result.measure2vals[mg.ROWPCT_KEY][0, 0],
+            100 * expected_freqs[0][0] / expected_freqs[0][2])
+    tree_rows = dimtables.DimNodeTree()
+    tree_rows.add_child(dimtables.DimNode(fld='b', label='B'))
+    tree_cols = dimtables.DimNodeTree()
+    tree_cols.add_child(dimtables.DimNode(fld='x', label='X', bolnumeric=True,
+        measures=[mg.MEAN_KEY, mg.SUMM_N_KEY]))
+    tab_test = dimtables.SummTable(titles=['Test'], subtitles=[],
+        tab_type=mg.ROW_STATS, dbe=mg.DBE_SQLITE, tbl='pivottbl',
+        tbl_filt='', cur=cur, flds=flds, tree_rows=tree_rows,
+        tree_cols=tree_cols)
+    pivot_result = tab_test.get_pivot_result()
+    p_vals = [row[2] for row in rows if row[1] == 'p']
+    assert_almost_equals(pivot_result.measure2vals[mg.MEAN_KEY][0, 0],
+        sum(p_vals) / len(p_vals))
+    assert_equal(pivot_result.measure2vals[mg.SUMM_N_KEY][0, 0], len(p_vals))
+    hdr, flat_rows = export_pivot.get_flat_rows(pivot_result)
+    assert_equal(hdr, ['', '', 'X > Mean', 'X > N'])
+    assert_equal(flat_rows[1][:3], ['B', 'q', pivot_result.measure2vals[
+        mg.MEAN_KEY][1, 0]])
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        fpath = Path(tmp_dir) / 'pivot.json'
+        export_pivot.pivot2json(pivot_result, fpath)
+        with open(fpath, encoding='utf-8') as f:
+            content = json.load(f)
+    assert_equal(content['row_lbls'], [['B', 'p'], ['B', 'q']])
+    assert_equal(content['measures']['Mean'][0][0],
+        pivot_result.measure2vals[mg.MEAN_KEY][0, 0])
+    con.close()
+
 def test_process_fldnames():
     """
     Only valid SQLite table and field names. Spaces, hyphens, and dots to 
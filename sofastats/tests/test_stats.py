@@ -10,6 +10,7 @@ from nose.tools import assert_equal, assert_almost_equal, assert_raises  #@Unres
 #from nose.plugins.attrib import attr
 import pprint
 import random
+import sqlite3
 
 from subprocess import run, PIPE
 
@@ -18,8 +19,15 @@ from subprocess import run, PIPE
 from ..stats.core_stats import (ttest_ind, ttest_rel, mannwhitneyu, wilcoxont,
     pearsonr, spearmanr, kruskalwallish, anova, fprob, betai, gammln, betacf,
     chisquare, kurtosis, skew, kurtosistest, skewtest, normaltest,
-    obrientransform, sim_variance, get_summary_dics, get_quartiles, get_ci95)
-
+    obrientransform, sim_variance, get_summary_dics, get_quartiles, get_ci95,
+    rankdata, tiecorrect, get_rank_tie_dets, wilcoxont_details, mean, variance,
+    samplevar, stdev, sum_squares, is_float_precise_enough, MomentsAccumulator,
+    QuantileSketch, chisqprob, zprob, histogram, get_normal_ys,
+    get_normality_dets, get_quartile_percs)
+
+from ..stats.special_funcs import betais, chisqprobs, fprobs, zprobs
+from ..stats import resampling
+from ..dbe_plugins import dbe_globals
 from .. import my_globals as mg
 
 def test_ci95():
@@ -44,6 +52,151 @@ def test_get_quartiles():
     for input_list, results in tests:
         assert_equal(get_quartiles(input_list), results)
 
+def test_windowed_percentiles_match_get_quartiles():
+    """
+    Percentiles calculated by the database (percentile_cont or the windowed
+    equivalent used for MySQL) at get_quartile_percs() must give the same
+    quartiles as get_quartiles(). Checked using SQLite window functions.
+    """
+    con = sqlite3.connect(':memory:')
+    cur = con.cursor()
+    cur.execute('CREATE TABLE vals (grp INTEGER, x REAL)')
+    rnd = random.Random(1)
+    for n in range(1, 30):
+        vals = [rnd.choice([rnd.randint(-5, 5), rnd.random()*100])
+            for unused in range(n)]
+        cur.executemany('INSERT INTO vals VALUES (?, ?)',
+            [(n, val) for val in vals] + [(n, None)])
+        percs = get_quartile_percs(n) + (0.5, )
+        SQL_get_percs = dbe_globals.get_windowed_percentiles_sql(
+            fld='x', tbl='vals', filt_clause=f'WHERE grp = {n}', percs=percs)
+        cur.execute(SQL_get_percs)
+        lq, uq, median = cur.fetchone()
+        expected_lq, expected_uq = get_quartiles(vals)
+        assert_almost_equal(lq, expected_lq, places=10)
+        assert_almost_equal(uq, expected_uq, places=10)
+        sorted_vals = sorted(vals)
+        expected_median = (sorted_vals[(n - 1) // 2] + sorted_vals[n // 2]) / 2
+        assert_almost_equal(median, expected_median, places=10)
+    con.close()
+
+def test_rankdata():
+    tests = [
+        ([], []),
+        ([7], [1.0]),
+        ([3, 1, 2], [3.0, 1.0, 2.0]),
+        ([3, 1, 4, 1, 5, 9, 2, 6, 5, 3, 5],
+            [4.5, 1.5, 6.0, 1.5, 8.0, 11.0, 3.0, 10.0, 8.0, 4.5, 8.0]),
+        ([2.5, 2.5, 2.5, 2.5], [2.5, 2.5, 2.5, 2.5]),
+    ]
+    for input_list, results in tests:
+        assert_equal(rankdata(input_list), results)
+
+def test_tiecorrect():
+    """
+    Two ties of 2 and one of 3 in 11 values: 1 - (6 + 6 + 24)/(1331 - 11)
+    """
+    ranks = rankdata([3, 1, 4, 1, 5, 9, 2, 6, 5, 3, 5])
+    assert_almost_equal(tiecorrect(ranks), 1 - 36/1320.0)
+    assert_equal(tiecorrect([1, 2, 3, 4]), 1.0)
+
+def test_get_rank_tie_dets():
+    vals = [3, 1, 4, 1, 5, 9, 2, 6, 5, 3, 5]
+    rank_tie_dets = get_rank_tie_dets(vals)
+    assert_equal(list(rank_tie_dets.ranks), rankdata(vals))
+    assert_equal([vals[idx] for idx in rank_tie_dets.sorted_idxs],
+        sorted(vals))
+    assert_equal(list(rank_tie_dets.distinct_vals), [1, 2, 3, 4, 5, 6, 9])
+    assert_equal(list(rank_tie_dets.distinct_ranks),
+        [1.5, 3.0, 4.5, 6.0, 8.0, 10.0, 11.0])
+    assert_equal(list(rank_tie_dets.val_counts), [2, 1, 2, 1, 3, 1, 1])
+    assert_almost_equal(rank_tie_dets.tie_correction, tiecorrect(rankdata(vals)))
+
+def test_wilcoxon_details_match_test():
+    """
+    Zero-difference pairs must be left out of the worked example ranks just as
+    they are in the test itself.
+    """
+    sample_a = [10, 12, 9, 15, 20, 7, 8, 11]
+    sample_b = [10, 14, 5, 15, 16, 9, 8, 13]
+    t, *_unused = wilcoxont(sample_a, sample_b, headless=True)
+    details = wilcoxont_details(sample_a, sample_b)
+    assert_equal(details[mg.WILCOXON_T], t)
+    assert_equal(details[mg.WILCOXON_N], 5)
+
+def test_float_and_decimal_paths_agree():
+    """
+    The vectorised float path must agree with the Decimal path for ordinary
+    data, and high=None must only fall back to Decimals for difficult data.
+    """
+    for unused in range(20):
+        vals = [random.randint(1, 100000)/7.0
+            for x in range(random.randint(2, 500))]
+        for func in (mean, variance, samplevar, stdev, sum_squares):
+            high_res = float(func(vals, high=True))
+            assert_almost_equal(func(vals)/high_res, 1, places=12)
+            assert_equal(func(vals, high=None), func(vals))
+        assert_equal(is_float_precise_enough(vals), True)
+    ## NIST SmLs09 style - large values with tiny spread
+    difficult_vals = [1000000000000.4, 1000000000000.3, 1000000000000.5]*7
+    assert_equal(is_float_precise_enough(difficult_vals), False)
+    assert_equal(variance(difficult_vals, high=None),
+        variance(difficult_vals, high=True))
+    assert_equal(is_float_precise_enough([5, 5, 5]), True)
+
+def test_moments_accumulator():
+    """
+    Merging batches must give the same results as the whole-sample functions.
+    """
+    for unused in range(10):
+        vals = [random.gauss(50, 10) for x in range(random.randint(2, 3000))]
+        moments = MomentsAccumulator()
+        batch_size = random.randint(1, 500)
+        for i in range(0, len(vals), batch_size):
+            moments.add_batch(vals[i: i + batch_size])
+        assert_equal(moments.n, len(vals))
+        assert_almost_equal(moments.mean, mean(vals))
+        assert_almost_equal(moments.variance, variance(vals))
+        assert_almost_equal(moments.skew, float(skew(vals)))
+        assert_almost_equal(moments.kurtosis, float(kurtosis(vals)))
+        assert_equal(moments.min, min(vals))
+        assert_equal(moments.max, max(vals))
+
+def test_quantile_sketch():
+    "Approximate quantiles must be within 2% rank of the real ones"
+    vals = list(range(100_000))
+    random.shuffle(vals)
+    sketch = QuantileSketch(seed=1)
+    for i in range(0, len(vals), 3_000):
+        sketch.add_batch(vals[i: i + 3_000])
+    for q in (0.25, 0.5, 0.75):
+        assert abs(sketch.get_quantile(q) - q*len(vals)) < 0.02*len(vals)
+    assert sum(len(level) for level in sketch.levels) < 20_000
+
+def test_histogram():
+    """
+    Top value included in top bin, values below the lower limit (and any
+    non-numeric values) counted as extra points.
+    """
+    tests = [
+        (([1, 2, 2, 3, 9.99, 10], 5, [0, 10]),
+            ([1, 3, 0, 0, 2], 0, 2.0, 0)),
+        (([-1, 0, 5, 'spam', None, 10], 2, [0, 10]),
+            ([1, 2], 0, 5.0, 3)),
+        ((list(range(10)), 3, None),
+            ([3, 4, 3], -2.00000015, None, 0)),
+    ]
+    for (vals, n_bins, limits), (bins, lower, binsize, extras) in tests:
+        res = histogram(vals, n_bins, limits)
+        assert_equal(res[0], bins)
+        assert_almost_equal(res[1], lower)
+        if binsize is not None:
+            assert_almost_equal(res[2], binsize)
+        assert_equal(res[3], extras)
+    norm_ys = get_normal_ys([1, 2, 3, 4, 5], [3, 5])
+    assert_almost_equal(norm_ys[0], 0.25231, places=5)
+    assert_almost_equal(norm_ys[1], 0.11337, places=5)
+
 def test_get_summary_dics():
     tests = [([[1,2,3,4,5,6,7,8,9,10], [-10.5, 0, 100]], 
           ["A", "B"], 
@@ -224,6 +377,88 @@ def test_normaltest():
         assert_almost_equal(z1, z2)
         assert_almost_equal(p1, p2)
 
+def test_get_normality_dets():
+    samples = []
+    for i in range(20):
+        sample_size = random.randint(20, 1000)
+        samples.append(
+            [random.randint(1, 100000)/3.0 for x in range(sample_size)])
+    samples.append([1, 2, 3])  ## too small for the skew and kurtosis tests
+    dets = get_normality_dets(samples)
+    assert_equal(len(dets), len(samples))
+    for sample, sample_dets in zip(samples[:-1], dets):
+        assert_equal(sample_dets.n, len(sample))
+        assert_almost_equal(sample_dets.skew, skew(sample))
+        assert_almost_equal(sample_dets.kurtosis, kurtosis(sample))
+        zskew, unused, unused = skewtest(sample)
+        assert_almost_equal(sample_dets.zskew, zskew)
+        zkurtosis, unused, unused = kurtosistest(sample)
+        assert_almost_equal(sample_dets.zkurtosis, zkurtosis)
+        k2, p = normaltest(sample)[:2]
+        assert_almost_equal(sample_dets.k2, k2)
+        assert_almost_equal(sample_dets.p, p[0])
+        assert_equal(sum(sample_dets.y_vals), len(sample))
+    assert dets[-1].p != dets[-1].p  ## NaN
+
+def test_get_resampling_dets():
+    sample_a = [random.gauss(0, 1) for x in range(40)]
+    sample_b = [random.gauss(0.5, 1) for x in range(50)]
+    sample_c = [random.randint(1, 5) for x in range(30)]
+    sample_y = [x*0.5 + random.gauss(0, 1) for x in sample_a]
+    tests = [
+        (resampling.TTEST_IND, [sample_a, sample_b],
+            ttest_ind(sample_a, sample_b, 'a', 'b')[0]),
+        (resampling.MANN_WHITNEY, [sample_a, sample_b],
+            mannwhitneyu(sample_a, sample_b)[0]),
+        (resampling.ANOVA, [sample_a, sample_b, sample_c],
+            anova([sample_a, sample_b, sample_c], ['a', 'b', 'c'],
+                high=False)[1]),
+        (resampling.PEARSONR, [sample_a, sample_y],
+            pearsonr(sample_a, sample_y)[0]),
+        (resampling.SPEARMANR, [sample_a, [round(x) for x in sample_y]],
+            spearmanr(sample_a, [round(x) for x in sample_y])[0]),
+    ]
+    for test, samples, stat in tests:
+        dets = resampling.get_resampling_dets(test, samples, n_perms=2_000,
+            n_boots=2_000, batch_n=500, seed=1, max_workers=1)
+        assert_almost_equal(dets.stat, float(stat))
+        assert_equal((dets.n_perms, dets.n_boots), (2_000, 2_000))
+        assert 0 < dets.p <= 1
+        assert dets.ci_lower <= dets.ci_upper
+    ## same seed, same results no matter how many workers
+    dets_1 = resampling.get_resampling_dets(resampling.TTEST_IND,
+        [sample_a, sample_b], n_perms=2_500, n_boots=1_500, seed=42,
+        max_workers=1, batch_n=500)
+    dets_2 = resampling.get_resampling_dets(resampling.TTEST_IND,
+        [sample_a, sample_b], n_perms=2_500, n_boots=1_500, seed=42,
+        max_workers=2, batch_n=500)
+    assert_equal(dets_1, dets_2)
+
+def test_resampling_batch_n_within_element_budget():
+    sample_a = [random.gauss(0, 1) for x in range(3_000)]
+    sample_b = [random.gauss(0.5, 1) for x in range(2_000)]
+    samples = resampling._get_prepared_samples(resampling.TTEST_IND,
+        [sample_a, sample_b])
+    assert_equal(resampling._get_batch_n(resampling.TTEST_IND, samples,
+        batch_n=1_000, max_batch_elements=1_000_000), 200)
+    assert_equal(resampling._get_batch_n(resampling.TTEST_IND, samples,
+        batch_n=1_000, max_batch_elements=None), 1_000)
+    assert_equal(resampling._get_batch_n(resampling.TTEST_IND, samples,
+        batch_n=1_000, max_batch_elements=10), 1)
+    ## ranked tests also count a row per distinct value
+    samples = resampling._get_prepared_samples(resampling.MANN_WHITNEY,
+        [sample_a, sample_b])
+    assert_equal(resampling._get_batch_n(resampling.MANN_WHITNEY, samples,
+        batch_n=1_000, max_batch_elements=1_000_000), 100)
+    ## same as asking for the reduced batch size directly
+    dets_1 = resampling.get_resampling_dets(resampling.TTEST_IND,
+        [sample_a, sample_b], n_perms=1_000, n_boots=500, seed=3,
+        max_workers=1, batch_n=1_000, max_batch_elements=1_000_000)
+    dets_2 = resampling.get_resampling_dets(resampling.TTEST_IND,
+        [sample_a, sample_b], n_perms=1_000, n_boots=500, seed=3,
+        max_workers=2, batch_n=200)
+    assert_equal(dets_1, dets_2)
+
 def _test_ind_t_test(sample_a, sample_b, verbose=False):
     sample_a_strs = [str(x) for x in sample_a]
     sample_b_strs = [str(x) for x in sample_b]
@@ -490,6 +725,30 @@ def test_betacf():
         b2 = float(betacf(a, b, x, high=True))
         assert_almost_equal(b1, b2)
 
+def test_vectorised_special_funcs():
+    """
+    One call for a batch of p-values must match the scalar functions.
+    """
+    dfnums = [random.randint(1, 20) for x in range(200)]
+    dfdens = [random.randint(1, 500) for x in range(200)]
+    Fs = [random.random()*10 for x in range(200)]
+    for p1, p2 in zip(fprobs(dfnums, dfdens, Fs),
+            [fprob(*args) for args in zip(dfnums, dfdens, Fs)]):
+        assert_almost_equal(p1, p2, places=12)
+    xs = [random.random() for x in range(200)]
+    for p1, p2 in zip(betais(2.5, 4, xs), [betai(2.5, 4, x) for x in xs]):
+        assert_almost_equal(p1, p2, places=12)
+    chisqs = [random.random()*150 for x in range(200)] + [0, 300]
+    dfs = [random.randint(1, 80) for x in range(202)]
+    for p1, p2 in zip(chisqprobs(chisqs, dfs),
+            [chisqprob(*args) for args in zip(chisqs, dfs)]):
+        assert_almost_equal(p1, p2, places=12)
+    zs = [random.gauss(0, 3) for x in range(200)]
+    for p1, p2 in zip(zprobs(zs), [zprob(z) for z in zs]):
+        assert_almost_equal(p1, p2, places=12)
+    p = fprobs([2, 3], 30, [1.5, 2.5], high=True)
+    assert_almost_equal(p[1], float(fprob(3, 30, 2.5, high=True)))
+
 def test_chisquare():
     """
     Cannot test with df because assumed to be k-1 in stats.